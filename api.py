@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+API HTTP local para os sistemas dos campus enviarem dados reais e
+consultarem resultados, sem passar pelos formulários do aplicativo.
+
+Servidor asyncio (só biblioteca padrão, HTTP/1.1 com keep-alive), feito
+para rodar em localhost:
+- POST /campus/<campus_id>/dados_reais  {"registros": [...], "verificar_versao": false}
+  Cada registro tem os campos de DadosReaisCampus (disciplina_id,
+  alunos_reais, ch_real_total, observacoes e, com verificar_versao, a
+  versão lida). Responde com os registros gravados e suas novas versões.
+- GET /resultados?pagina=1&tamanho=100&campus=...&curso=...&status=...
+- GET /metricas
+- GET /saude
+
+Gravações que chegam juntas são agrupadas (ColetorGravacoes): os pedidos
+de uma janela curta viram um commit por campus. Os resultados vêm de um
+cálculo marcado com a versão dos dados e das regras (CacheResultados),
+atualizado incrementalmente após as gravações da própria API e refeito
+quando outra sessão ou processo altera os dados. As respostas de
+consulta trazem a versão no corpo e no cabeçalho ETag (If-None-Match
+responde 304).
+
+    python api.py --porta 8765 --data-dir data
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from incremental import Alteracao, CalculadoraIncremental
+from models import BACKENDS_ARMAZENAMENTO, MAXIMO_ALUNOS_REAIS, ConflitoVersao, DadosReaisCampus, ResultFrame, criar_data_manager, dados_reais_para_dict
+from paginacao import DIMENSOES_FILTRO, IndiceResultados
+from regras import carregar_regras
+from snapshots import SnapshotsResultados
+
+logger = logging.getLogger("calc_precpt.api")
+
+# Tempo (s) que o coletor espera por mais pedidos depois do primeiro, e máximo de pedidos por grupo
+JANELA_COALESCENCIA = 0.005
+MAXIMO_PEDIDOS_GRUPO = 256
+
+TAMANHO_PAGINA_PADRAO = 100
+TAMANHO_PAGINA_MAXIMO = 1000
+
+# Maior corpo de requisição aceito (bytes)
+MAXIMO_CORPO = 10 * 1024 * 1024
+
+class ErroHTTP(Exception):
+    def __init__(self, status: HTTPStatus, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+def registro_de_json(item) -> DadosReaisCampus:
+    """DadosReaisCampus a partir do JSON de um registro, validando tipos e limites (os mesmos da importação)"""
+    if not isinstance(item, dict) or not isinstance(item.get("disciplina_id"), str):
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, "Cada registro precisa de disciplina_id (texto)")
+    alunos_reais = item.get("alunos_reais", 0)
+    ch_real_total = item.get("ch_real_total", 0.0)
+    versao = item.get("versao", 0)
+    if (type(alunos_reais) is not int or not 0 <= alunos_reais <= MAXIMO_ALUNOS_REAIS
+            or type(versao) is not int or not 0 <= versao <= MAXIMO_ALUNOS_REAIS):
+        raise ErroHTTP(
+            HTTPStatus.BAD_REQUEST,
+            f"alunos_reais e versao devem ser inteiros entre 0 e {MAXIMO_ALUNOS_REAIS} ({item['disciplina_id']})"
+        )
+    # json.loads aceita NaN e Infinity, e inteiros que não cabem em float
+    if type(ch_real_total) is int and abs(ch_real_total) <= sys.float_info.max:
+        ch_real_total = float(ch_real_total)
+    if type(ch_real_total) is not float or not math.isfinite(ch_real_total) or ch_real_total < 0:
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, f"ch_real_total deve ser um número finito >= 0 ({item['disciplina_id']})")
+    return DadosReaisCampus(
+        disciplina_id=item["disciplina_id"],
+        alunos_reais=alunos_reais,
+        ch_real_total=ch_real_total,
+        observacoes=str(item.get("observacoes", "")),
+        versao=versao
+    )
+
+@dataclass
+class _PedidoGravacao:
+    campus_id: str
+    registros: List[DadosReaisCampus]
+    verificar_versao: bool
+    futuro: asyncio.Future
+
+class ColetorGravacoes:
+    """
+    Agrupa as gravações concorrentes. Os pedidos entram em uma fila; uma
+    tarefa pega o primeiro, espera até `janela` segundos por outros e grava
+    o grupo em uma thread: os pedidos sem verificação de versão de um mesmo
+    campus viram um único save_dados_reais_lote (em disciplinas repetidas
+    vale o último pedido); os com verificação são gravados um a um, para
+    que um conflito recuse só o próprio pedido. Um erro ao gravar um lote
+    (de I/O, por exemplo) recusa só os pedidos daquele lote; um erro no
+    grupo inteiro recusa o grupo, e a tarefa segue com os próximos pedidos.
+
+    ao_gravar recebe as alterações gravadas e a versão dos dados lida antes
+    e depois das gravações do grupo.
+    """
+
+    def __init__(self, data_manager, ao_gravar: Callable[[List[Alteracao], str, str], None],
+                 janela: float = JANELA_COALESCENCIA, maximo: int = MAXIMO_PEDIDOS_GRUPO):
+        self.data_manager = data_manager
+        self.ao_gravar = ao_gravar
+        self.janela = janela
+        self.maximo = maximo
+        self.pedidos = 0
+        self.commits = 0
+        self._fila: Optional[asyncio.Queue] = None
+
+    async def gravar(self, campus_id: str, registros: List[DadosReaisCampus],
+                     verificar_versao: bool = False) -> List[DadosReaisCampus]:
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put(_PedidoGravacao(campus_id, registros, verificar_versao, futuro))
+        return await futuro
+
+    async def executar(self):
+        """Tarefa de fundo que consome a fila (uma por servidor)"""
+        self._fila = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        while True:
+            grupo = [await self._fila.get()]
+            prazo = loop.time() + self.janela
+            while len(grupo) < self.maximo:
+                restante = prazo - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    grupo.append(await asyncio.wait_for(self._fila.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                respostas = await asyncio.to_thread(self._gravar_grupo, grupo)
+            except Exception as e:
+                respostas = [e] * len(grupo)
+            for pedido, resposta in zip(grupo, respostas):
+                if pedido.futuro.done():
+                    continue  # Cliente desconectou
+                if isinstance(resposta, Exception):
+                    pedido.futuro.set_exception(resposta)
+                else:
+                    pedido.futuro.set_result(resposta)
+
+    def _gravar_grupo(self, grupo: List[_PedidoGravacao]) -> List:
+        respostas: List = [None] * len(grupo)
+        self.pedidos += len(grupo)
+
+        # Versão anterior às gravações, para o cache saber se os dados mudaram por fora antes delas;
+        # disciplinas de cada campus, lidas uma vez para o grupo inteiro
+        versao_antes = self.data_manager.versao_dados()
+        disciplinas_do_campus = {e.id: set(e.disciplinas) for e in self.data_manager.load_manifesto()}
+        por_campus: Dict[str, List[int]] = defaultdict(list)
+        for i, pedido in enumerate(grupo):
+            if pedido.campus_id not in disciplinas_do_campus:
+                respostas[i] = ErroHTTP(HTTPStatus.NOT_FOUND, f"Campus não encontrado: {pedido.campus_id}")
+                continue
+            fora = sorted({r.disciplina_id for r in pedido.registros} - disciplinas_do_campus[pedido.campus_id])
+            if fora:
+                respostas[i] = ErroHTTP(
+                    HTTPStatus.UNPROCESSABLE_ENTITY, f"Disciplinas não oferecidas no campus: {', '.join(fora)}"
+                )
+                continue
+            por_campus[pedido.campus_id].append(i)
+
+        alteracoes = []
+        for campus_id, indices in por_campus.items():
+            livres = [i for i in indices if not grupo[i].verificar_versao]
+            lotes = [livres] if livres else []
+            lotes += [[i] for i in indices if grupo[i].verificar_versao]
+            for lote in lotes:
+                try:
+                    gravados = self.data_manager.save_dados_reais_lote(
+                        campus_id, [r for i in lote for r in grupo[i].registros], grupo[lote[0]].verificar_versao
+                    )
+                except Exception as e:
+                    # KeyError e ConflitoVersao viram 404 e 409; o resto, 500 só para este lote
+                    for i in lote:
+                        respostas[i] = e
+                    continue
+                if gravados:
+                    self.commits += 1
+                inicio = 0
+                for i in lote:
+                    respostas[i] = gravados[inicio:inicio + len(grupo[i].registros)]
+                    inicio += len(grupo[i].registros)
+                alteracoes.extend(Alteracao("dados_reais", campus_id=campus_id, disciplina_id=d.disciplina_id) for d in gravados)
+
+        if alteracoes:
+            try:
+                self.ao_gravar(alteracoes, versao_antes, self.data_manager.versao_dados())
+            except Exception:
+                # Os dados já foram gravados; sem o aviso, o cache vê a versão nova e recalcula tudo
+                logger.exception("Falha ao registrar as alterações gravadas no cache de resultados")
+        return respostas
+
+@dataclass
+class EstadoCalculo:
+    versao: str
+    calculadora: CalculadoraIncremental
+    resultados: ResultFrame
+    metricas: Dict
+    indice: IndiceResultados
+
+class CacheResultados:
+    """
+    Resultados, métricas e índice de paginação da versão atual dos dados e
+    das regras, como obter_resultados do aplicativo: se desde o último
+    cálculo só houve gravações da própria API, recalcula só as linhas
+    afetadas; senão parte do snapshot da versão (ou recalcula tudo).
+    Consultas simultâneas esperam e compartilham o mesmo recálculo.
+
+    Cada gravação da API é registrada com a versão de antes e a de depois;
+    o recálculo incremental só vale se essas versões encadeiam a do último
+    cálculo com a atual. Uma gravação de outro processo antes das da API
+    quebra o encadeamento e obriga o cálculo completo.
+    """
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self.snapshots = SnapshotsResultados(data_manager)
+        self._lock_calculo = threading.Lock()
+        self._lock_pendentes = threading.Lock()
+        self._estado: Optional[EstadoCalculo] = None
+        self._pendentes: List[Alteracao] = []
+        self._gravacoes: List[Tuple[str, str]] = []
+
+    def registrar_alteracoes(self, alteracoes: List[Alteracao], versao_dados_antes: str, versao_dados_depois: str):
+        regras = carregar_regras(self.data_manager.data_dir)
+        gravacao = (self.snapshots.versao(regras, versao_dados_antes), self.snapshots.versao(regras, versao_dados_depois))
+        with self._lock_pendentes:
+            self._pendentes.extend(alteracoes)
+            self._gravacoes.append(gravacao)
+
+    @staticmethod
+    def _encadeadas(versao_inicial: str, gravacoes: List[Tuple[str, str]], versao_final: str) -> bool:
+        """Se as gravações levam, uma após a outra, da versão inicial à final"""
+        versao = versao_inicial
+        for antes, depois in gravacoes:
+            if antes != versao:
+                return False
+            versao = depois
+        return versao == versao_final
+
+    def obter(self) -> EstadoCalculo:
+        with self._lock_calculo:
+            regras = carregar_regras(self.data_manager.data_dir)
+            versao = self.snapshots.versao(regras)
+            with self._lock_pendentes:
+                pendentes, self._pendentes = self._pendentes, []
+                gravacoes, self._gravacoes = self._gravacoes, []
+
+            estado = self._estado
+            if estado is not None and estado.versao == versao:
+                return estado
+
+            disciplinas = self.data_manager.load_disciplinas()
+            campus_list = self.data_manager.load_campus()
+            if (estado is not None and pendentes and self._encadeadas(estado.versao, gravacoes, versao)
+                    and estado.calculadora.regras.hash() == regras.hash()):
+                calculadora = estado.calculadora
+                resultados, metricas = calculadora.atualizar(disciplinas, campus_list, pendentes)
+            else:
+                calculadora = CalculadoraIncremental(
+                    disciplinas, campus_list, self.snapshots.carregar_ou_calcular(disciplinas, campus_list, regras, versao),
+                    regras
+                )
+                resultados, metricas = calculadora.resultados, calculadora.metricas
+
+            self._estado = EstadoCalculo(versao, calculadora, resultados, metricas, IndiceResultados(resultados))
+            return self._estado
+
+def _linhas(resultados: ResultFrame, posicoes) -> List[Dict]:
+    colunas = {campo: resultados.coluna(campo)[posicoes].tolist() for campo in ResultFrame.CAMPOS}
+    return [dict(zip(colunas, valores)) for valores in zip(*colunas.values())]
+
+def _inteiro(consulta: Dict[str, List[str]], nome: str, padrao: int, minimo: int, maximo: int) -> int:
+    try:
+        valor = int(consulta.get(nome, [padrao])[0])
+    except ValueError:
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, f"{nome} deve ser um inteiro")
+    if not minimo <= valor <= maximo:
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, f"{nome} deve estar entre {minimo} e {maximo}")
+    return valor
+
+class ServidorAPI:
+    def __init__(self, data_manager, janela: float = JANELA_COALESCENCIA, maximo_grupo: int = MAXIMO_PEDIDOS_GRUPO):
+        self.data_manager = data_manager
+        self.cache = CacheResultados(data_manager)
+        self.coletor = ColetorGravacoes(data_manager, self.cache.registrar_alteracoes, janela, maximo_grupo)
+        self.requisicoes = 0
+        self.inicio = time.time()
+
+    async def iniciar(self, host: str = "127.0.0.1", porta: int = 8765) -> asyncio.Server:
+        asyncio.get_running_loop().create_task(self.coletor.executar())
+        return await asyncio.start_server(self._atender, host, porta)
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, _ = linha.decode("latin-1").split()
+                except ValueError:
+                    await self._responder(writer, HTTPStatus.BAD_REQUEST, {"erro": "Linha de requisição inválida"}, fechar=True)
+                    break
+
+                cabecalhos = {}
+                while True:
+                    linha = await reader.readline()
+                    if linha in (b"\r\n", b"\n", b""):
+                        break
+                    nome, _, valor = linha.decode("latin-1").partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+                try:
+                    tamanho = int(cabecalhos.get("content-length", "0") or 0)
+                except ValueError:
+                    await self._responder(writer, HTTPStatus.BAD_REQUEST, {"erro": "Content-Length inválido"}, fechar=True)
+                    break
+                if tamanho > MAXIMO_CORPO:
+                    await self._responder(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"erro": "Corpo grande demais"}, fechar=True)
+                    break
+                corpo = await reader.readexactly(tamanho) if tamanho else b""
+                fechar = cabecalhos.get("connection", "").lower() == "close"
+
+                self.requisicoes += 1
+                try:
+                    status, resposta, extras = await self._rotear(metodo, alvo, cabecalhos, corpo)
+                except ErroHTTP as e:
+                    status, resposta, extras = e.status, {"erro": e.mensagem}, {}
+                except ConflitoVersao as e:
+                    status, resposta, extras = HTTPStatus.CONFLICT, {
+                        "erro": str(e), "disciplina_id": e.disciplina_id, "versao_atual": e.versao_atual
+                    }, {}
+                except KeyError as e:
+                    status, resposta, extras = HTTPStatus.NOT_FOUND, {"erro": str(e.args[0])}, {}
+                except Exception as e:
+                    status, resposta, extras = HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": f"{type(e).__name__}: {e}"}, {}
+                await self._responder(writer, status, resposta, extras, fechar)
+                if fechar:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _responder(self, writer: asyncio.StreamWriter, status: HTTPStatus, resposta: Optional[Dict],
+                         extras: Optional[Dict[str, str]] = None, fechar: bool = False):
+        corpo = b"" if resposta is None else json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+        cabecalhos = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Content-Length": str(len(corpo)),
+            "Connection": "close" if fechar else "keep-alive",
+            **(extras or {})
+        }
+        texto = f"HTTP/1.1 {status.value} {status.phrase}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in cabecalhos.items())
+        writer.write(texto.encode("latin-1") + b"\r\n" + corpo)
+        await writer.drain()
+
+    async def _rotear(self, metodo: str, alvo: str, cabecalhos: Dict[str, str], corpo: bytes) -> Tuple[HTTPStatus, Optional[Dict], Dict]:
+        url = urlsplit(alvo)
+        partes = [unquote(p) for p in url.path.strip("/").split("/")]
+        consulta = parse_qs(url.query)
+
+        if len(partes) == 3 and partes[0] == "campus" and partes[2] == "dados_reais":
+            if metodo != "POST":
+                raise ErroHTTP(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+            return await self._gravar_dados_reais(partes[1], corpo)
+
+        rotas = {"resultados": self._resultados, "metricas": self._metricas, "saude": self._saude}
+        if len(partes) != 1 or partes[0] not in rotas:
+            raise ErroHTTP(HTTPStatus.NOT_FOUND, f"Rota não encontrada: {url.path}")
+        if metodo != "GET":
+            raise ErroHTTP(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET")
+        return await rotas[partes[0]](consulta, cabecalhos)
+
+    async def _gravar_dados_reais(self, campus_id: str, corpo: bytes):
+        try:
+            dados = json.loads(corpo)
+        except ValueError:
+            raise ErroHTTP(HTTPStatus.BAD_REQUEST, "Corpo deve ser JSON")
+        if not isinstance(dados, dict) or not isinstance(dados.get("registros"), list):
+            raise ErroHTTP(HTTPStatus.BAD_REQUEST, 'Corpo deve ser {"registros": [...]}')
+        registros = [registro_de_json(item) for item in dados["registros"]]
+
+        gravados = await self.coletor.gravar(campus_id, registros, bool(dados.get("verificar_versao", False)))
+        return HTTPStatus.OK, {"campus_id": campus_id, "gravados": [dados_reais_para_dict(d) for d in gravados]}, {}
+
+    async def _estado_atual(self, cabecalhos: Dict[str, str]) -> Tuple[Optional[EstadoCalculo], Dict[str, str]]:
+        # None: o cliente já tem a versão atual (If-None-Match)
+        estado = await asyncio.to_thread(self.cache.obter)
+        etag = f'"{estado.versao}"'
+        if cabecalhos.get("if-none-match") == etag:
+            return None, {"ETag": etag}
+        return estado, {"ETag": etag}
+
+    async def _resultados(self, consulta: Dict[str, List[str]], cabecalhos: Dict[str, str]):
+        estado, extras = await self._estado_atual(cabecalhos)
+        if estado is None:
+            return HTTPStatus.NOT_MODIFIED, None, extras
+
+        filtros = {d: consulta[d][0] for d in DIMENSOES_FILTRO if d in consulta}
+        tamanho = _inteiro(consulta, "tamanho", TAMANHO_PAGINA_PADRAO, 1, TAMANHO_PAGINA_MAXIMO)
+        # Páginas além da última vêm vazias (o total pode mudar entre duas consultas)
+        pagina = _inteiro(consulta, "pagina", 1, 1, sys.maxsize)
+        total = estado.indice.contar(filtros)
+        posicoes = estado.indice.posicoes(filtros, pagina - 1, tamanho)
+        return HTTPStatus.OK, {
+            "versao": estado.versao,
+            "filtros": filtros,
+            "pagina": pagina,
+            "tamanho": tamanho,
+            "total": total,
+            "total_paginas": max(1, -(-total // tamanho)),
+            "linhas": _linhas(estado.resultados, posicoes)
+        }, extras
+
+    async def _metricas(self, consulta: Dict[str, List[str]], cabecalhos: Dict[str, str]):
+        estado, extras = await self._estado_atual(cabecalhos)
+        if estado is None:
+            return HTTPStatus.NOT_MODIFIED, None, extras
+        return HTTPStatus.OK, {"versao": estado.versao, "metricas": estado.metricas}, extras
+
+    async def _saude(self, consulta: Dict[str, List[str]], cabecalhos: Dict[str, str]):
+        return HTTPStatus.OK, {
+            "status": "ok",
+            "em_execucao_s": round(time.time() - self.inicio, 3),
+            "requisicoes": self.requisicoes,
+            "pedidos_gravacao": self.coletor.pedidos,
+            "commits": self.coletor.commits
+        }, {}
+
+async def servir(data_manager, host: str, porta: int, janela: float = JANELA_COALESCENCIA):
+    servidor = await ServidorAPI(data_manager, janela).iniciar(host, porta)
+    enderecos = ", ".join(f"http://{s.getsockname()[0]}:{s.getsockname()[1]}" for s in servidor.sockets)
+    print(f"API em {enderecos}", flush=True)
+    async with servidor:
+        await servidor.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP local para dados reais e resultados")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--backend", choices=BACKENDS_ARMAZENAMENTO,
+                        help="Backend de armazenamento (padrão: CALC_PRECPT_BACKEND ou json)")
+    parser.add_argument("--janela-ms", type=float, default=JANELA_COALESCENCIA * 1000,
+                        help="Espera para agrupar gravações concorrentes (ms)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(servir(criar_data_manager(args.data_dir, args.backend), args.host, args.porta, args.janela_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+import json
 import uuid
 
-from models import Disciplina, Campus, DataManager, DadosReaisCampus
-from utils import calcular_resultados, gerar_relatorio_excel, calcular_metricas_resumo
+from models import Disciplina, Campus, ConflitoVersao, DadosReaisCampus, COLUNAS_DASHBOARD, criar_data_manager
+from utils import calcular_colunas, gerar_relatorio_excel_bytes, HORAS_PROFESSOR
+from incremental import Alteracao, CalculadoraIncremental
+from jobs import FilaRelatorios
+from importacao import importar_dados_reais
+from snapshots import SnapshotsResultados
+from paginacao import IndiceResultados
+from instrumentacao import medir, span
+from cenarios import Perturbacao, SimuladorCenarios
+from regras import RegrasStatus, carregar_regras, salvar_regras
+from historico import HistoricoPeriodos
+from catalogo import Catalogo
+from graficos import CacheFiguras, grafico_campus, grafico_status, limites_configurados
 
 # Configuração da página
 st.set_page_config(
@@ -19,10 +30,99 @@ st.set_page_config(
 # Inicializar o gerenciador de dados
 @st.cache_resource
 def get_data_manager():
-    return DataManager()
+    return criar_data_manager()
 
 data_manager = get_data_manager()
 
+# Fila de relatórios compartilhada entre as sessões
+@st.cache_resource
+def get_fila_relatorios():
+    return FilaRelatorios()
+
+fila_relatorios = get_fila_relatorios()
+
+# Snapshots dos resultados por versão dos dados
+@st.cache_resource
+def get_snapshots():
+    return SnapshotsResultados(data_manager)
+
+snapshots = get_snapshots()
+
+# Histórico de períodos (semestres)
+@st.cache_resource
+def get_historico():
+    return HistoricoPeriodos(data_manager.data_dir)
+
+historico = get_historico()
+
+# Figuras do dashboard por versão dos dados, compartilhadas entre as sessões
+@st.cache_resource
+def get_cache_figuras():
+    return CacheFiguras()
+
+cache_figuras = get_cache_figuras()
+
+def obter_regras():
+    """Regras de status do diretório de dados (arquivo pequeno, lido a cada execução)"""
+    return carregar_regras(data_manager.data_dir)
+
+# Catálogo (índices de disciplinas e campus) de cada versão dos dados, compartilhado entre as sessões
+@st.cache_resource(max_entries=4)
+def _catalogo_da_versao(versao):
+    return Catalogo(data_manager.load_disciplinas(), data_manager.load_manifesto())
+
+def obter_catalogo():
+    return _catalogo_da_versao(data_manager.versao_catalogo())
+
+def registrar_alteracoes(*alteracoes):
+    """Anota as alterações gravadas por esta sessão para o recálculo incremental"""
+    st.session_state.setdefault("alteracoes_pendentes", []).extend(alteracoes)
+    st.session_state["versao_apos_alteracoes"] = snapshots.versao(obter_regras())
+
+@medir("app.obter_resultados")
+def obter_resultados(disciplinas, campus_list):
+    """
+    Resultados, métricas e cubo de agregados do estado atual. Se desde o último
+    cálculo só houve alterações feitas por esta sessão, recalcula apenas as
+    linhas afetadas.
+    """
+    # Versão dos dados e das regras de status: mudar as regras também invalida o cálculo
+    regras = obter_regras()
+    versao = snapshots.versao(regras)
+    estado = st.session_state.get("calculo_incremental")
+    pendentes = st.session_state.pop("alteracoes_pendentes", [])
+    versao_esperada = st.session_state.pop("versao_apos_alteracoes", None)
+    
+    if estado is not None and estado["versao"] == versao:
+        return estado["resultados"], estado["metricas"], estado["calculadora"].cubo
+    
+    if estado is not None and pendentes and versao == versao_esperada:
+        calculadora = estado["calculadora"]
+        resultados, metricas = calculadora.atualizar(disciplinas, campus_list, pendentes)
+    else:
+        # Primeiro cálculo da sessão ou dados alterados por outra sessão/processo:
+        # parte do snapshot da versão atual quando ele existe. Os dados são relidos
+        # depois da versão (o cache de leitura torna isso barato), para que o cálculo
+        # gravado no snapshot nunca seja de dados mais antigos que ela
+        disciplinas = data_manager.load_disciplinas()
+        campus_list = data_manager.load_campus()
+        calculadora = CalculadoraIncremental(
+            disciplinas, campus_list, snapshots.carregar_ou_calcular(disciplinas, campus_list, regras, versao), regras
+        )
+        resultados, metricas = calculadora.resultados, calculadora.metricas
+    
+    st.session_state["calculo_incremental"] = {
+        "versao": versao,
+        "calculadora": calculadora,
+        "resultados": resultados,
+        "metricas": metricas
+    }
+    return resultados, metricas, calculadora.cubo
+
+def versao_calculo():
+    """Versão dos dados e das regras do último obter_resultados desta sessão"""
+    return st.session_state["calculo_incremental"]["versao"]
+
 # CSS personalizado
 st.markdown("""
 <style>
@@ -47,6 +147,7 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@medir("app.main")
 def main():
     st.title("📊 Calculadora de Carga Horária - Preceptores de Estágio")
     st.markdown("**Sistema de Gestão de Preceptores por Campus e Disciplina**")
@@ -56,7 +157,7 @@ def main():
         st.header("🧭 Navegação")
         page = st.selectbox(
             "Selecione a página:",
-            ["🏠 Dashboard", "⚙️ Configuração Corporativa", "🏫 Dados por Campus", "📋 Relatórios"]
+            ["🏠 Dashboard", "⚙️ Configuração Corporativa", "🏫 Dados por Campus", "📋 Relatórios", "🔮 Cenários", "📈 Histórico"]
         )
         
         st.markdown("---")
@@ -66,21 +167,42 @@ def main():
         2. **Dados por Campus**: Cada campus preenche dados reais
         3. **Dashboard**: Visualize métricas e análises
         4. **Relatórios**: Gere relatórios Excel
+        5. **Cenários**: Simule variações de matrículas e CH
+        6. **Histórico**: Registre semestres e compare períodos
         """)
     
     # Carregar dados
+    catalogo = obter_catalogo()
+    
+    if page == "🏫 Dados por Campus":
+        # Só o catálogo (manifesto dos campus); os dados reais são lidos apenas do campus selecionado
+        show_dados_campus(catalogo)
+        return
+    
     disciplinas = data_manager.load_disciplinas()
     campus_list = data_manager.load_campus()
     
     if page == "🏠 Dashboard":
         show_dashboard(disciplinas, campus_list)
     elif page == "⚙️ Configuração Corporativa":
-        show_configuracao_corporativa(disciplinas, campus_list)
-    elif page == "🏫 Dados por Campus":
-        show_dados_campus(disciplinas, campus_list)
+        show_configuracao_corporativa(disciplinas, campus_list, catalogo)
     elif page == "📋 Relatórios":
         show_relatorios(disciplinas, campus_list)
+    elif page == "🔮 Cenários":
+        show_cenarios(disciplinas, campus_list, catalogo)
+    elif page == "📈 Histórico":
+        show_historico(disciplinas, campus_list)
+
+@medir("app.obter_indice")
+def obter_indice(resultados):
+    """Índice de filtros/paginação do resultado atual, reaproveitado entre reruns"""
+    estado = st.session_state.get("indice_resultados")
+    if estado is None or estado.resultados is not resultados:
+        estado = IndiceResultados(resultados)
+        st.session_state["indice_resultados"] = estado
+    return estado
 
+@medir("pagina.show_dashboard")
 def show_dashboard(disciplinas, campus_list):
     st.header("🏠 Dashboard - Visão Geral")
     
@@ -88,16 +210,13 @@ def show_dashboard(disciplinas, campus_list):
         st.warning("⚠️ Configure primeiro as disciplinas e campus nas páginas de configuração.")
         return
     
-    # Calcular resultados
-    resultados = calcular_resultados(disciplinas, campus_list)
+    # Calcular resultados, métricas resumo e agregados
+    resultados, metricas, cubo = obter_resultados(disciplinas, campus_list)
     
     if not resultados:
         st.info("ℹ️ Nenhum dado encontrado. Verifique se os campus têm disciplinas associadas.")
         return
     
-    # Métricas resumo
-    metricas = calcular_metricas_resumo(resultados)
-    
     # KPIs principais
     col1, col2, col3, col4 = st.columns(4)
     
@@ -154,69 +273,54 @@ def show_dashboard(disciplinas, campus_list):
     col1, col2 = st.columns(2)
     
     with col1:
-        # Gráfico de barras por campus
-        df_resultados = pd.DataFrame([
-            {
-                "Campus": r.campus,
-                "Curso": r.curso,
-                "Disciplina": r.disciplina_nome,
-                "CH Prevista": r.ch_prevista,
-                "CH Real": r.ch_real,
-                "Diferença": r.diferenca_ch,
-                "Status": r.status
-            }
-            for r in resultados
-        ])
-        
-        resumo_campus = df_resultados.groupby('Campus').agg({
-            'CH Prevista': 'sum',
-            'CH Real': 'sum',
-            'Diferença': 'sum'
-        }).reset_index()
-        
-        fig_campus = px.bar(
-            resumo_campus,
-            x='Campus',
-            y=['CH Prevista', 'CH Real'],
-            title="Carga Horária por Campus",
-            barmode='group'
-        )
-        st.plotly_chart(fig_campus, use_container_width=True)
+        with span("dashboard.grafico_campus"):
+            # Maiores campus e "Outros" (roll-up do cubo), figura guardada por versão dos dados
+            top_n, limite_webgl = limites_configurados()
+            if 0 < top_n < len(campus_list) and st.checkbox("Mostrar todos os campus", key="grafico_todos_campus"):
+                top_n = 0
+            fig_campus = grafico_campus(cache_figuras, versao_calculo(), cubo, top_n, limite_webgl)
+            st.plotly_chart(fig_campus, use_container_width=True)
     
     with col2:
-        # Gráfico de pizza do status
-        status_counts = df_resultados['Status'].value_counts()
-        colors = {'Excesso': '#d62728', 'Falta': '#ff7f0e', 'Adequado': '#2ca02c'}
-        
-        fig_status = px.pie(
-            values=status_counts.values,
-            names=status_counts.index,
-            title="Distribuição por Status",
-            color=status_counts.index,
-            color_discrete_map=colors
-        )
-        st.plotly_chart(fig_status, use_container_width=True)
+        with span("dashboard.grafico_status"):
+            # Gráfico de pizza do status
+            fig_status = grafico_status(cache_figuras, versao_calculo(), cubo)
+            st.plotly_chart(fig_status, use_container_width=True)
     
     # Tabela detalhada
     st.markdown("### 📋 Detalhamento por Disciplina")
     
+    # Índices por Campus/Curso/Status montados uma vez por resultado
+    indice = obter_indice(resultados)
+    
     # Filtros
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns([3, 3, 3, 1])
     with col1:
-        campus_filter = st.selectbox("Filtrar por Campus", ["Todos"] + list(df_resultados['Campus'].unique()))
+        campus_filter = st.selectbox("Filtrar por Campus", ["Todos"] + indice.categorias("campus"))
     with col2:
-        curso_filter = st.selectbox("Filtrar por Curso", ["Todos"] + list(df_resultados['Curso'].unique()))
+        curso_filter = st.selectbox("Filtrar por Curso", ["Todos"] + indice.categorias("curso"))
     with col3:
-        status_filter = st.selectbox("Filtrar por Status", ["Todos"] + list(df_resultados['Status'].unique()))
+        status_filter = st.selectbox("Filtrar por Status", ["Todos"] + indice.categorias("status"))
+    with col4:
+        tamanho_pagina = st.selectbox("Linhas", [25, 50, 100, 250], index=1)
     
-    # Aplicar filtros
-    df_filtered = df_resultados.copy()
-    if campus_filter != "Todos":
-        df_filtered = df_filtered[df_filtered['Campus'] == campus_filter]
-    if curso_filter != "Todos":
-        df_filtered = df_filtered[df_filtered['Curso'] == curso_filter]
-    if status_filter != "Todos":
-        df_filtered = df_filtered[df_filtered['Status'] == status_filter]
+    filtros = {
+        dimensao: valor
+        for dimensao, valor in (("campus", campus_filter), ("curso", curso_filter), ("status", status_filter))
+        if valor != "Todos"
+    }
+    total_filtrado = indice.contar(filtros)
+    total_paginas = max(1, -(-total_filtrado // tamanho_pagina))
+    
+    # A página volta para 1 sempre que os filtros mudam
+    pagina = st.number_input(
+        "Página", min_value=1, max_value=total_paginas, value=1, step=1,
+        key=f"pagina_{campus_filter}_{curso_filter}_{status_filter}_{tamanho_pagina}"
+    )
+    # Coluna de faixa só quando as regras definem faixas além dos status
+    colunas_tabela = {**COLUNAS_DASHBOARD, "faixa": "Faixa"} if obter_regras().faixas else COLUNAS_DASHBOARD
+    with span("dashboard.tabela_dataframe"):
+        df_pagina = indice.pagina(filtros, pagina - 1, tamanho_pagina, colunas_tabela)
     
     # Colorir a tabela baseado no status
     def color_status(val):
@@ -228,14 +332,18 @@ def show_dashboard(disciplinas, campus_list):
             return 'background-color: #e8f5e8'
         return ''
     
-    styled_df = df_filtered.style.applymap(color_status, subset=['Status'])
-    st.dataframe(styled_df, use_container_width=True)
+    # O estilo é aplicado apenas às linhas visíveis
+    with span("dashboard.tabela_estilo"):
+        styled_df = df_pagina.style.applymap(color_status, subset=['Status'])
+        st.dataframe(styled_df, use_container_width=True)
+    st.caption(f"{total_filtrado} disciplinas · página {pagina} de {total_paginas}")
 
-def show_configuracao_corporativa(disciplinas, campus_list):
+@medir("pagina.show_configuracao_corporativa")
+def show_configuracao_corporativa(disciplinas, campus_list, catalogo):
     st.header("⚙️ Configuração Corporativa")
     st.markdown("**Área restrita para configuração de dados previstos**")
     
-    tab1, tab2 = st.tabs(["📚 Disciplinas", "🏫 Campus"])
+    tab1, tab2, tab3 = st.tabs(["📚 Disciplinas", "🏫 Campus", "📏 Regras de Status"])
     
     with tab1:
         st.subheader("Gestão de Disciplinas")
@@ -267,6 +375,7 @@ def show_configuracao_corporativa(disciplinas, campus_list):
                         )
                         disciplinas.append(nova_disciplina)
                         data_manager.save_disciplinas(disciplinas)
+                        registrar_alteracoes(Alteracao("disciplina", disciplina_id=nova_disciplina.id))
                         st.success("✅ Disciplina adicionada com sucesso!")
                         st.rerun()
                     else:
@@ -289,8 +398,9 @@ def show_configuracao_corporativa(disciplinas, campus_list):
                     
                     with col3:
                         if st.button("🗑️ Remover", key=f"remove_disc_{i}"):
-                            disciplinas.pop(i)
+                            removida = disciplinas.pop(i)
                             data_manager.save_disciplinas(disciplinas)
+                            registrar_alteracoes(Alteracao("disciplina", disciplina_id=removida.id))
                             st.success("Disciplina removida!")
                             st.rerun()
         else:
@@ -305,7 +415,7 @@ def show_configuracao_corporativa(disciplinas, campus_list):
                 nome_campus = st.text_input("Nome do Campus*")
                 disciplinas_selecionadas = st.multiselect(
                     "Disciplinas oferecidas neste campus:",
-                    options=[f"{d.nome} - {d.curso}" for d in disciplinas],
+                    options=catalogo.rotulos(),
                     help="Selecione quais disciplinas são oferecidas neste campus"
                 )
                 
@@ -314,20 +424,15 @@ def show_configuracao_corporativa(disciplinas, campus_list):
                 if submitted:
                     if nome_campus:
                         # Mapear nomes selecionados para IDs
-                        disc_ids = []
-                        for disc_nome in disciplinas_selecionadas:
-                            for disc in disciplinas:
-                                if f"{disc.nome} - {disc.curso}" == disc_nome:
-                                    disc_ids.append(disc.id)
-                                    break
+                        disc_ids = [catalogo.disciplina_por_rotulo(rotulo).id for rotulo in disciplinas_selecionadas]
                         
                         novo_campus = Campus(
                             id=str(uuid.uuid4()),
                             nome=nome_campus,
                             disciplinas=disc_ids
                         )
-                        campus_list.append(novo_campus)
-                        data_manager.save_campus(campus_list)
+                        data_manager.adicionar_campus(novo_campus)
+                        registrar_alteracoes(Alteracao("campus", campus_id=novo_campus.id))
                         st.success("✅ Campus adicionado com sucesso!")
                         st.rerun()
                     else:
@@ -343,36 +448,66 @@ def show_configuracao_corporativa(disciplinas, campus_list):
                     with col1:
                         if campus.disciplinas:
                             st.write("**Disciplinas oferecidas:**")
-                            for disc_id in campus.disciplinas:
-                                disc = next((d for d in disciplinas if d.id == disc_id), None)
-                                if disc:
-                                    st.write(f"• {disc.nome} - {disc.curso}")
+                            for disc in catalogo.disciplinas_do_campus(campus.id):
+                                st.write(f"• {disc.nome} - {disc.curso}")
                         else:
                             st.write("Nenhuma disciplina associada.")
                     
                     with col2:
                         if st.button("🗑️ Remover", key=f"remove_campus_{i}"):
-                            campus_list.pop(i)
-                            data_manager.save_campus(campus_list)
+                            data_manager.remover_campus(campus.id)
+                            registrar_alteracoes(Alteracao("campus", campus_id=campus.id))
                             st.success("Campus removido!")
                             st.rerun()
         else:
             st.info("ℹ️ Nenhum campus cadastrado ainda.")
+    
+    with tab3:
+        st.subheader("Regras de Status")
+        st.markdown("""
+        - **tolerancias**: a disciplina é *Adequado* se |diferença| ≤ máx(`relativa` × CH prevista, `horas`).
+          Use `campus` (nome) e/ou `curso` para regras específicas; a última regra que se aplica vale.
+        - **faixas**: subdivisões de um status (`grupo`: Adequado, Excesso ou Falta) a partir de
+          |diferença| ≥ `min_horas` e ≥ `min_relativa` × CH prevista; a primeira que se aplica vale.
+        """)
+        
+        with st.form("regras_status"):
+            texto_regras = st.text_area(
+                "Regras (JSON)",
+                value=json.dumps(obter_regras().para_dict(), ensure_ascii=False, indent=2),
+                height=320
+            )
+            submitted = st.form_submit_button("💾 Salvar Regras")
+            
+            if submitted:
+                try:
+                    regras = RegrasStatus.de_dict(json.loads(texto_regras))
+                except (ValueError, TypeError, AttributeError) as e:
+                    st.error(f"❌ Regras inválidas: {str(e)}")
+                else:
+                    salvar_regras(data_manager.data_dir, regras)
+                    st.success("✅ Regras salvas! Os resultados serão recalculados.")
+                    st.rerun()
 
-def show_dados_campus(disciplinas, campus_list):
+@medir("pagina.show_dados_campus")
+def show_dados_campus(catalogo):
     st.header("🏫 Dados por Campus")
     st.markdown("**Área para preenchimento de dados reais por campus**")
     
-    if not campus_list:
+    if not catalogo.campus:
         st.warning("⚠️ Nenhum campus cadastrado. Configure primeiro na aba 'Configuração Corporativa'.")
         return
     
     # Selecionar campus
-    campus_nomes = [c.nome for c in campus_list]
+    campus_nomes = catalogo.nomes_campus()
     campus_selecionado = st.selectbox("Selecione o Campus:", campus_nomes)
     
     if campus_selecionado:
-        campus = next(c for c in campus_list if c.nome == campus_selecionado)
+        entrada = catalogo.campus_por_nome(campus_selecionado)
+        campus = data_manager.load_campus_por_id(entrada.id)
+        if campus is None:
+            st.warning("⚠️ Campus removido. Recarregue a página.")
+            return
         
         st.subheader(f"📝 Preenchimento de Dados - {campus.nome}")
         
@@ -380,9 +515,58 @@ def show_dados_campus(disciplinas, campus_list):
             st.warning("⚠️ Este campus não possui disciplinas associadas.")
             return
         
+        # Importação em lote a partir de planilha (o resultado é mostrado depois do rerun que recarrega os formulários)
+        chave_resultado = f"resultado_importacao_{campus.id}"
+        with st.expander("📤 Importar Dados em Lote (CSV/XLSX)", expanded=chave_resultado in st.session_state):
+            st.markdown(
+                "Colunas aceitas: `disciplina_id` **ou** `disciplina` + `curso`, "
+                "`alunos_reais` (obrigatória), `ch_real_total` e `observacoes` (opcionais)."
+            )
+            arquivo = st.file_uploader("Arquivo", type=["csv", "xlsx"], key=f"importacao_{campus.id}")
+            
+            if arquivo is not None and st.button("📥 Importar", key=f"importar_{campus.id}"):
+                try:
+                    resultado = importar_dados_reais(arquivo, arquivo.name, campus, catalogo.disciplinas, data_manager)
+                except Exception as e:
+                    st.error(f"❌ Erro ao ler o arquivo: {str(e)}")
+                else:
+                    st.session_state[chave_resultado] = resultado
+                    if resultado.registros_gravados:
+                        # O lote substitui os dados de cada disciplina importada
+                        registrar_alteracoes(*[
+                            Alteracao("dados_reais", campus_id=campus.id, disciplina_id=disc_id)
+                            for disc_id in campus.disciplinas
+                        ])
+                        # Os campos dos formulários guardam os valores de antes da importação, e o
+                        # formulário a versão lida: sem descartá-los, o próximo salvamento daria conflito
+                        for disc_id in campus.disciplinas:
+                            for prefixo in ("alunos", "ch", "obs"):
+                                st.session_state.pop(f"{prefixo}_{disc_id}", None)
+                        st.session_state.pop(f"importacao_{campus.id}", None)
+                        st.rerun()
+            
+            resultado = st.session_state.pop(chave_resultado, None)
+            if resultado is not None:
+                st.success(
+                    f"✅ {resultado.linhas_validas} de {resultado.linhas_lidas} linhas válidas; "
+                    f"{resultado.registros_gravados} disciplinas atualizadas."
+                )
+                if resultado.relatorio_erros:
+                    st.warning(f"⚠️ {resultado.linhas_invalidas} linhas rejeitadas.")
+                    st.download_button(
+                        label="⬇️ Baixar Relatório de Erros",
+                        data=resultado.relatorio_erros,
+                        file_name=f"erros_importacao_{campus.nome}.csv",
+                        mime="text/csv"
+                    )
+        
+        # Status de cada disciplina do campus, com as mesmas regras do cálculo geral
+        resultados_campus = calcular_colunas(catalogo.disciplinas, [campus], obter_regras())
+        linha_da_disciplina = {disc_id: i for i, disc_id in enumerate(resultados_campus.coluna("disciplina_id"))}
+        
         # Formulário para cada disciplina
         for disc_id in campus.disciplinas:
-            disciplina = next((d for d in disciplinas if d.id == disc_id), None)
+            disciplina = catalogo.disciplina(disc_id)
             if not disciplina:
                 continue
             
@@ -428,31 +612,44 @@ def show_dados_campus(disciplinas, campus_list):
                         submitted = st.form_submit_button("💾 Salvar Dados")
                         
                         if submitted:
-                            campus.dados_reais[disc_id] = DadosReaisCampus(
+                            # Versão lida: a gravação é recusada se outra pessoa salvou esta disciplina nesse meio tempo
+                            novos_dados = DadosReaisCampus(
                                 disciplina_id=disc_id,
                                 alunos_reais=alunos_reais,
                                 ch_real_total=ch_real_total,
-                                observacoes=observacoes
+                                observacoes=observacoes,
+                                versao=dados_atuais.versao
                             )
-                            data_manager.save_campus(campus_list)
-                            st.success("✅ Dados salvos com sucesso!")
-                            st.rerun()
+                            try:
+                                data_manager.save_dados_reais(campus.id, novos_dados, verificar_versao=True)
+                            except ConflitoVersao:
+                                st.error(
+                                    "❌ Os dados desta disciplina foram alterados por outra pessoa depois que a página "
+                                    "foi carregada. Recarregue a página para ver os valores atuais antes de salvar."
+                                )
+                            else:
+                                registrar_alteracoes(Alteracao("dados_reais", campus_id=campus.id, disciplina_id=disc_id))
+                                st.success("✅ Dados salvos com sucesso!")
+                                st.rerun()
                 
                 # Mostrar cálculo automático
                 dados_atual = campus.dados_reais.get(disc_id, DadosReaisCampus(disc_id))
                 ch_calculada = dados_atual.alunos_reais * disciplina.ch_por_aluno
-                ch_final = dados_atual.ch_real_total if dados_atual.ch_real_total > 0 else ch_calculada
-                diferenca = ch_final - disciplina.ch_prevista
+                resultado = resultados_campus[linha_da_disciplina[disc_id]]
                 
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     st.metric("CH Calculada", f"{ch_calculada:.1f}h")
                 with col2:
-                    st.metric("CH Final", f"{ch_final:.1f}h")
+                    st.metric("CH Final", f"{resultado.ch_real:.1f}h")
                 with col3:
-                    delta_color = "normal" if abs(diferenca) <= disciplina.ch_prevista * 0.05 else "off"
-                    st.metric("Diferença", f"{diferenca:.1f}h", delta=f"{diferenca:.1f}h")
+                    delta_color = "normal" if resultado.status == "Adequado" else "off"
+                    st.metric(
+                        "Diferença", f"{resultado.diferenca_ch:.1f}h", delta=f"{resultado.diferenca_ch:.1f}h",
+                        delta_color=delta_color, help=f"Status: {resultado.faixa}"
+                    )
 
+@medir("pagina.show_relatorios")
 def show_relatorios(disciplinas, campus_list):
     st.header("📋 Relatórios e Análises")
     
@@ -461,7 +658,7 @@ def show_relatorios(disciplinas, campus_list):
         return
     
     # Calcular resultados
-    resultados = calcular_resultados(disciplinas, campus_list)
+    resultados, _, cubo = obter_resultados(disciplinas, campus_list)
     
     if not resultados:
         st.info("ℹ️ Nenhum dado encontrado para gerar relatórios.")
@@ -473,48 +670,43 @@ def show_relatorios(disciplinas, campus_list):
         st.subheader("📊 Análise de Oportunidades")
         
         # Disciplinas em excesso (oportunidades de desligamento)
-        excesso = [r for r in resultados if r.status == "Excesso"]
+        status = resultados.coluna("status")
+        excesso = resultados.filtrar(status == "Excesso")
         if excesso:
             st.markdown("### 🔴 Oportunidades de Desligamento")
-            excesso_sorted = sorted(excesso, key=lambda x: x.diferenca_ch, reverse=True)
+            excesso_sorted = excesso.ordenar("diferenca_ch", decrescente=True)
             
             for r in excesso_sorted[:10]:  # Top 10
                 st.markdown(f"""
                 **{r.disciplina_nome}** ({r.curso}) - *{r.campus}*  
-                💰 Economia potencial: **{r.diferenca_ch:.1f}h** ({r.diferenca_ch/40:.1f} professores equivalentes)  
+                💰 Economia potencial: **{r.diferenca_ch:.1f}h** ({r.diferenca_ch/HORAS_PROFESSOR:.1f} professores equivalentes)  
                 📊 Eficiência: {r.eficiencia:.1f}%
                 """)
         
         # Disciplinas em falta (necessidades de contratação)
-        falta = [r for r in resultados if r.status == "Falta"]
+        falta = resultados.filtrar(status == "Falta")
         if falta:
             st.markdown("### 🟡 Necessidades de Contratação")
-            falta_sorted = sorted(falta, key=lambda x: x.diferenca_ch)
+            falta_sorted = falta.ordenar("diferenca_ch")
             
             for r in falta_sorted[:10]:  # Top 10
                 st.markdown(f"""
                 **{r.disciplina_nome}** ({r.curso}) - *{r.campus}*  
-                📈 Necessidade: **{abs(r.diferenca_ch):.1f}h** ({abs(r.diferenca_ch)/40:.1f} professores equivalentes)  
+                📈 Necessidade: **{abs(r.diferenca_ch):.1f}h** ({abs(r.diferenca_ch)/HORAS_PROFESSOR:.1f} professores equivalentes)  
                 📊 Eficiência: {r.eficiencia:.1f}%
                 """)
     
     with col2:
         st.subheader("📥 Exportar Dados")
         
-        if st.button("📊 Gerar Relatório Excel", type="primary"):
-            try:
-                filename = gerar_relatorio_excel(resultados, f"relatorio_preceptores_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
-                
-                with open(filename, "rb") as file:
-                    st.download_button(
-                        label="⬇️ Baixar Relatório Excel",
-                        data=file.read(),
-                        file_name=filename,
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-                st.success("✅ Relatório gerado com sucesso!")
-            except Exception as e:
-                st.error(f"❌ Erro ao gerar relatório: {str(e)}")
+        # Pedidos para os mesmos dados reaproveitam o job em andamento ou já pronto
+        chave_relatorio = f"excel:{snapshots.versao(obter_regras())}"
+        job = fila_relatorios.obter(chave_relatorio)
+        acompanhando = job is not None and job.em_andamento
+        # Enquanto o relatório é gerado, só este painel é reexecutado periodicamente (sem bloquear a sessão)
+        st.fragment(painel_relatorio_excel, run_every=INTERVALO_PROGRESSO if acompanhando else None)(
+            chave_relatorio, resultados, cubo, acompanhando
+        )
         
         st.markdown("---")
         st.markdown("### 📋 O relatório Excel contém:")
@@ -525,5 +717,248 @@ def show_relatorios(disciplinas, campus_list):
         - **Necessidades Contratação**: Disciplinas em falta
         """)
 
+# Intervalo (s) entre as consultas ao andamento de um relatório
+INTERVALO_PROGRESSO = 0.5
+
+def painel_relatorio_excel(chave_relatorio, resultados, cubo, acompanhando):
+    """Botão, progresso e download do relatório Excel (executado como fragmento)"""
+    if st.button("📊 Gerar Relatório Excel", type="primary"):
+        # Cópia do cubo: o job roda em outra thread e o da sessão segue sendo atualizado
+        cubo_relatorio = cubo.copia()
+        fila_relatorios.enviar(
+            chave_relatorio,
+            lambda progresso: gerar_relatorio_excel_bytes(resultados, progresso, cubo=cubo_relatorio),
+            nome_arquivo=f"relatorio_preceptores_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        )
+    
+    job = fila_relatorios.obter(chave_relatorio)
+    if job is None:
+        return
+    if job.em_andamento != acompanhando:
+        # Job iniciado ou terminado: a página inteira é refeita para ligar ou desligar a consulta periódica
+        st.rerun()
+    
+    if job.em_andamento:
+        st.progress(job.progresso, text=f"⏳ Gerando relatório... {job.progresso:.0%}")
+    elif job.status == "concluido":
+        st.download_button(
+            label="⬇️ Baixar Relatório Excel",
+            data=job.resultado,
+            file_name=job.nome_arquivo,
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+        st.success("✅ Relatório gerado com sucesso!")
+    else:
+        st.error(f"❌ Erro ao gerar relatório: {job.erro}")
+
+# Rótulos dos parâmetros e das colunas da página de cenários
+PARAMETROS_CENARIO_ROTULOS = {
+    "alunos_reais": "Alunos reais (matrículas)",
+    "ch_por_aluno": "CH por aluno",
+    "ch_prevista": "CH prevista",
+    "ch_real_informada": "CH real informada"
+}
+COLUNAS_CENARIO = {
+    "campus": "Campus",
+    "disciplina_nome": "Disciplina",
+    "curso": "Curso",
+    "diferenca_ch_base": "Diferença Atual (h)",
+    "diferenca_ch_media": "Diferença Média (h)",
+    "diferenca_ch_p05": "Diferença P5 (h)",
+    "diferenca_ch_p95": "Diferença P95 (h)",
+    "prob_adequado": "P(Adequado)",
+    "prob_excesso": "P(Excesso)",
+    "prob_falta": "P(Falta)",
+    "disciplinas_adequado_media": "Adequadas (média)",
+    "disciplinas_excesso_media": "Em Excesso (média)",
+    "disciplinas_falta_media": "Em Falta (média)",
+    "professores_media": "Professores Equivalentes (média)"
+}
+
+def obter_simulador(disciplinas, campus_list):
+    """Simulador de cenários dos dados atuais, reaproveitado enquanto os dados não mudam"""
+    regras = obter_regras()
+    versao = snapshots.versao(regras)
+    estado = st.session_state.get("simulador_cenarios")
+    if estado is None or estado["versao"] != versao:
+        estado = {"versao": versao, "simulador": SimuladorCenarios(disciplinas, campus_list, regras)}
+        st.session_state["simulador_cenarios"] = estado
+    return estado["simulador"]
+
+@medir("pagina.show_cenarios")
+def show_cenarios(disciplinas, campus_list, catalogo):
+    st.header("🔮 Cenários")
+    st.markdown("**Simule variações de matrículas e carga horária sem alterar os dados cadastrados**")
+    
+    if not disciplinas or not campus_list:
+        st.warning("⚠️ Configure primeiro as disciplinas e campus.")
+        return
+    
+    with st.form("cenario"):
+        col1, col2 = st.columns(2)
+        with col1:
+            parametro = st.selectbox(
+                "Parâmetro", list(PARAMETROS_CENARIO_ROTULOS), format_func=PARAMETROS_CENARIO_ROTULOS.get
+            )
+            campus = st.selectbox("Campus", ["Todos"] + sorted(set(catalogo.nomes_campus())))
+            curso = st.selectbox("Curso", ["Todos"] + catalogo.cursos())
+        
+        with col2:
+            variacao = st.number_input("Variação (%)", min_value=-100.0, value=-10.0, step=1.0)
+            incerteza = st.number_input("Incerteza - desvio padrão (%)", min_value=0.0, value=5.0, step=1.0)
+            n_amostras = st.number_input("Amostras", min_value=1, max_value=20000, value=1000, step=100)
+            por_linha = st.checkbox(
+                "Sortear a variação por disciplina", value=True,
+                help="Desmarcado, cada amostra aplica a mesma variação a todas as disciplinas selecionadas"
+            )
+        
+        submitted = st.form_submit_button("Simular", type="primary")
+    
+    if submitted:
+        perturbacao = Perturbacao(
+            parametro,
+            fator=1 + variacao / 100,
+            desvio=incerteza / 100,
+            campus=None if campus == "Todos" else campus,
+            curso=None if curso == "Todos" else curso,
+            por_linha=por_linha
+        )
+        with st.spinner("Simulando..."):
+            st.session_state["resultado_cenario"] = obter_simulador(disciplinas, campus_list).simular(
+                [perturbacao], n_amostras=int(n_amostras)
+            )
+    
+    resultado = st.session_state.get("resultado_cenario")
+    if resultado is None:
+        return
+    
+    total = resultado.total
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Diferença Atual", f"{total['diferenca_ch_base']:.1f}h")
+    with col2:
+        st.metric(
+            "Diferença no Cenário (média)",
+            f"{total['diferenca_ch_media']:.1f}h",
+            delta=f"{total['diferenca_ch_media'] - total['diferenca_ch_base']:.1f}h"
+        )
+    with col3:
+        st.metric("Professores Equivalentes (média)", f"{total['professores_media']:.1f}")
+    st.caption(
+        f"Intervalo de 90%: {total['diferenca_ch_p05']:.1f}h a {total['diferenca_ch_p95']:.1f}h · "
+        f"{resultado.n_amostras} amostras"
+    )
+    
+    st.markdown("### 🏫 Por Campus")
+    st.dataframe(resultado.por_campus.rename(columns=COLUNAS_CENARIO), use_container_width=True)
+    
+    st.markdown("### 📋 Disciplinas mais afetadas")
+    por_linha = resultado.por_linha
+    impacto = (por_linha["diferenca_ch_media"] - por_linha["diferenca_ch_base"]).abs()
+    mais_afetadas = por_linha.loc[impacto.sort_values(ascending=False).index[:100]]
+    st.dataframe(
+        mais_afetadas[[coluna for coluna in COLUNAS_CENARIO if coluna in mais_afetadas]].rename(columns=COLUNAS_CENARIO),
+        use_container_width=True
+    )
+
+# Rótulos das colunas da comparação entre períodos
+COLUNAS_HISTORICO = {
+    "campus": "Campus",
+    "disciplina_nome": "Disciplina",
+    "curso": "Curso",
+    "situacao": "Situação",
+    "ch_real_a": "CH Real (A)",
+    "ch_real_b": "CH Real (B)",
+    "var_ch_real": "Δ CH Real",
+    "var_pct_ch_real": "Δ CH Real %",
+    "ch_prevista_a": "CH Prevista (A)",
+    "ch_prevista_b": "CH Prevista (B)",
+    "var_ch_prevista": "Δ CH Prevista",
+    "alunos_reais_a": "Alunos Reais (A)",
+    "alunos_reais_b": "Alunos Reais (B)",
+    "var_alunos_reais": "Δ Alunos Reais",
+    "var_pct_alunos_reais": "Δ Alunos Reais %"
+}
+
+@medir("pagina.show_historico")
+def show_historico(disciplinas, campus_list):
+    st.header("📈 Histórico")
+    st.markdown("**Registre o fechamento de cada semestre e compare períodos**")
+    
+    with st.expander("📌 Registrar Período", expanded=False):
+        with st.form("registrar_periodo"):
+            periodo = st.text_input("Período*", placeholder="2025.1")
+            st.caption("Grava as disciplinas e os dados reais atuais como o período mais recente.")
+            submitted = st.form_submit_button("Registrar Período")
+            
+            if submitted:
+                try:
+                    historico.registrar_periodo(periodo, disciplinas, campus_list, obter_regras())
+                except ValueError as e:
+                    st.error(f"❌ {str(e)}")
+                else:
+                    st.success(f"✅ Período {periodo.strip()} registrado!")
+                    st.rerun()
+    
+    periodos = [p["periodo"] for p in historico.periodos()]
+    if not periodos:
+        st.info("ℹ️ Nenhum período registrado ainda.")
+        return
+    
+    # Linha do tempo a partir dos totais do índice
+    linha_do_tempo = historico.linha_do_tempo().rename(columns={
+        "periodo": "Período", "total_ch_prevista": "CH Prevista", "total_ch_real": "CH Real"
+    })
+    fig_linha = px.line(
+        linha_do_tempo, x="Período", y=["CH Prevista", "CH Real"], markers=True, title="Carga Horária por Período"
+    )
+    st.plotly_chart(fig_linha, use_container_width=True)
+    
+    if len(periodos) < 2:
+        st.info("ℹ️ Registre ao menos dois períodos para comparar.")
+        return
+    
+    st.markdown("### 🔁 Comparação entre Períodos")
+    col1, col2, col3 = st.columns([2, 2, 2])
+    with col1:
+        periodo_a = st.selectbox("Período A", periodos, index=len(periodos) - 2)
+    with col2:
+        periodo_b = st.selectbox("Período B", periodos, index=len(periodos) - 1)
+    with col3:
+        nivel = st.radio("Nível", ["campus", "disciplina"], format_func=str.capitalize, horizontal=True)
+    
+    comparacao = historico.comparar(periodo_a, periodo_b, nivel)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric(
+            f"CH Real em {periodo_b}", f"{comparacao['ch_real_b'].sum():.1f}h",
+            delta=f"{comparacao['var_ch_real'].sum():.1f}h"
+        )
+    with col2:
+        st.metric(
+            f"Alunos Reais em {periodo_b}", f"{int(comparacao['alunos_reais_b'].sum())}",
+            delta=f"{int(comparacao['var_alunos_reais'].sum())}"
+        )
+    
+    if nivel == "campus":
+        fig_variacao = px.bar(
+            comparacao.sort_values("var_ch_real"), x="campus", y="var_ch_real",
+            labels={"campus": "Campus", "var_ch_real": "Δ CH Real"},
+            title=f"Variação de CH Real por Campus ({periodo_a} → {periodo_b})"
+        )
+        st.plotly_chart(fig_variacao, use_container_width=True)
+    else:
+        campus_filtro = st.selectbox("Filtrar por Campus", ["Todos"] + sorted(comparacao["campus"].unique()))
+        if campus_filtro != "Todos":
+            comparacao = comparacao[comparacao["campus"] == campus_filtro]
+        # Maiores variações primeiro
+        comparacao = comparacao.loc[comparacao["var_ch_real"].abs().sort_values(ascending=False).index[:200]]
+    
+    st.dataframe(
+        comparacao[[coluna for coluna in COLUNAS_HISTORICO if coluna in comparacao]].rename(columns=COLUNAS_HISTORICO),
+        use_container_width=True
+    )
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+"""
+Benchmarks da calculadora de preceptores sobre dados sintéticos
+(exemplo_dados.gerar_dados_sinteticos).
+
+- engines: compara o laço original com a engine vetorizada;
+- suite: mede tempo e pico de memória de DataManager (load/save),
+  calcular_resultados, calcular_metricas_resumo e gerar_relatorio_excel
+  em faixas de tamanho, grava baselines e aponta regressões;
+- codecs: tempo de gravação/leitura e tamanho dos arquivos por codec;
+- paralelo: engine vetorizada em um processo vs. pool de processos;
+- concorrencia: editores simultâneos gravando dados reais com verificação
+  de versão; confere que nenhuma gravação se perde e mede a vazão por
+  número de campus distintos editados;
+- api: teste de carga da API HTTP local (api.py): clientes simultâneos
+  gravando lotes de dados reais e consultando resultados e métricas;
+  confere as gravações e as métricas servidas ao final.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional, Tuple
+
+from api import ServidorAPI
+from exemplo_dados import gerar_dados_sinteticos
+from models import BACKENDS_ARMAZENAMENTO, Campus, ConflitoVersao, DadosReaisCampus, DataManager, criar_data_manager
+from regras import carregar_regras
+from serializacao import CODECS
+from utils import calcular_resultados, calcular_colunas, calcular_metricas_resumo, gerar_relatorio_excel
+
+# Faixas de tamanho da suite: campus, disciplinas cadastradas e média por campus
+TAMANHOS = {
+    "pequeno": {"campus": 10, "disciplinas": 120, "por_campus": 30},
+    "medio": {"campus": 100, "disciplinas": 600, "por_campus": 80},
+    "grande": {"campus": 400, "disciplinas": 2000, "por_campus": 150}
+}
+
+ARQUIVO_BASELINE = "benchmark_baseline.json"
+
+# Piora relativa a partir da qual uma medição é considerada regressão
+TOLERANCIA_REGRESSAO = 0.25
+
+# Diferenças absolutas abaixo destes valores são ruído, não regressão
+MINIMO_TEMPO_S = 0.005
+MINIMO_MEMORIA_BYTES = 1024 * 1024
+
+def medir(funcao, repeticoes: int) -> float:
+    """Retorna o melhor tempo (s) entre as repetições"""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def benchmark_engines(n_campus: int, n_disciplinas: int, disciplinas_por_campus: int, repeticoes: int = 5):
+    """Compara as engines de cálculo e confere que os resultados são iguais"""
+    disciplinas, campus_list = gerar_dados_sinteticos(n_campus, n_disciplinas, disciplinas_por_campus)
+
+    python = calcular_resultados(disciplinas, campus_list, engine="python")
+    vetorizado = calcular_resultados(disciplinas, campus_list, engine="vetorizado")
+    if python != vetorizado:
+        raise AssertionError("Engines divergem nos resultados")
+
+    t_python = medir(lambda: calcular_resultados(disciplinas, campus_list, engine="python"), repeticoes)
+    t_colunas = medir(lambda: calcular_colunas(disciplinas, campus_list), repeticoes)
+
+    return {
+        "pares": len(python),
+        "python_s": t_python,
+        "vetorizado_s": t_colunas,
+        "speedup": t_python / t_colunas if t_colunas > 0 else float("inf")
+    }
+
+def medir_memoria(funcao) -> int:
+    """Pico de memória alocada (bytes, via tracemalloc) durante uma execução"""
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico
+
+def operacoes_suite(disciplinas, campus_list, diretorio: str) -> Dict[str, Callable[[], object]]:
+    """Operações medidas pela suite, todas sobre os mesmos dados"""
+    data_dir = os.path.join(diretorio, "data")
+
+    def salvar():
+        data_manager = DataManager(data_dir)
+        data_manager.save_disciplinas(disciplinas)
+        data_manager.save_campus(campus_list)
+
+    def carregar():
+        # Instância nova a cada vez: mede a leitura do disco, não o cache
+        data_manager = DataManager(data_dir)
+        data_manager.load_disciplinas()
+        data_manager.load_campus()
+
+    salvar()
+    resultados = calcular_resultados(disciplinas, campus_list)
+
+    return {
+        "datamanager_save": salvar,
+        "datamanager_load": carregar,
+        "calcular_resultados": lambda: calcular_resultados(disciplinas, campus_list),
+        "calcular_metricas_resumo": lambda: calcular_metricas_resumo(resultados),
+        "gerar_relatorio_excel": lambda: gerar_relatorio_excel(resultados, os.path.join(diretorio, "relatorio.xlsx"))
+    }
+
+def executar_suite(tamanhos: List[str], repeticoes: int = 3, seed: int = 42) -> Dict:
+    """Mede cada operação em cada faixa: melhor tempo entre as repetições e pico de memória"""
+    medicoes = {}
+    for nome in tamanhos:
+        tamanho = TAMANHOS[nome]
+        disciplinas, campus_list = gerar_dados_sinteticos(
+            tamanho["campus"], tamanho["disciplinas"], tamanho["por_campus"], seed=seed
+        )
+        with tempfile.TemporaryDirectory() as diretorio:
+            operacoes = operacoes_suite(disciplinas, campus_list, diretorio)
+            medicoes[nome] = {
+                "pares": sum(len(c.disciplinas) for c in campus_list),
+                "operacoes": {
+                    operacao: {
+                        "tempo_s": medir(funcao, repeticoes),
+                        # Execução separada: tracemalloc deixa o código bem mais lento
+                        "pico_memoria_bytes": medir_memoria(funcao)
+                    }
+                    for operacao, funcao in operacoes.items()
+                }
+            }
+
+    return {
+        "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "seed": seed,
+        "repeticoes": repeticoes,
+        "tamanhos": medicoes
+    }
+
+def comparar_baseline(atual: Dict, baseline: Dict, tolerancia: float = TOLERANCIA_REGRESSAO) -> List[str]:
+    """Regressões (tempo ou memória acima da tolerância) em relação à baseline"""
+    regressoes = []
+    for nome, medicao in atual["tamanhos"].items():
+        base = baseline.get("tamanhos", {}).get(nome)
+        if base is None:
+            continue
+        if base.get("pares") != medicao["pares"]:
+            regressoes.append(f"{nome}: baseline gerada com outros dados ({base.get('pares')} pares), refaça a baseline")
+            continue
+
+        for operacao, valores in medicao["operacoes"].items():
+            anterior = base["operacoes"].get(operacao)
+            if anterior is None:
+                continue
+            for chave, minimo, formatar in (
+                ("tempo_s", MINIMO_TEMPO_S, lambda v: f"{v * 1000:.1f} ms"),
+                ("pico_memoria_bytes", MINIMO_MEMORIA_BYTES, lambda v: f"{v / 1024 / 1024:.1f} MB")
+            ):
+                if valores[chave] > anterior[chave] * (1 + tolerancia) and valores[chave] - anterior[chave] > minimo:
+                    regressoes.append(
+                        f"{nome}/{operacao}: {chave} {formatar(anterior[chave])} -> {formatar(valores[chave])} "
+                        f"(+{(valores[chave] / anterior[chave] - 1) * 100:.0f}%)"
+                    )
+    return regressoes
+
+def imprimir_suite(medicoes: Dict):
+    print(f"{'tamanho':>8} {'pares':>8} {'operação':<26} {'tempo (ms)':>11} {'pico (MB)':>10}")
+    for nome, medicao in medicoes["tamanhos"].items():
+        for operacao, valores in medicao["operacoes"].items():
+            print(
+                f"{nome:>8} {medicao['pares']:>8} {operacao:<26} "
+                f"{valores['tempo_s'] * 1000:>11.2f} {valores['pico_memoria_bytes'] / 1024 / 1024:>10.2f}"
+            )
+
+def benchmark_codecs(tamanho: str, repeticoes: int = 3, seed: int = 42) -> Dict[str, Dict]:
+    """Gravação e leitura (sem cache) de disciplinas + campus com cada codec"""
+    parametros = TAMANHOS[tamanho]
+    disciplinas, campus_list = gerar_dados_sinteticos(
+        parametros["campus"], parametros["disciplinas"], parametros["por_campus"], seed=seed
+    )
+
+    medicoes = {}
+    for nome in CODECS:
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_manager = DataManager(data_dir, codec=nome)
+
+            def salvar():
+                data_manager.save_disciplinas(disciplinas)
+                data_manager.save_campus(campus_list)
+
+            def carregar():
+                leitor = DataManager(data_dir)
+                return leitor.load_disciplinas(), leitor.load_campus()
+
+            salvar()
+            if carregar() != (disciplinas, campus_list):
+                raise AssertionError(f"Codec {nome} não preserva os dados")
+
+            medicoes[nome] = {
+                "save_s": medir(salvar, repeticoes),
+                "load_s": medir(carregar, repeticoes),
+                "bytes": os.path.getsize(data_manager.disciplinas_file) + os.path.getsize(data_manager.campus_file)
+            }
+    return medicoes
+
+def main_codecs(args):
+    print(f"{'tamanho':>8} {'codec':<14} {'save (ms)':>10} {'load (ms)':>10} {'tamanho (KB)':>13}")
+    for tamanho in args.tamanhos:
+        for nome, r in benchmark_codecs(tamanho, args.repeticoes, args.seed).items():
+            print(f"{tamanho:>8} {nome:<14} {r['save_s'] * 1000:>10.2f} {r['load_s'] * 1000:>10.2f} {r['bytes'] / 1024:>13.1f}")
+
+def benchmark_paralelo(tamanho: str, workers: List[int], repeticoes: int = 3, seed: int = 42) -> Dict[int, float]:
+    """Tempo da engine paralela por número de processos (1 = vetorizada em um processo)"""
+    parametros = TAMANHOS[tamanho]
+    disciplinas, campus_list = gerar_dados_sinteticos(
+        parametros["campus"], parametros["disciplinas"], parametros["por_campus"], seed=seed
+    )
+    serial = calcular_colunas(disciplinas, campus_list)
+
+    tempos = {}
+    for n in workers:
+        if calcular_resultados(disciplinas, campus_list, engine="paralelo", workers=n) != serial:
+            raise AssertionError(f"Engine paralela com {n} processos diverge do cálculo em um processo")
+        tempos[n] = medir(lambda: calcular_resultados(disciplinas, campus_list, engine="paralelo", workers=n), repeticoes)
+    return tempos
+
+def _editar_campus(data_manager, campus_id: str, disciplina_id: str, gravacoes: int) -> int:
+    """
+    Editor de um campus: lê o registro, soma 1 aluno e grava com verificação
+    de versão, repetindo a leitura em caso de conflito. Retorna os conflitos.
+    """
+    conflitos = 0
+    feitas = 0
+    while feitas < gravacoes:
+        atual = data_manager.load_campus_por_id(campus_id).dados_reais.get(disciplina_id, DadosReaisCampus(disciplina_id))
+        try:
+            data_manager.save_dados_reais(campus_id, replace(atual, alunos_reais=atual.alunos_reais + 1), verificar_versao=True)
+        except ConflitoVersao:
+            conflitos += 1
+            continue
+        feitas += 1
+    return conflitos
+
+def _editar_campus_em_processo(data_dir: str, backend: str, campus_id: str, disciplina_id: str, gravacoes: int) -> int:
+    return _editar_campus(criar_data_manager(data_dir, backend), campus_id, disciplina_id, gravacoes)
+
+def benchmark_concorrencia(backend: str, editores: int, campus_distintos: List[int], gravacoes: int,
+                           processos: bool = False) -> Dict[int, Dict]:
+    """
+    `editores` editores simultâneos (threads com um gerenciador compartilhado,
+    como no Streamlit, ou processos com um gerenciador cada), distribuídos
+    entre k campus; os editores de um mesmo campus disputam o mesmo registro.
+    Levanta AssertionError se alguma gravação se perder.
+    """
+    medicoes = {}
+    for k in campus_distintos:
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_manager = criar_data_manager(data_dir, backend)
+            campus_list = [Campus(id=f"campus-{i}", nome=f"Campus {i}", disciplinas=["disc"]) for i in range(k)]
+            data_manager.save_campus(campus_list)
+            alvos = [campus_list[e % k].id for e in range(editores)]
+
+            inicio = time.perf_counter()
+            if processos:
+                contexto = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=editores, mp_context=contexto) as executor:
+                    conflitos = list(executor.map(
+                        _editar_campus_em_processo, [data_dir] * editores, [backend] * editores,
+                        alvos, ["disc"] * editores, [gravacoes] * editores
+                    ))
+            else:
+                with ThreadPoolExecutor(max_workers=editores) as executor:
+                    conflitos = list(executor.map(
+                        lambda campus_id: _editar_campus(data_manager, campus_id, "disc", gravacoes), alvos
+                    ))
+            tempo = time.perf_counter() - inicio
+
+            # Cada gravação aceita soma 1 aluno e 1 versão: nada pode ter sido sobrescrito
+            leitor = criar_data_manager(data_dir, backend)
+            for campus_id in set(alvos):
+                dados = leitor.load_campus_por_id(campus_id).dados_reais["disc"]
+                esperado = alvos.count(campus_id) * gravacoes
+                if dados.alunos_reais != esperado or dados.versao != esperado:
+                    raise AssertionError(
+                        f"Gravações perdidas no campus {campus_id}: {dados.alunos_reais} alunos, "
+                        f"versão {dados.versao}, esperado {esperado}"
+                    )
+
+            medicoes[k] = {
+                "gravacoes": editores * gravacoes,
+                "tempo_s": tempo,
+                "gravacoes_por_s": editores * gravacoes / tempo,
+                "conflitos": sum(conflitos)
+            }
+    return medicoes
+
+async def _requisicao(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, metodo: str, caminho: str,
+                      corpo: Optional[Dict] = None, fechar: bool = False) -> Tuple[int, Optional[Dict]]:
+    """Uma requisição HTTP/1.1 em uma conexão keep-alive (que o servidor fecha, com `fechar`); retorna status e JSON da resposta"""
+    dados = b"" if corpo is None else json.dumps(corpo).encode("utf-8")
+    conexao = "Connection: close\r\n" if fechar else ""
+    writer.write(
+        f"{metodo} {caminho} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n{conexao}"
+        f"Content-Length: {len(dados)}\r\n\r\n".encode("latin-1") + dados
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    tamanho = 0
+    while True:
+        linha = await reader.readline()
+        if linha in (b"\r\n", b""):
+            break
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        if nome.strip().lower() == "content-length":
+            tamanho = int(valor)
+    resposta = await reader.readexactly(tamanho) if tamanho else b""
+    return status, json.loads(resposta) if resposta else None
+
+async def _cliente_api(host: str, porta: int, campus_id: str, disciplinas: List[str], requisicoes: int,
+                       fracao_gravacoes: float, lote: int, rng: random.Random, latencias: Dict[str, List[float]],
+                       esperado: Dict[Tuple[str, str], Tuple[int, int]]):
+    """
+    Cliente com uma conexão keep-alive: grava lotes de dados reais nas suas
+    disciplinas (só ele as grava) ou consulta uma página de resultados ou as
+    métricas. Registra em `esperado` o último valor e o número de gravações
+    de cada par.
+    """
+    reader, writer = await asyncio.open_connection(host, porta)
+    try:
+        for _ in range(requisicoes):
+            inicio = time.perf_counter()
+            if rng.random() < fracao_gravacoes:
+                registros = [
+                    {"disciplina_id": disc_id, "alunos_reais": rng.randint(0, 80), "ch_real_total": 0.0}
+                    for disc_id in rng.sample(disciplinas, min(lote, len(disciplinas)))
+                ]
+                status, _ = await _requisicao(reader, writer, "POST", f"/campus/{campus_id}/dados_reais", {"registros": registros})
+                tipo = "gravacao"
+                for registro in registros:
+                    chave = (campus_id, registro["disciplina_id"])
+                    esperado[chave] = (registro["alunos_reais"], esperado.get(chave, (0, 0))[1] + 1)
+            elif rng.random() < 0.5:
+                status, _ = await _requisicao(reader, writer, "GET", f"/resultados?pagina={rng.randint(1, 5)}&tamanho=100")
+                tipo = "resultados"
+            else:
+                status, _ = await _requisicao(reader, writer, "GET", "/metricas")
+                tipo = "metricas"
+            if status != 200:
+                raise AssertionError(f"{tipo}: status {status}")
+            latencias[tipo].append(time.perf_counter() - inicio)
+    finally:
+        writer.close()
+
+def _percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))] if ordenados else 0.0
+
+async def _carga_api(host: str, porta: int, campus_list: List[Campus], clientes: int, requisicoes: int,
+                     fracao_gravacoes: float, lote: int, seed: int) -> Dict:
+    # Clientes do mesmo campus ficam com disciplinas disjuntas: o valor final de cada par é conhecido
+    latencias = {"gravacao": [], "resultados": [], "metricas": []}
+    esperado = {}
+    tarefas = []
+    for i in range(clientes):
+        campus = campus_list[i % len(campus_list)]
+        passo = -(-clientes // len(campus_list))
+        disciplinas = campus.disciplinas[i // len(campus_list)::passo]
+        tarefas.append(_cliente_api(
+            host, porta, campus.id, disciplinas, requisicoes, fracao_gravacoes, lote,
+            random.Random(seed + i), latencias, esperado
+        ))
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*tarefas)
+    tempo = time.perf_counter() - inicio
+
+    reader, writer = await asyncio.open_connection(host, porta)
+    try:
+        _, saude = await _requisicao(reader, writer, "GET", "/saude")
+        _, metricas = await _requisicao(reader, writer, "GET", "/metricas")
+    finally:
+        writer.close()
+    return {"tempo_s": tempo, "latencias": latencias, "esperado": esperado, "saude": saude, "metricas": metricas["metricas"]}
+
+def _conferir_metricas(servidas: Dict, data_manager, data_dir: str):
+    """Levanta AssertionError se as métricas servidas não forem as de um cálculo completo dos dados gravados"""
+    referencia = calcular_metricas_resumo(calcular_resultados(
+        data_manager.load_disciplinas(), data_manager.load_campus(), regras=carregar_regras(data_dir)
+    ))
+    for chave, valor in referencia.items():
+        if not math.isclose(servidas[chave], valor, rel_tol=1e-9, abs_tol=1e-9):
+            raise AssertionError(f"Métrica {chave} servida {servidas[chave]}, esperado {valor}")
+
+async def _verificar_falhas_api(data_dir: str, backend: str):
+    """
+    Com o servidor no próprio processo: uma falha de I/O injetada na
+    gravação recusa só aquele pedido (500) e a gravação seguinte é aceita;
+    uma gravação de outro processo entre duas da API não fica fora das
+    métricas servidas (levanta AssertionError se não).
+    """
+    data_manager = criar_data_manager(data_dir, backend)
+    gravar = data_manager.save_dados_reais_lote
+    falhas = []
+
+    def gravar_com_falha(*args, **kwargs):
+        if not falhas:
+            falhas.append(True)
+            raise OSError("falha de I/O injetada")
+        return gravar(*args, **kwargs)
+
+    data_manager.save_dados_reais_lote = gravar_com_falha
+    servidor = ServidorAPI(data_manager, janela=0)
+    server = await servidor.iniciar(porta=0)
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+    campus = data_manager.load_campus()[0]
+    caminho = f"/campus/{campus.id}/dados_reais"
+    disc_id, disc_externa = campus.disciplinas[0], campus.disciplinas[-1]
+    try:
+        status, _ = await _requisicao(reader, writer, "POST", caminho, {"registros": [{"disciplina_id": disc_id, "alunos_reais": 7}]})
+        if status != 500:
+            raise AssertionError(f"Gravação com falha injetada respondeu {status}")
+        status, _ = await _requisicao(reader, writer, "POST", caminho, {"registros": [{"disciplina_id": disc_id, "alunos_reais": 8}]})
+        if status != 200:
+            raise AssertionError(f"Gravação após a falha injetada respondeu {status}")
+        await _requisicao(reader, writer, "GET", "/metricas")
+
+        criar_data_manager(data_dir, backend).save_dados_reais_lote(
+            campus.id, [DadosReaisCampus(disc_externa, alunos_reais=1234, ch_real_total=56.0)]
+        )
+        await _requisicao(reader, writer, "POST", caminho, {"registros": [{"disciplina_id": disc_id, "alunos_reais": 9}]})
+        _, metricas = await _requisicao(reader, writer, "GET", "/metricas", fechar=True)
+        await reader.read()  # O servidor fecha a conexão e encerra o atendimento
+    finally:
+        writer.close()
+        server.close()
+        await server.wait_closed()
+    _conferir_metricas(metricas["metricas"], criar_data_manager(data_dir, backend), data_dir)
+
+def benchmark_api(backend: str, tamanho: str, clientes: int, requisicoes: int, fracao_gravacoes: float,
+                  lote: int, seed: int = 42, url: Optional[str] = None, data_dir: Optional[str] = None) -> Dict:
+    """
+    Teste de carga da API: sem `url`, gera a rede sintética da faixa em um
+    diretório temporário e sobe `python api.py` nele em uma porta livre.
+    Ao final confere, pelo gerenciador de dados, que cada gravação aceita
+    está no disco e que as métricas servidas são as de um cálculo completo
+    (levanta AssertionError se não). Antes da carga, sem `url`, confere o
+    tratamento de falhas (_verificar_falhas_api). Com `url`, `data_dir` deve
+    ser o diretório de dados do servidor.
+    """
+    with tempfile.TemporaryDirectory() as temporario:
+        processo = None
+        if url is None:
+            data_dir = temporario
+            config = TAMANHOS[tamanho]
+            disciplinas, campus_list = gerar_dados_sinteticos(config["campus"], config["disciplinas"], config["por_campus"], seed=seed)
+            data_manager = criar_data_manager(data_dir, backend)
+            data_manager.save_disciplinas(disciplinas)
+            data_manager.save_campus(campus_list)
+            asyncio.run(_verificar_falhas_api(data_dir, backend))
+            processo = subprocess.Popen(
+                [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api.py"),
+                 "--porta", "0", "--data-dir", data_dir, "--backend", backend],
+                stdout=subprocess.PIPE, text=True
+            )
+            # "API em http://127.0.0.1:<porta>"
+            url = processo.stdout.readline().split()[-1]
+        data_manager = criar_data_manager(data_dir, backend)
+        campus_list = data_manager.load_campus()
+
+        try:
+            endereco = urlsplit(url)
+            versoes_antes = {
+                (c.id, disc_id): dados.versao for c in campus_list for disc_id, dados in c.dados_reais.items()
+            }
+            r = asyncio.run(_carga_api(
+                endereco.hostname, endereco.port, campus_list, clientes, requisicoes, fracao_gravacoes, lote, seed
+            ))
+        finally:
+            if processo is not None:
+                processo.terminate()
+                processo.wait()
+
+        gravados = {c.id: c.dados_reais for c in data_manager.load_campus()}
+        for (campus_id, disc_id), (alunos, gravacoes) in r["esperado"].items():
+            dados = gravados[campus_id][disc_id]
+            if dados.alunos_reais != alunos or dados.versao != versoes_antes.get((campus_id, disc_id), 0) + gravacoes:
+                raise AssertionError(
+                    f"Gravação perdida em {campus_id}/{disc_id}: {dados.alunos_reais} alunos, versão {dados.versao}"
+                )
+        _conferir_metricas(r["metricas"], data_manager, data_dir)
+
+    total = sum(len(v) for v in r["latencias"].values())
+    return {
+        "requisicoes": total,
+        "tempo_s": r["tempo_s"],
+        "requisicoes_por_s": total / r["tempo_s"],
+        "latencias_ms": {
+            tipo: {p: _percentil(valores, p) * 1000 for p in (50, 95, 99)}
+            for tipo, valores in r["latencias"].items()
+        },
+        "pedidos_gravacao": r["saude"]["pedidos_gravacao"],
+        "commits": r["saude"]["commits"]
+    }
+
+def main_concorrencia(args):
+    modo = "processos" if args.processos else "threads"
+    print(f"backend {args.backend}, {args.editores} editores ({modo}), {args.gravacoes} gravações cada")
+    print(f"{'campus':>7} {'gravações':>10} {'tempo (ms)':>11} {'gravações/s':>12} {'conflitos':>10}")
+    for k, r in benchmark_concorrencia(args.backend, args.editores, args.campus, args.gravacoes, args.processos).items():
+        print(f"{k:>7} {r['gravacoes']:>10} {r['tempo_s'] * 1000:>11.1f} {r['gravacoes_por_s']:>12.1f} {r['conflitos']:>10}")
+
+def main_api(args):
+    r = benchmark_api(args.backend, args.tamanho, args.clientes, args.requisicoes, args.fracao_gravacoes,
+                      args.lote, args.seed, args.url, args.data_dir)
+    print(f"backend {args.backend}, {args.clientes} clientes, {args.requisicoes} requisições cada, "
+          f"{args.fracao_gravacoes:.0%} gravações de {args.lote} registros")
+    print(f"{r['requisicoes']} requisições em {r['tempo_s'] * 1000:.1f} ms: {r['requisicoes_por_s']:.1f} req/s")
+    print(f"{r['pedidos_gravacao']} pedidos de gravação em {r['commits']} commits")
+    print(f"{'tipo':>11} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    for tipo, p in r["latencias_ms"].items():
+        print(f"{tipo:>11} {p[50]:>9.2f} {p[95]:>9.2f} {p[99]:>9.2f}")
+
+def main_paralelo(args):
+    print(f"{'tamanho':>8} {'processos':>10} {'tempo (ms)':>11} {'speedup':>8}")
+    for tamanho in args.tamanhos:
+        tempos = benchmark_paralelo(tamanho, [1] + [n for n in args.workers if n != 1], args.repeticoes, args.seed)
+        for n, t in tempos.items():
+            print(f"{tamanho:>8} {n:>10} {t * 1000:>11.2f} {tempos[1] / t:>7.2f}x")
+
+def main_engines(args):
+    print(f"{'campus':>8} {'pares':>8} {'python (ms)':>12} {'vetorizado (ms)':>16} {'speedup':>8}")
+    for n_campus in args.campus:
+        r = benchmark_engines(n_campus, args.disciplinas, args.por_campus, args.repeticoes)
+        print(f"{n_campus:>8} {r['pares']:>8} {r['python_s'] * 1000:>12.2f} {r['vetorizado_s'] * 1000:>16.2f} {r['speedup']:>7.1f}x")
+
+def main_suite(args) -> int:
+    medicoes = executar_suite(args.tamanhos, args.repeticoes, args.seed)
+    imprimir_suite(medicoes)
+
+    if args.salvar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(medicoes, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline gravada em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nSem baseline em {args.baseline} (use --salvar-baseline para criar)")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressoes = comparar_baseline(medicoes, baseline, args.tolerancia)
+    if regressoes:
+        print(f"\n⚠️ {len(regressoes)} regressão(ões) em relação a {args.baseline}:")
+        for regressao in regressoes:
+            print(f"  - {regressao}")
+        return 1
+
+    print(f"\n✅ Sem regressões em relação a {args.baseline}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks da calculadora de preceptores")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    engines = comandos.add_parser("engines", help="Compara as engines de cálculo")
+    engines.add_argument("--campus", type=int, nargs="+", default=[10, 100, 500])
+    engines.add_argument("--disciplinas", type=int, default=300)
+    engines.add_argument("--por-campus", type=int, default=40)
+    engines.add_argument("--repeticoes", type=int, default=5)
+
+    suite = comandos.add_parser("suite", help="Tempo e memória das operações principais por tamanho")
+    suite.add_argument("--tamanhos", nargs="+", choices=list(TAMANHOS), default=["pequeno", "medio"])
+    suite.add_argument("--repeticoes", type=int, default=3)
+    suite.add_argument("--seed", type=int, default=42)
+    suite.add_argument("--baseline", default=ARQUIVO_BASELINE)
+    suite.add_argument("--salvar-baseline", action="store_true", help="Grava as medições como nova baseline")
+    suite.add_argument("--tolerancia", type=float, default=TOLERANCIA_REGRESSAO)
+
+    codecs = comandos.add_parser("codecs", help="Compara os codecs de serialização dos arquivos de dados")
+    codecs.add_argument("--tamanhos", nargs="+", choices=list(TAMANHOS), default=["pequeno", "medio"])
+    codecs.add_argument("--repeticoes", type=int, default=3)
+    codecs.add_argument("--seed", type=int, default=42)
+
+    paralelo = comandos.add_parser("paralelo", help="Compara o cálculo em um processo com o pool de processos")
+    paralelo.add_argument("--tamanhos", nargs="+", choices=list(TAMANHOS), default=["grande"])
+    paralelo.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    paralelo.add_argument("--repeticoes", type=int, default=3)
+    paralelo.add_argument("--seed", type=int, default=42)
+
+    concorrencia = comandos.add_parser("concorrencia", help="Editores simultâneos: gravações perdidas e vazão por campus distintos")
+    concorrencia.add_argument("--backend", choices=BACKENDS_ARMAZENAMENTO, default="shards")
+    concorrencia.add_argument("--editores", type=int, default=8)
+    concorrencia.add_argument("--campus", type=int, nargs="+", default=[1, 2, 4, 8], help="Números de campus distintos editados")
+    concorrencia.add_argument("--gravacoes", type=int, default=25, help="Gravações por editor")
+    concorrencia.add_argument("--processos", action="store_true", help="Editores em processos em vez de threads")
+
+    api = comandos.add_parser("api", help="Teste de carga da API HTTP local")
+    api.add_argument("--backend", choices=BACKENDS_ARMAZENAMENTO, default="json")
+    api.add_argument("--tamanho", choices=list(TAMANHOS), default="pequeno")
+    api.add_argument("--clientes", type=int, default=32)
+    api.add_argument("--requisicoes", type=int, default=50, help="Requisições por cliente")
+    api.add_argument("--fracao-gravacoes", type=float, default=0.5)
+    api.add_argument("--lote", type=int, default=10, help="Registros por gravação")
+    api.add_argument("--seed", type=int, default=42)
+    api.add_argument("--url", help="API já em execução (ex.: http://127.0.0.1:8765); exige --data-dir")
+    api.add_argument("--data-dir", help="Diretório de dados da API em --url")
+
+    args = parser.parse_args()
+    if args.comando == "api" and args.url and not args.data_dir:
+        parser.error("--url exige --data-dir")
+    if args.comando == "engines":
+        main_engines(args)
+    elif args.comando == "codecs":
+        main_codecs(args)
+    elif args.comando == "paralelo":
+        main_paralelo(args)
+    elif args.comando == "concorrencia":
+        main_concorrencia(args)
+    elif args.comando == "api":
+        main_api(args)
+    else:
+        sys.exit(main_suite(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Catálogo de disciplinas e campus com índices para consulta em O(1).
+
+Montado uma vez por versão dos dados (ver app.obter_catalogo) a partir das
+disciplinas e da lista de campus ou do manifesto (só id, nome e
+disciplinas de cada campus são usados). Em ids, rótulos ou nomes de campus
+repetidos vale o primeiro, como nas buscas sequenciais que ele substitui.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from models import Campus, Disciplina, EntradaManifesto
+
+CampusOuEntrada = Union[Campus, EntradaManifesto]
+
+def rotulo_disciplina(disciplina: Disciplina) -> str:
+    """Rótulo usado nas listas de seleção: "Nome - Curso" """
+    return f"{disciplina.nome} - {disciplina.curso}"
+
+class Catalogo:
+    def __init__(self, disciplinas: Sequence[Disciplina], campus: Sequence[CampusOuEntrada]):
+        self.disciplinas = list(disciplinas)
+        self.campus = list(campus)
+
+        self._por_id: Dict[str, Disciplina] = {}
+        self._por_nome_curso: Dict[Tuple[str, str], Disciplina] = {}
+        self._por_rotulo: Dict[str, Disciplina] = {}
+        self._por_curso: Dict[str, List[Disciplina]] = defaultdict(list)
+        for d in self.disciplinas:
+            self._por_id.setdefault(d.id, d)
+            self._por_nome_curso.setdefault((d.nome, d.curso), d)
+            self._por_rotulo.setdefault(rotulo_disciplina(d), d)
+            self._por_curso[d.curso].append(d)
+
+        self._campus_por_id: Dict[str, CampusOuEntrada] = {}
+        self._campus_por_nome: Dict[str, CampusOuEntrada] = {}
+        # Adjacência campus ↔ disciplina (só disciplinas cadastradas, na ordem do campus)
+        self._disciplinas_do_campus: Dict[str, List[Disciplina]] = {}
+        self._campus_da_disciplina: Dict[str, List[CampusOuEntrada]] = defaultdict(list)
+        for c in self.campus:
+            if c.id in self._campus_por_id:
+                continue
+            self._campus_por_id[c.id] = c
+            self._campus_por_nome.setdefault(c.nome, c)
+            self._disciplinas_do_campus[c.id] = [self._por_id[i] for i in c.disciplinas if i in self._por_id]
+            for disc_id in dict.fromkeys(c.disciplinas):
+                if disc_id in self._por_id:
+                    self._campus_da_disciplina[disc_id].append(c)
+
+    def disciplina(self, disciplina_id: str) -> Optional[Disciplina]:
+        return self._por_id.get(disciplina_id)
+
+    def disciplina_por_nome_curso(self, nome: str, curso: str) -> Optional[Disciplina]:
+        return self._por_nome_curso.get((nome, curso))
+
+    def disciplina_por_rotulo(self, rotulo: str) -> Optional[Disciplina]:
+        return self._por_rotulo.get(rotulo)
+
+    def disciplinas_do_curso(self, curso: str) -> List[Disciplina]:
+        return list(self._por_curso.get(curso, ()))
+
+    def rotulos(self) -> List[str]:
+        """Rótulos de todas as disciplinas, na ordem do cadastro"""
+        return [rotulo_disciplina(d) for d in self.disciplinas]
+
+    def cursos(self) -> List[str]:
+        return sorted(self._por_curso)
+
+    def campus_por_id(self, campus_id: str) -> Optional[CampusOuEntrada]:
+        return self._campus_por_id.get(campus_id)
+
+    def campus_por_nome(self, nome: str) -> Optional[CampusOuEntrada]:
+        return self._campus_por_nome.get(nome)
+
+    def nomes_campus(self) -> List[str]:
+        return [c.nome for c in self.campus]
+
+    def disciplinas_do_campus(self, campus_id: str) -> List[Disciplina]:
+        return list(self._disciplinas_do_campus.get(campus_id, ()))
+
+    def campus_da_disciplina(self, disciplina_id: str) -> List[CampusOuEntrada]:
+        return list(self._campus_da_disciplina.get(disciplina_id, ()))
@@ -0,0 +1,226 @@
+"""
+Simulação de cenários ("e se") sobre o cálculo de carga horária.
+
+Um cenário é uma lista de Perturbacao: multiplicadores, fixos ou sorteados
+de uma normal, aplicados aos alunos reais, à CH por aluno, à CH prevista ou
+à CH real informada das linhas de um campus, curso ou disciplina. As
+amostras são avaliadas em lotes (amostras × pares campus × disciplina) com
+as mesmas regras de utils.calcular_pares, e o resultado traz, por linha e
+por campus, a distribuição da diferença de CH, a probabilidade de cada
+status e os professores equivalentes. Os dados cadastrados não são
+alterados: o simulador trabalha sobre cópias das colunas.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from instrumentacao import medir
+from models import Campus, Disciplina
+from regras import REGRAS_PADRAO, STATUS, RegrasStatus
+from utils import HORAS_PROFESSOR, achatar_pares, tabela_disciplinas
+
+# Parâmetros que um cenário pode alterar
+PARAMETROS_CENARIO = ("alunos_reais", "ch_por_aluno", "ch_prevista", "ch_real_informada")
+
+# Percentis reportados para as distribuições
+PERCENTIS = (5, 50, 95)
+
+# Máximo de elementos (amostras × linhas) de cada lote e das amostras guardadas para os percentis por linha
+ELEMENTOS_POR_LOTE = 4_000_000
+ELEMENTOS_PERCENTIS = 10_000_000
+
+@dataclass
+class Perturbacao:
+    """
+    Multiplica `parametro` das linhas selecionadas por um fator ~ Normal(fator,
+    desvio), truncado em zero (desvio 0: fator fixo). Filtros vazios selecionam
+    todas as linhas. por_linha=True sorteia um fator para cada linha; False usa
+    o mesmo fator para todas as linhas selecionadas em cada amostra (choque
+    comum, ex.: queda de matrículas no campus inteiro).
+    """
+    parametro: str
+    fator: float = 1.0
+    desvio: float = 0.0
+    campus: Optional[str] = None  # id ou nome do campus
+    curso: Optional[str] = None
+    disciplina_id: Optional[str] = None
+    por_linha: bool = True
+
+    def __post_init__(self):
+        if self.parametro not in PARAMETROS_CENARIO:
+            raise ValueError(f"Parâmetro de cenário desconhecido: {self.parametro}")
+        if self.fator < 0 or self.desvio < 0:
+            raise ValueError("Fator e desvio de uma perturbação não podem ser negativos")
+
+@dataclass
+class ResultadoCenario:
+    """
+    por_linha: uma linha por par campus × disciplina; por_campus: totais de
+    cada campus; total: distribuição da diferença de CH da instituição.
+    """
+    n_amostras: int
+    seed: int
+    por_linha: pd.DataFrame
+    por_campus: pd.DataFrame
+    total: Dict = field(default_factory=dict)
+
+def _resumo_distribuicao(amostras: np.ndarray, prefixo: str, eixo: int = 0) -> Dict[str, np.ndarray]:
+    percentis = np.percentile(amostras, PERCENTIS, axis=eixo)
+    return {f"{prefixo}_p{p:02d}": valores for p, valores in zip(PERCENTIS, percentis)}
+
+class SimuladorCenarios:
+    """
+    Monta uma vez as colunas base (como em calcular_colunas) e as regras de
+    status compiladas, e avalia cenários sobre elas quantas vezes for preciso.
+    """
+
+    def __init__(self, disciplinas: List[Disciplina], campus_list: List[Campus],
+                 regras: Optional[RegrasStatus] = None):
+        tabela = tabela_disciplinas(disciplinas)
+        pares = achatar_pares(campus_list, tabela["posicao"])
+        idx = pares["idx"]
+
+        self._base = {
+            "alunos_reais": pares["alunos_reais"].astype(np.float64),
+            "ch_por_aluno": tabela["ch_por_aluno"][idx],
+            "ch_prevista": tabela["ch_prevista"][idx],
+            "ch_real_informada": pares["ch_informada"]
+        }
+        for array in self._base.values():
+            array.setflags(write=False)
+
+        self._campus_pos = pares["campus_pos"]
+        self._campus_id = np.array([c.id for c in campus_list], dtype=object)[self._campus_pos]
+        self._campus_nome = np.array([c.nome for c in campus_list], dtype=object)[self._campus_pos]
+        self._disciplina_id = np.array([d.id for d in disciplinas], dtype=object)[idx]
+        self._disciplina_nome = np.array([d.nome for d in disciplinas], dtype=object)[idx]
+        self._curso = np.array([d.curso for d in disciplinas], dtype=object)[idx]
+
+        # Linhas de cada campus são contíguas (achatar_pares segue a ordem de campus_list)
+        _, self._inicio_campus = np.unique(self._campus_pos, return_index=True)
+        self._classificador = (regras or REGRAS_PADRAO).compilar(self._curso, self._campus_nome)
+        self._diferenca_base = self._avaliar({})[0][0]
+
+    def __len__(self):
+        return len(self._campus_pos)
+
+    def selecionar(self, perturbacao: Perturbacao) -> np.ndarray:
+        """Máscara das linhas afetadas pela perturbação"""
+        mascara = np.ones(len(self), dtype=bool)
+        if perturbacao.campus is not None:
+            mascara &= (self._campus_id == perturbacao.campus) | (self._campus_nome == perturbacao.campus)
+        if perturbacao.curso is not None:
+            mascara &= self._curso == perturbacao.curso
+        if perturbacao.disciplina_id is not None:
+            mascara &= self._disciplina_id == perturbacao.disciplina_id
+        return mascara
+
+    def _avaliar(self, fatores: Dict[str, np.ndarray]):
+        """
+        Diferença de CH e código de status de cada amostra (linhas do lote);
+        fatores: parâmetro -> multiplicadores (amostras × linhas).
+        """
+        valores = {nome: base * fatores[nome] if nome in fatores else base[np.newaxis, :] for nome, base in self._base.items()}
+        # Alunos são inteiros; CH real informada ou calculada, como em calcular_pares
+        alunos_reais = np.rint(valores["alunos_reais"])
+        ch_informada = valores["ch_real_informada"]
+        ch_real = np.where(ch_informada > 0, ch_informada, alunos_reais * valores["ch_por_aluno"])
+        diferenca_ch = ch_real - valores["ch_prevista"]
+        return diferenca_ch, self._classificador.codigos(diferenca_ch, valores["ch_prevista"])
+
+    @medir("cenarios.simular")
+    def simular(self, perturbacoes: List[Perturbacao], n_amostras: int = 1000, seed: int = 42) -> ResultadoCenario:
+        """Avalia n_amostras sorteios do cenário, em lotes, com resultado reprodutível pela seed"""
+        if n_amostras < 1:
+            raise ValueError("n_amostras deve ser ao menos 1")
+        n_linhas = len(self)
+        rng = np.random.default_rng(seed)
+        mascaras = [self.selecionar(p) for p in perturbacoes]
+
+        tamanho_lote = max(1, ELEMENTOS_POR_LOTE // max(n_linhas, 1))
+        # Os percentis por linha usam as primeiras amostras (sorteios independentes, então uma amostra uniforme)
+        n_guardadas = min(n_amostras, max(100, ELEMENTOS_PERCENTIS // max(n_linhas, 1)))
+        guardadas = np.empty((n_guardadas, n_linhas))
+
+        # Somas deslocadas pela diferença base, para a variância não perder precisão
+        soma = np.zeros(n_linhas)
+        soma_quadrados = np.zeros(n_linhas)
+        contagem_status = np.zeros((len(STATUS), n_linhas), dtype=np.int64)
+        total_campus = np.empty((n_amostras, len(self._inicio_campus)))
+        status_campus = np.zeros((len(STATUS), len(self._inicio_campus)), dtype=np.int64)
+
+        feitas = 0
+        while feitas < n_amostras:
+            lote = min(tamanho_lote, n_amostras - feitas)
+            fatores: Dict[str, np.ndarray] = {}
+            for perturbacao, mascara in zip(perturbacoes, mascaras):
+                n_afetadas = int(mascara.sum()) if perturbacao.por_linha else 1
+                sorteio = rng.normal(perturbacao.fator, perturbacao.desvio, size=(lote, n_afetadas))
+                matriz = fatores.setdefault(perturbacao.parametro, np.ones((lote, n_linhas)))
+                matriz[:, mascara] *= np.maximum(sorteio, 0.0)
+
+            diferenca_ch, codigos = self._avaliar(fatores)
+            diferenca_ch = np.broadcast_to(diferenca_ch, (lote, n_linhas))
+            codigos = np.broadcast_to(codigos, (lote, n_linhas))
+
+            desvio = diferenca_ch - self._diferenca_base
+            soma += desvio.sum(axis=0)
+            soma_quadrados += (desvio ** 2).sum(axis=0)
+            if feitas < n_guardadas:
+                n_copiar = min(lote, n_guardadas - feitas)
+                guardadas[feitas:feitas + n_copiar] = diferenca_ch[:n_copiar]
+
+            if n_linhas:
+                total_campus[feitas:feitas + lote] = np.add.reduceat(diferenca_ch, self._inicio_campus, axis=1)
+            for codigo in range(len(STATUS)):
+                eh_status = codigos == codigo
+                contagem_status[codigo] += eh_status.sum(axis=0)
+                if n_linhas:
+                    status_campus[codigo] += np.add.reduceat(eh_status, self._inicio_campus, axis=1, dtype=np.int64).sum(axis=0)
+            feitas += lote
+
+        media_desvio = soma / n_amostras
+        variancia = np.maximum(soma_quadrados / n_amostras - media_desvio ** 2, 0.0)
+        media = self._diferenca_base + media_desvio
+
+        por_linha = pd.DataFrame({
+            "campus": self._campus_nome,
+            "disciplina_id": self._disciplina_id,
+            "disciplina_nome": self._disciplina_nome,
+            "curso": self._curso,
+            "diferenca_ch_base": self._diferenca_base,
+            "diferenca_ch_media": media,
+            "diferenca_ch_desvio": np.sqrt(variancia),
+            **_resumo_distribuicao(guardadas, "diferenca_ch"),
+            **{f"prob_{nome.lower()}": contagem_status[codigo] / n_amostras for codigo, nome in enumerate(STATUS)},
+            "professores_media": media / HORAS_PROFESSOR,
+            **_resumo_distribuicao(guardadas / HORAS_PROFESSOR, "professores")
+        })
+
+        inicio = self._inicio_campus
+        por_campus = pd.DataFrame({
+            "campus": self._campus_nome[inicio],
+            "diferenca_ch_base": np.add.reduceat(self._diferenca_base, inicio) if n_linhas else np.empty(0),
+            "diferenca_ch_media": total_campus.mean(axis=0),
+            **_resumo_distribuicao(total_campus, "diferenca_ch"),
+            **{f"disciplinas_{nome.lower()}_media": status_campus[codigo] / n_amostras for codigo, nome in enumerate(STATUS)},
+            "professores_media": total_campus.mean(axis=0) / HORAS_PROFESSOR,
+            **_resumo_distribuicao(total_campus / HORAS_PROFESSOR, "professores")
+        })
+
+        total_instituicao = total_campus.sum(axis=1)
+        total = {
+            "diferenca_ch_base": float(self._diferenca_base.sum()),
+            "diferenca_ch_media": float(total_instituicao.mean()),
+            **{chave: float(valor) for chave, valor in _resumo_distribuicao(total_instituicao, "diferenca_ch").items()},
+            "professores_media": float(total_instituicao.mean() / HORAS_PROFESSOR)
+        }
+        return ResultadoCenario(n_amostras=n_amostras, seed=seed, por_linha=por_linha, por_campus=por_campus, total=total)
+
+def simular_cenario(disciplinas: List[Disciplina], campus_list: List[Campus], perturbacoes: List[Perturbacao],
+                    n_amostras: int = 1000, seed: int = 42, regras: Optional[RegrasStatus] = None) -> ResultadoCenario:
+    """Atalho para um único cenário (para vários, reutilize um SimuladorCenarios)"""
+    return SimuladorCenarios(disciplinas, campus_list, regras).simular(perturbacoes, n_amostras, seed)
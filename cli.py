@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Cálculo e exportação sem o aplicativo, para execuções agendadas (cron).
+
+Carrega os dados pelo gerenciador do backend configurado, calcula os
+resultados com as regras de status do diretório e grava:
+- xlsx: o mesmo relatório do aplicativo, em modo streaming;
+- csv / jsonl: uma linha por par campus × disciplina, com os nomes dos
+  campos de ResultFrame, gravadas em blocos.
+
+Ao final imprime um resumo em JSON (tempos de cada etapa, contagens e
+métricas) em --resumo, na saída padrão ou, quando os resultados vão para a
+saída padrão, na saída de erro. Não importa Streamlit nem Plotly.
+
+    python cli.py --formato csv --saida resultados.csv --campus "Campus Centro" --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from cubo import CuboAgregado
+from models import BACKENDS_ARMAZENAMENTO, Campus, Disciplina, ResultFrame, criar_data_manager
+from paralelo import workers_configurados
+from regras import carregar_regras
+from utils import calcular_metricas_resumo, calcular_resultados, gerar_relatorio_excel
+
+FORMATOS = ("xlsx", "csv", "jsonl")
+
+# Linhas convertidas para texto de cada vez nos formatos csv e jsonl
+LINHAS_POR_BLOCO = 50_000
+
+class FiltroInvalido(Exception):
+    """Filtro da linha de comando que não corresponde a nenhum dado"""
+
+def carregar_campus(data_manager, filtro: Optional[List[str]]) -> List[Campus]:
+    """
+    Campus cujo nome ou id está no filtro (todos, sem filtro). Com filtro,
+    só os campus pedidos são lidos (a lista vem do manifesto). Levanta
+    FiltroInvalido com os nomes que não correspondem a nenhum campus.
+    """
+    if not filtro:
+        return data_manager.load_campus()
+
+    pedidos = set(filtro)
+    selecionados = [e for e in data_manager.load_manifesto() if e.nome in pedidos or e.id in pedidos]
+    encontrados = {e.nome for e in selecionados} | {e.id for e in selecionados}
+    if pedidos - encontrados:
+        raise FiltroInvalido(f"Campus não encontrado: {', '.join(sorted(pedidos - encontrados))}")
+    return [data_manager.load_campus_por_id(e.id) for e in selecionados]
+
+def filtrar_cursos(disciplinas: List[Disciplina], filtro: Optional[List[str]]) -> List[Disciplina]:
+    """
+    Disciplinas dos cursos do filtro (todas, sem filtro). Levanta
+    FiltroInvalido com os cursos que não têm nenhuma disciplina.
+    """
+    if not filtro:
+        return disciplinas
+
+    pedidos = set(filtro)
+    ausentes = pedidos - {d.curso for d in disciplinas}
+    if ausentes:
+        raise FiltroInvalido(f"Curso não encontrado: {', '.join(sorted(ausentes))}")
+    return [d for d in disciplinas if d.curso in pedidos]
+
+def _blocos(resultados: ResultFrame):
+    # Visões de LINHAS_POR_BLOCO linhas sobre as colunas (sem cópia)
+    df = resultados.to_dataframe()
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        yield df.iloc[inicio:inicio + LINHAS_POR_BLOCO]
+
+def exportar(resultados: ResultFrame, formato: str, saida, cubo: Optional[CuboAgregado] = None):
+    """Grava os resultados em saida (caminho ou arquivo binário aberto) no formato pedido"""
+    if formato == "xlsx":
+        gerar_relatorio_excel(resultados, saida, streaming=True, cubo=cubo)
+        return
+
+    arquivo = open(saida, "wb") if isinstance(saida, str) else saida
+    try:
+        if formato == "csv":
+            for i, bloco in enumerate(_blocos(resultados)):
+                arquivo.write(bloco.to_csv(index=False, header=(i == 0)).encode("utf-8"))
+            if not len(resultados):
+                arquivo.write((",".join(ResultFrame.CAMPOS) + "\n").encode("utf-8"))
+        else:
+            for bloco in _blocos(resultados):
+                # json.dumps: floats com a representação mais curta que preserva o valor, como no CSV
+                texto = "".join(json.dumps(linha, ensure_ascii=False) + "\n" for linha in bloco.to_dict("records"))
+                arquivo.write(texto.encode("utf-8"))
+        arquivo.flush()
+    finally:
+        if isinstance(saida, str):
+            arquivo.close()
+
+def executar(args) -> Dict:
+    """Carrega, calcula e exporta; retorna o resumo da execução"""
+    tempos = {}
+    inicio_total = time.perf_counter()
+
+    inicio = time.perf_counter()
+    data_manager = criar_data_manager(args.data_dir, args.backend)
+    # Os pares das disciplinas dos demais cursos não entram no cálculo
+    disciplinas = filtrar_cursos(data_manager.load_disciplinas(), args.curso)
+    campus_list = carregar_campus(data_manager, args.campus)
+    regras = carregar_regras(data_manager.data_dir)
+    tempos["carregar_s"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resultados = calcular_resultados(disciplinas, campus_list, engine="paralelo", workers=args.workers, regras=regras)
+    tempos["calcular_s"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    cubo = CuboAgregado(resultados)
+    metricas = calcular_metricas_resumo(cubo)
+    tempos["metricas_s"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    saida = sys.stdout.buffer if args.saida == "-" else args.saida
+    exportar(resultados, args.formato, saida, cubo)
+    tempos["exportar_s"] = time.perf_counter() - inicio
+    tempos["total_s"] = time.perf_counter() - inicio_total
+
+    return {
+        "formato": args.formato,
+        "saida": args.saida,
+        "workers": args.workers,
+        "filtros": {"campus": args.campus or [], "curso": args.curso or []},
+        "disciplinas": len(disciplinas),
+        "campus": len(campus_list),
+        "linhas": len(resultados),
+        "tempos": {etapa: round(segundos, 6) for etapa, segundos in tempos.items()},
+        "metricas": metricas
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcula os resultados e exporta em Excel, CSV ou JSON Lines")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--backend", choices=BACKENDS_ARMAZENAMENTO,
+                        help="Backend de armazenamento (padrão: CALC_PRECPT_BACKEND ou json)")
+    parser.add_argument("--formato", choices=FORMATOS, help="Padrão: a extensão de --saida, ou csv")
+    parser.add_argument("--saida", default="-", help="Arquivo de resultados ('-': saída padrão)")
+    parser.add_argument("--campus", action="append", metavar="NOME",
+                        help="Só este campus (nome ou id); pode ser repetido")
+    parser.add_argument("--curso", action="append", metavar="CURSO", help="Só este curso; pode ser repetido")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processos do cálculo (padrão: CALC_PRECPT_WORKERS ou 1; 0: um por CPU)")
+    parser.add_argument("--resumo", help="Arquivo do resumo JSON (padrão: saída padrão, ou de erro se os resultados forem para ela)")
+    args = parser.parse_args()
+
+    if args.formato is None:
+        extensao = args.saida.rsplit(".", 1)[-1].lower() if "." in args.saida else ""
+        args.formato = extensao if extensao in FORMATOS else "csv"
+    if args.workers is None:
+        args.workers = workers_configurados()
+    elif args.workers <= 0:
+        args.workers = os.cpu_count() or 1
+    if args.formato == "xlsx" and args.saida == "-" and sys.stdout.isatty():
+        parser.error("o formato xlsx é binário: informe --saida ou redirecione a saída padrão")
+
+    try:
+        resumo = executar(args)
+    except FiltroInvalido as e:
+        parser.error(str(e))
+
+    texto = json.dumps(resumo, ensure_ascii=False)
+    if args.resumo:
+        with open(args.resumo, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto, file=sys.stderr if args.saida == "-" else sys.stdout)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Travas entre threads e processos e gravação atômica de arquivos.
+
+As travas são arquivos em <data_dir>/travas/ bloqueados com fcntl.flock,
+que vale entre processos (ex.: o aplicativo e scripts sobre o mesmo
+diretório de dados), combinados com um threading.Lock por arquivo, que
+vale entre as threads do Streamlit e é a única proteção onde fcntl não
+existe (Windows). Para não haver deadlock, quem precisa de mais de uma
+trava as adquire sempre nesta ordem (pulando as que não usa):
+1. "manifesto" (lista de campus do backend shards);
+2. a trava de um campus (TravasDiretorio.campus);
+3. "campus" (campus.json do backend JSON);
+4. "journal".
+Nunca adquira uma trava de posição menor segurando uma de posição maior
+(ex.: "manifesto" dentro da trava de um campus).
+"""
+
+import hashlib
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: só as travas entre threads
+    fcntl = None
+
+def nome_arquivo_seguro(chave: str) -> str:
+    """A própria chave, se for um nome de arquivo seguro; senão, um hash dela"""
+    return chave if re.fullmatch(r"[\w-]+", chave) else hashlib.blake2b(chave.encode("utf-8"), digest_size=16).hexdigest()
+
+def caminho_temporario(path: str) -> str:
+    """Arquivo temporário ao lado de path, exclusivo do processo e da thread"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def gravar_atomico(path: str, conteudo: bytes):
+    """
+    Grava em um arquivo temporário (com fsync) e o renomeia sobre path:
+    leitores veem o arquivo antigo ou o novo inteiro, nunca um pela metade.
+    """
+    temporario = caminho_temporario(path)
+    try:
+        with open(temporario, "wb") as f:
+            f.write(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, path)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+_travas_locais: Dict[str, threading.Lock] = {}
+_lock_travas_locais = threading.Lock()
+
+@contextmanager
+def trava_arquivo(path: str) -> Iterator[None]:
+    """Trava exclusiva associada a path (criado se não existir), entre threads e processos"""
+    path = os.path.abspath(path)
+    with _lock_travas_locais:
+        local = _travas_locais.setdefault(path, threading.Lock())
+    with local:
+        if fcntl is None:
+            yield
+            return
+        with open(path, "a+b") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class TravasDiretorio:
+    """Travas de um diretório de dados: uma por campus e uma por arquivo compartilhado"""
+
+    def __init__(self, data_dir: str):
+        self.diretorio = os.path.join(data_dir, "travas")
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def arquivo(self, nome: str):
+        """Trava de um arquivo compartilhado por todos os campus (ex.: "campus", "journal")"""
+        return trava_arquivo(os.path.join(self.diretorio, f"{nome}.lock"))
+
+    def campus(self, campus_id: str):
+        """Trava dos dados reais de um campus: edições de campus diferentes não esperam umas pelas outras"""
+        return trava_arquivo(os.path.join(self.diretorio, f"campus-{nome_arquivo_seguro(campus_id)}.lock"))
@@ -0,0 +1,131 @@
+"""
+Cubo de agregados campus × curso × status dos resultados.
+Cada célula guarda as somas de CH prevista/real/diferença e de alunos,
+além da quantidade de disciplinas; os roll-ups para qualquer subconjunto
+das dimensões saem das células (e não das linhas) e ficam em cache até a
+próxima alteração. O cubo é atualizado incrementalmente com aplicar().
+"""
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from models import ResultFrame
+
+DIMENSOES_CUBO = ("campus", "curso", "status")
+MEDIDAS_CUBO = ("ch_prevista", "ch_real", "diferenca_ch", "alunos_previstos", "alunos_reais", "disciplinas")
+
+# Medidas inteiras (guardadas como float nas células)
+_MEDIDAS_INTEIRAS = ("alunos_previstos", "alunos_reais", "disciplinas")
+
+# Até este número de linhas, aplicar() soma linha a linha: para poucas linhas (ex.: edições
+# incrementais) o laço custa menos que fatorar as dimensões e somar com np.bincount
+_LIMITE_LACO = 256
+
+class CuboAgregado:
+    def __init__(self, resultados: ResultFrame = None):
+        self._celulas: Dict[Tuple[str, str, str], np.ndarray] = {}
+        self._rollups: Dict[Tuple[str, ...], pd.DataFrame] = {}
+        if resultados is not None:
+            self.aplicar({campo: resultados.coluna(campo) for campo in ResultFrame.CAMPOS})
+
+    def aplicar(self, colunas: Dict[str, np.ndarray], sinal: int = +1):
+        """Soma (sinal=+1) ou subtrai (sinal=-1) linhas de resultados do cubo"""
+        n = len(colunas["status"])
+        if n == 0:
+            return
+        self._rollups.clear()
+
+        valores = np.column_stack(
+            [np.asarray(colunas[m], dtype=np.float64) for m in MEDIDAS_CUBO[:-1]] + [np.ones(n)]
+        ) * sinal
+
+        if n <= _LIMITE_LACO:
+            chaves = zip(colunas["campus"], colunas["curso"], colunas["status"])
+            for chave, linha in zip(chaves, valores):
+                self._somar(chave, linha)
+            return
+
+        # Agrupa pelas três dimensões com códigos inteiros e soma com bincount
+        chave = np.zeros(n, dtype=np.int64)
+        categorias = []
+        for dimensao in DIMENSOES_CUBO:
+            codigos, valores_dimensao = pd.factorize(colunas[dimensao])
+            chave = chave * len(valores_dimensao) + codigos
+            categorias.append(valores_dimensao)
+        grupos, inverso = np.unique(chave, return_inverse=True)
+        somas = np.column_stack([
+            np.bincount(inverso, weights=valores[:, j], minlength=len(grupos)) for j in range(len(MEDIDAS_CUBO))
+        ])
+
+        for grupo, linha in zip(grupos.tolist(), somas):
+            partes = []
+            for valores_dimensao in reversed(categorias):
+                grupo, codigo = divmod(grupo, len(valores_dimensao))
+                partes.append(valores_dimensao[codigo])
+            self._somar(tuple(reversed(partes)), linha)
+
+    def _somar(self, chave: Tuple[str, str, str], linha: np.ndarray):
+        atual = self._celulas.get(chave)
+        if atual is None:
+            self._celulas[chave] = linha.copy()
+            return
+        atual += linha
+        if atual[-1] == 0:
+            # Célula sem disciplinas: descarta (e com ela o resíduo de arredondamento)
+            del self._celulas[chave]
+
+    def copia(self) -> "CuboAgregado":
+        """Cópia independente (ex.: para ler em outra thread enquanto este é atualizado)"""
+        cubo = CuboAgregado()
+        cubo._celulas = {chave: linha.copy() for chave, linha in self._celulas.items()}
+        return cubo
+
+    def celulas(self) -> pd.DataFrame:
+        """Todas as células não vazias, uma linha por campus × curso × status"""
+        return self.rollup(DIMENSOES_CUBO)
+
+    def rollup(self, dimensoes: Sequence[str] = ()) -> pd.DataFrame:
+        """
+        Agregado pelas dimensões informadas (ordenado por elas); sem dimensões,
+        uma única linha com o total geral.
+        """
+        dimensoes = tuple(dimensoes)
+        if dimensoes not in self._rollups:
+            df = pd.DataFrame(
+                [chave + tuple(linha) for chave, linha in self._celulas.items()],
+                columns=list(DIMENSOES_CUBO) + list(MEDIDAS_CUBO)
+            )
+            if dimensoes:
+                agregado = df.groupby(list(dimensoes), sort=True)[list(MEDIDAS_CUBO)].sum().reset_index()
+            else:
+                agregado = df[list(MEDIDAS_CUBO)].sum().to_frame().T
+            for medida in _MEDIDAS_INTEIRAS:
+                agregado[medida] = agregado[medida].round().astype(np.int64)
+            self._rollups[dimensoes] = agregado
+        return self._rollups[dimensoes].copy()
+
+    def totais(self) -> Dict:
+        """Totais no formato de utils.totais_colunas, somados direto das células por status"""
+        zeros = np.zeros(len(MEDIDAS_CUBO))
+        por_status = {"Excesso": zeros.copy(), "Falta": zeros.copy(), "Adequado": zeros.copy()}
+        geral = zeros.copy()
+        for (_, _, status), linha in self._celulas.items():
+            geral += linha
+            if status in por_status:
+                por_status[status] += linha
+
+        i = {medida: pos for pos, medida in enumerate(MEDIDAS_CUBO)}
+        return {
+            "ch_prevista": float(geral[i["ch_prevista"]]),
+            "ch_real": float(geral[i["ch_real"]]),
+            "alunos_previstos": int(round(geral[i["alunos_previstos"]])),
+            "alunos_reais": int(round(geral[i["alunos_reais"]])),
+            "disciplinas": int(round(geral[i["disciplinas"]])),
+            "excesso": int(round(por_status["Excesso"][i["disciplinas"]])),
+            "falta": int(round(por_status["Falta"][i["disciplinas"]])),
+            "adequado": int(round(por_status["Adequado"][i["disciplinas"]])),
+            "diferenca_excesso": float(por_status["Excesso"][i["diferenca_ch"]]),
+            "diferenca_falta": float(por_status["Falta"][i["diferenca_ch"]])
+        }
@@ -4,13 +4,15 @@ Script para popular dados de exemplo na calculadora de preceptores.
 Execute este script para criar dados de teste e demonstração.
 """
 
+import argparse
+import random
 import uuid
-from models import Disciplina, Campus, DataManager, DadosReaisCampus
+from typing import List, Optional, Tuple
 
-def criar_dados_exemplo():
-    """Cria dados de exemplo para demonstração do sistema"""
-    
-    data_manager = DataManager()
+from models import Disciplina, Campus, DataManager, DadosReaisCampus, criar_data_manager
+
+def montar_dados_exemplo() -> Tuple[List[Disciplina], List[Campus]]:
+    """Monta (sem gravar) as disciplinas e os campus de exemplo"""
     
     # Criar disciplinas de exemplo
     disciplinas = [
@@ -64,10 +66,6 @@ def criar_dados_exemplo():
         )
     ]
     
-    # Salvar disciplinas
-    data_manager.save_disciplinas(disciplinas)
-    print("✅ Disciplinas criadas com sucesso!")
-    
     # Criar campus de exemplo
     campus_list = []
     
@@ -170,6 +168,20 @@ def criar_dados_exemplo():
     
     campus_list.append(campus_sul)
     
+    return disciplinas, campus_list
+
+def criar_dados_exemplo(data_manager: Optional[DataManager] = None):
+    """Cria dados de exemplo para demonstração do sistema"""
+    
+    if data_manager is None:
+        data_manager = DataManager()
+    
+    disciplinas, campus_list = montar_dados_exemplo()
+    
+    # Salvar disciplinas
+    data_manager.save_disciplinas(disciplinas)
+    print("✅ Disciplinas criadas com sucesso!")
+    
     # Salvar campus
     data_manager.save_campus(campus_list)
     print("✅ Campus criados com sucesso!")
@@ -180,5 +192,85 @@ def criar_dados_exemplo():
     print("• Dados reais preenchidos para demonstração")
     print("\n🚀 Execute 'streamlit run app.py' para ver o dashboard!")
 
+def gerar_dados_sinteticos(n_campus: int, n_disciplinas: int, disciplinas_por_campus: Optional[int] = None,
+                           seed: int = 42, preenchimento: float = 0.9) -> Tuple[List[Disciplina], List[Campus]]:
+    """
+    Gera N campus × M disciplinas a partir dos dados de exemplo, de forma
+    reprodutível (mesma seed, mesmos dados, inclusive os ids).
+
+    Cada disciplina sintética é uma variação de uma disciplina de exemplo
+    (mesmo curso, CH por aluno e CH prevista coerentes com a turma); os
+    alunos reais oscilam em torno do previsto como nos campus de exemplo
+    e parte das disciplinas tem CH real informada manualmente.
+    preenchimento: fração das disciplinas de cada campus com dados reais.
+    """
+    rng = random.Random(seed)
+    modelos, campus_exemplo = montar_dados_exemplo()
+    observacoes = [d.observacoes for c in campus_exemplo for d in c.dados_reais.values()]
+    
+    def novo_id() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128)))
+    
+    disciplinas = []
+    for i in range(n_disciplinas):
+        modelo = modelos[i % len(modelos)]
+        # Turmas com distribuição assimétrica (poucas muito grandes)
+        alunos_previstos = max(5, int(round(rng.lognormvariate(0, 0.35) * modelo.alunos_previstos)))
+        ch_por_aluno = round(modelo.ch_por_aluno * rng.uniform(0.8, 1.2), 1)
+        disciplinas.append(Disciplina(
+            id=novo_id(),
+            nome=f"{modelo.nome} {i // len(modelos) + 1}",
+            curso=modelo.curso,
+            ch_prevista=round(alunos_previstos * ch_por_aluno, 1),
+            alunos_previstos=alunos_previstos,
+            ch_por_aluno=ch_por_aluno
+        ))
+    
+    if disciplinas_por_campus is None:
+        disciplinas_por_campus = max(1, n_disciplinas // 4)
+    
+    campus_list = []
+    for i in range(n_campus):
+        # Campus de tamanhos variados em torno de disciplinas_por_campus
+        quantidade = min(n_disciplinas, max(1, int(rng.gauss(disciplinas_por_campus, disciplinas_por_campus * 0.2))))
+        escolhidas = rng.sample(disciplinas, quantidade)
+        campus = Campus(id=novo_id(), nome=f"Campus {i + 1:04d}", disciplinas=[d.id for d in escolhidas])
+        
+        for d in escolhidas:
+            if rng.random() >= preenchimento:
+                continue  # Campus ainda não preencheu esta disciplina
+            alunos_reais = max(0, int(round(rng.gauss(d.alunos_previstos, d.alunos_previstos * 0.12))))
+            # ~20% das disciplinas com CH real informada (reforços, licenças...)
+            ch_real_total = round(d.ch_prevista * rng.uniform(0.7, 1.3), 1) if rng.random() < 0.2 else 0.0
+            campus.dados_reais[d.id] = DadosReaisCampus(
+                disciplina_id=d.id,
+                alunos_reais=alunos_reais,
+                ch_real_total=ch_real_total,
+                observacoes=rng.choice(observacoes) if rng.random() < 0.3 else ""
+            )
+        campus_list.append(campus)
+    
+    return disciplinas, campus_list
+
+def main():
+    parser = argparse.ArgumentParser(description="Cria dados de exemplo ou sintéticos")
+    parser.add_argument("--campus", type=int, help="Gerar dados sintéticos com N campus")
+    parser.add_argument("--disciplinas", type=int, default=200, help="Disciplinas sintéticas")
+    parser.add_argument("--por-campus", type=int, help="Média de disciplinas por campus")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default="data")
+    args = parser.parse_args()
+    
+    if args.campus is None:
+        criar_dados_exemplo(DataManager(args.data_dir))
+        return
+    
+    data_manager = criar_data_manager(args.data_dir)
+    disciplinas, campus_list = gerar_dados_sinteticos(args.campus, args.disciplinas, args.por_campus, args.seed)
+    data_manager.save_disciplinas(disciplinas)
+    data_manager.save_campus(campus_list)
+    pares = sum(len(c.disciplinas) for c in campus_list)
+    print(f"✅ {len(disciplinas)} disciplinas e {len(campus_list)} campus sintéticos ({pares} pares) em {args.data_dir}")
+
 if __name__ == "__main__":
-    criar_dados_exemplo()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Dados e figuras dos gráficos do dashboard.
+
+Com centenas de campus, um grupo de barras por campus deixa a figura
+pesada para montar, transferir e desenhar. O gráfico por campus mostra os
+N maiores (pela maior entre CH prevista e real) e soma os demais em uma
+barra "Outros"; acima de um número de pontos, as séries passam a ser
+traços WebGL (Scattergl). As figuras são guardadas por versão dos dados:
+reruns sem alteração não refazem agregação nem figura.
+
+Limites configuráveis pelas variáveis de ambiente CALC_PRECPT_GRAFICO_TOP_N
+(padrão 20; 0 mostra todos os campus) e CALC_PRECPT_GRAFICO_WEBGL (pontos
+a partir dos quais usar WebGL, padrão 1000).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Tuple
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from cubo import CuboAgregado
+
+TOP_N_CAMPUS = 20
+LIMITE_WEBGL = 1000
+
+# Figuras guardadas (as mais antigas saem primeiro)
+MAXIMO_FIGURAS = 32
+
+CORES_STATUS = {"Excesso": "#d62728", "Falta": "#ff7f0e", "Adequado": "#2ca02c"}
+
+def limites_configurados() -> Tuple[int, int]:
+    """(top N de campus, pontos a partir dos quais usar WebGL) das variáveis de ambiente"""
+    top_n = int(os.environ.get("CALC_PRECPT_GRAFICO_TOP_N", str(TOP_N_CAMPUS)))
+    limite_webgl = int(os.environ.get("CALC_PRECPT_GRAFICO_WEBGL", str(LIMITE_WEBGL)))
+    return top_n, limite_webgl
+
+def resumo_campus(cubo: CuboAgregado, top_n: int = TOP_N_CAMPUS) -> pd.DataFrame:
+    """
+    CH prevista e real por campus, do maior para o menor. Com top_n > 0 e
+    mais campus que isso, os demais são somados na última linha,
+    "Outros (k campus)".
+    """
+    resumo = cubo.rollup(["campus"])[["campus", "ch_prevista", "ch_real"]]
+    tamanho = resumo[["ch_prevista", "ch_real"]].max(axis=1)
+    resumo = resumo.assign(_tamanho=tamanho).sort_values(["_tamanho", "campus"], ascending=[False, True])
+    resumo = resumo.drop(columns="_tamanho").reset_index(drop=True)
+    if top_n <= 0 or len(resumo) <= top_n:
+        return resumo
+
+    demais = resumo.iloc[top_n:]
+    outros = pd.DataFrame({
+        "campus": [f"Outros ({len(demais)} campus)"],
+        "ch_prevista": [demais["ch_prevista"].sum()],
+        "ch_real": [demais["ch_real"].sum()]
+    })
+    return pd.concat([resumo.iloc[:top_n], outros], ignore_index=True)
+
+def figura_campus(resumo: pd.DataFrame, limite_webgl: int = LIMITE_WEBGL) -> go.Figure:
+    """Barras agrupadas de CH prevista e real; pontos WebGL se houver limite_webgl pontos ou mais"""
+    series = (("ch_prevista", "CH Prevista"), ("ch_real", "CH Real"))
+    webgl = len(resumo) * len(series) >= limite_webgl
+    figura = go.Figure()
+    for coluna, nome in series:
+        if webgl:
+            figura.add_trace(go.Scattergl(x=resumo["campus"], y=resumo[coluna], name=nome, mode="markers"))
+        else:
+            figura.add_trace(go.Bar(x=resumo["campus"], y=resumo[coluna], name=nome))
+    figura.update_layout(
+        title="Carga Horária por Campus",
+        barmode="group",
+        xaxis_title="Campus",
+        yaxis_title="Carga horária (h)",
+        legend_title_text="",
+        # Sem rótulos por campus quando eles não cabem
+        xaxis_showticklabels=len(resumo) <= 100
+    )
+    return figura
+
+def figura_status(cubo: CuboAgregado) -> go.Figure:
+    """Pizza da quantidade de disciplinas por status"""
+    contagens = cubo.rollup(["status"]).set_index("status")["disciplinas"].sort_values(ascending=False)
+    figura = go.Figure(go.Pie(
+        labels=contagens.index,
+        values=contagens.values,
+        marker_colors=[CORES_STATUS.get(status) for status in contagens.index]
+    ))
+    figura.update_layout(title="Distribuição por Status")
+    return figura
+
+class CacheFiguras:
+    """
+    Figuras por chave (nome do gráfico, versão dos dados e parâmetros),
+    compartilhadas entre as sessões; guarda até `maximo` figuras. Guarda o
+    próprio go.Figure, que st.plotly_chart serializa sem validar de novo
+    (a partir de um dict ou JSON, a figura seria reconstruída e validada a
+    cada rerun). As figuras são somente leitura: quem precisar alterar uma
+    deve trabalhar em uma cópia (go.Figure(figura)).
+    """
+
+    def __init__(self, maximo: int = MAXIMO_FIGURAS):
+        self.maximo = maximo
+        self.construcoes = 0
+        self._figuras: "OrderedDict[Hashable, go.Figure]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: Hashable, construir: Callable[[], go.Figure]) -> go.Figure:
+        with self._lock:
+            if chave in self._figuras:
+                self._figuras.move_to_end(chave)
+                return self._figuras[chave]
+
+        # Fora da trava: duas sessões podem construir a mesma figura, mas nenhuma espera a outra
+        figura = construir()
+        with self._lock:
+            self.construcoes += 1
+            self._figuras[chave] = figura
+            while len(self._figuras) > self.maximo:
+                self._figuras.popitem(last=False)
+        return figura
+
+def grafico_campus(cache: CacheFiguras, versao: str, cubo: CuboAgregado,
+                   top_n: int = TOP_N_CAMPUS, limite_webgl: int = LIMITE_WEBGL) -> go.Figure:
+    return cache.obter(
+        ("campus", versao, top_n, limite_webgl),
+        lambda: figura_campus(resumo_campus(cubo, top_n), limite_webgl)
+    )
+
+def grafico_status(cache: CacheFiguras, versao: str, cubo: CuboAgregado) -> go.Figure:
+    return cache.obter(("status", versao), lambda: figura_status(cubo))
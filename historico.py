@@ -0,0 +1,312 @@
+"""
+Histórico de períodos (semestres) das disciplinas e dos dados dos campus.
+
+Cada período registrado guarda o estado de disciplinas e campus em
+<data_dir>/historico/periodos/, no codec do diretório: a cada INTERVALO_COMPLETO
+períodos um arquivo completo e, entre eles, apenas as diferenças para o
+período anterior (disciplinas, campus e dados reais alterados, e a ordem
+dos ids quando ela muda). Reconstruir um período lê no máximo o último
+completo e os deltas seguintes.
+
+Junto com o estado, cada período grava o resultado do cálculo (com as
+regras de status vigentes) em um arquivo Arrow indexado por campus e
+disciplina. As comparações entre períodos e a linha do tempo usam só esses
+arquivos e os totais do índice (indice.json), sem reconstruir estados nem
+reler o histórico de dados.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from concorrencia import caminho_temporario, gravar_atomico
+from instrumentacao import medir
+from models import Campus, Disciplina, dados_reais_de_dict, dados_reais_para_dict
+from regras import REGRAS_PADRAO, RegrasStatus
+from serializacao import codec_do_diretorio, decodificar_arquivo, desempacotar, empacotar, obter_codec
+from utils import calcular_colunas, calcular_metricas_resumo
+
+# Um período completo a cada tantos registros; os demais são deltas
+INTERVALO_COMPLETO = 6
+
+ARQUIVO_INDICE = "indice.json"
+
+# Arquivos dos períodos, separados do índice: nenhum rótulo ("indice", por exemplo) sobrescreve o índice
+SUBDIR_PERIODOS = "periodos"
+
+# Medidas comparadas entre períodos
+MEDIDAS_HISTORICO = ("ch_prevista", "ch_real", "diferenca_ch", "alunos_previstos", "alunos_reais")
+
+# Totais de cada período guardados no índice (chaves de calcular_metricas_resumo)
+TOTAIS_INDICE = ("total_ch_prevista", "total_ch_real", "diferenca_ch_total", "eficiencia_geral",
+                 "disciplinas_excesso", "disciplinas_falta", "disciplinas_adequadas", "disciplinas_total")
+
+NIVEIS_COMPARACAO = ("campus", "disciplina")
+
+Estado = Dict[str, Dict]
+
+def _estado(disciplinas: List[Disciplina], campus_list: List[Campus]) -> Estado:
+    """Estado de um período em dicionários indexados por id (na ordem original)"""
+    return {
+        "disciplinas": {d.id: asdict(d) for d in disciplinas},
+        "campus": {c.id: {"nome": c.nome, "disciplinas": list(c.disciplinas)} for c in campus_list},
+        "dados_reais": {
+            c.id: {disc_id: dados_reais_para_dict(dados) for disc_id, dados in c.dados_reais.items()}
+            for c in campus_list
+        }
+    }
+
+def _objetos(estado: Estado) -> Tuple[List[Disciplina], List[Campus]]:
+    disciplinas = [Disciplina(**dados) for dados in estado["disciplinas"].values()]
+    campus_list = [
+        Campus(
+            id=campus_id,
+            nome=dados["nome"],
+            disciplinas=list(dados["disciplinas"]),
+            dados_reais={
+                disc_id: dados_reais_de_dict(d) for disc_id, d in estado["dados_reais"].get(campus_id, {}).items()
+            }
+        )
+        for campus_id, dados in estado["campus"].items()
+    ]
+    return disciplinas, campus_list
+
+def _delta_dicionario(anterior: Dict, atual: Dict) -> Dict:
+    # Itens novos ou alterados; a ordem só é gravada se o conjunto ou a ordem dos ids mudou
+    return {
+        "alterados": {chave: valor for chave, valor in atual.items() if anterior.get(chave) != valor},
+        "ordem": None if list(anterior) == list(atual) else list(atual)
+    }
+
+def _aplicar_delta_dicionario(anterior: Dict, delta: Dict) -> Dict:
+    ordem = delta["ordem"] if delta["ordem"] is not None else list(anterior)
+    return {chave: delta["alterados"][chave] if chave in delta["alterados"] else anterior[chave] for chave in ordem}
+
+def _delta(anterior: Estado, atual: Estado) -> Dict:
+    dados_reais = {}
+    for campus_id, dados in atual["dados_reais"].items():
+        delta = _delta_dicionario(anterior["dados_reais"].get(campus_id, {}), dados)
+        if delta["alterados"] or delta["ordem"] is not None:
+            dados_reais[campus_id] = delta
+    return {
+        "disciplinas": _delta_dicionario(anterior["disciplinas"], atual["disciplinas"]),
+        "campus": _delta_dicionario(anterior["campus"], atual["campus"]),
+        "dados_reais": dados_reais
+    }
+
+def _aplicar_delta(anterior: Estado, delta: Dict) -> Estado:
+    campus = _aplicar_delta_dicionario(anterior["campus"], delta["campus"])
+    return {
+        "disciplinas": _aplicar_delta_dicionario(anterior["disciplinas"], delta["disciplinas"]),
+        "campus": campus,
+        "dados_reais": {
+            campus_id: (
+                _aplicar_delta_dicionario(anterior["dados_reais"].get(campus_id, {}), delta["dados_reais"][campus_id])
+                if campus_id in delta["dados_reais"] else anterior["dados_reais"].get(campus_id, {})
+            )
+            for campus_id in campus
+        }
+    }
+
+class HistoricoPeriodos:
+    def __init__(self, data_dir: str = "data", subdir: str = "historico"):
+        self.diretorio = os.path.join(data_dir, subdir)
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.codec = obter_codec(codec_do_diretorio(data_dir))
+        self.indice_file = os.path.join(self.diretorio, ARQUIVO_INDICE)
+        os.makedirs(os.path.join(self.diretorio, SUBDIR_PERIODOS), exist_ok=True)
+        self._lock = threading.Lock()
+        # Resultados por período: (assinatura do arquivo, DataFrame)
+        self._cache_resultados: Dict[str, Tuple[tuple, pd.DataFrame]] = {}
+
+    def _ler_indice(self) -> List[Dict]:
+        if not os.path.exists(self.indice_file):
+            return []
+        with open(self.indice_file, "r", encoding="utf-8") as f:
+            return json.load(f)["periodos"]
+
+    def _gravar_indice(self, periodos: List[Dict]):
+        conteudo = json.dumps({"periodos": periodos}, ensure_ascii=False, indent=2)
+        gravar_atomico(self.indice_file, conteudo.encode("utf-8"))
+
+    def periodos(self) -> List[Dict]:
+        """Entradas do índice, na ordem de registro (período, tipo, data, totais...)"""
+        return self._ler_indice()
+
+    @staticmethod
+    def _base_arquivo(periodo: str) -> str:
+        # Caminho relativo ao diretório do histórico, como gravado no índice (períodos
+        # registrados antes de SUBDIR_PERIODOS ficam na raiz). Rótulos como "2025.1"
+        # viram nomes de arquivo seguros
+        return SUBDIR_PERIODOS + "/" + re.sub(r"[^\w.-]", "_", periodo)
+
+    def _gravar_bytes(self, path: str, conteudo: bytes):
+        gravar_atomico(path, conteudo)
+
+    def _estado_do_periodo(self, periodos: List[Dict], posicao: int) -> Estado:
+        # Último completo até a posição e os deltas seguintes
+        inicio = max(i for i in range(posicao + 1) if periodos[i]["tipo"] == "completo")
+        estado = None
+        for entrada in periodos[inicio:posicao + 1]:
+            with open(os.path.join(self.diretorio, entrada["arquivo"]), "rb") as f:
+                objeto = decodificar_arquivo(f.read())
+            if entrada["tipo"] == "completo":
+                estado = desempacotar("historico_completo", objeto)
+            else:
+                estado = _aplicar_delta(estado, desempacotar("historico_delta", objeto))
+        return estado
+
+    @medir("historico.registrar_periodo")
+    def registrar_periodo(self, periodo: str, disciplinas: List[Disciplina], campus_list: List[Campus],
+                          regras: Optional[RegrasStatus] = None) -> Dict:
+        """Registra o estado atual como o período mais recente e devolve sua entrada no índice"""
+        periodo = periodo.strip()
+        if not periodo:
+            raise ValueError("Informe o rótulo do período")
+
+        with self._lock:
+            periodos = self._ler_indice()
+            if any(p["periodo"] == periodo for p in periodos):
+                raise ValueError(f"Período já registrado: {periodo}")
+            base = self._base_arquivo(periodo)
+            # Rótulos diferentes que viram o mesmo nome de arquivo (ex.: "2025/1" e "2025_1")
+            if any(os.path.splitext(p["resultados"])[0] == base for p in periodos):
+                raise ValueError(f"Rótulo de período conflita com um já registrado: {periodo}")
+
+            # Cálculo e métricas antes de gravar qualquer arquivo: um erro não deixa período pela metade
+            resultados = calcular_colunas(disciplinas, campus_list, regras)
+            if not resultados:
+                raise ValueError("Nenhuma disciplina associada a campus para registrar no período")
+            metricas = calcular_metricas_resumo(resultados)
+
+            estado = _estado(disciplinas, campus_list)
+            completo = len(periodos) % INTERVALO_COMPLETO == 0
+            if completo:
+                conteudo = empacotar("historico_completo", estado)
+            else:
+                conteudo = empacotar("historico_delta", _delta(self._estado_do_periodo(periodos, len(periodos) - 1), estado))
+            arquivo = base + self.codec.extensao
+            self._gravar_bytes(os.path.join(self.diretorio, arquivo), self.codec.codificar(conteudo))
+
+            disc_ids = {d.id for d in disciplinas}
+            campus_ids = [c.id for c in campus_list for disc_id in c.disciplinas if disc_id in disc_ids]
+            tabela = pa.table({
+                "campus_id": pa.array(campus_ids, type=pa.string()),
+                **{campo: resultados.coluna(campo) for campo in ("disciplina_id", "campus", "disciplina_nome", "curso")},
+                **{campo: resultados.coluna(campo) for campo in MEDIDAS_HISTORICO},
+                "status": resultados.coluna("status")
+            })
+            arquivo_resultados = base + ".arrow"
+            destino = os.path.join(self.diretorio, arquivo_resultados)
+            temporario = caminho_temporario(destino)
+            try:
+                with open(temporario, "wb") as f:
+                    with pa.ipc.new_file(f, tabela.schema) as writer:
+                        writer.write_table(tabela)
+                    # fsync antes do rename, como em gravar_atomico
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temporario, destino)
+            except BaseException:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+                raise
+
+            entrada = {
+                "periodo": periodo,
+                "tipo": "completo" if completo else "delta",
+                "arquivo": arquivo,
+                "resultados": arquivo_resultados,
+                "registrado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "regras": (regras or REGRAS_PADRAO).hash(),
+                "totais": {chave: metricas[chave] for chave in TOTAIS_INDICE}
+            }
+            periodos.append(entrada)
+            self._gravar_indice(periodos)
+            return entrada
+
+    def _entrada(self, periodos: List[Dict], periodo: str) -> int:
+        for posicao, entrada in enumerate(periodos):
+            if entrada["periodo"] == periodo:
+                return posicao
+        raise KeyError(f"Período não encontrado: {periodo}")
+
+    @medir("historico.carregar_periodo")
+    def carregar_periodo(self, periodo: str) -> Tuple[List[Disciplina], List[Campus]]:
+        """Disciplinas e campus como estavam no período"""
+        periodos = self._ler_indice()
+        return _objetos(self._estado_do_periodo(periodos, self._entrada(periodos, periodo)))
+
+    def resultados(self, periodo: str) -> pd.DataFrame:
+        """Resultado do cálculo gravado no registro do período (memory-map, em cache)"""
+        periodos = self._ler_indice()
+        path = os.path.join(self.diretorio, periodos[self._entrada(periodos, periodo)]["resultados"])
+        estado = os.stat(path)
+        assinatura = (estado.st_mtime_ns, estado.st_size)
+        em_cache = self._cache_resultados.get(periodo)
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+
+        df = pa.ipc.open_file(pa.memory_map(path, "r")).read_all().to_pandas(split_blocks=True)
+        self._cache_resultados[periodo] = (assinatura, df)
+        return df
+
+    def linha_do_tempo(self) -> pd.DataFrame:
+        """Totais de cada período, direto do índice"""
+        return pd.DataFrame([{"periodo": p["periodo"], **p["totais"]} for p in self._ler_indice()])
+
+    @medir("historico.comparar")
+    def comparar(self, periodo_a: str, periodo_b: str, nivel: str = "campus") -> pd.DataFrame:
+        """
+        Variação de CH e alunos de periodo_a para periodo_b, por campus ou por
+        campus × disciplina. Colunas <medida>_a, <medida>_b, var_<medida> e
+        var_pct_<medida> (NaN quando a base é zero); linhas presentes em só um
+        dos períodos contam como zero no outro (coluna situacao).
+        """
+        if nivel not in NIVEIS_COMPARACAO:
+            raise ValueError(f"Nível de comparação desconhecido: {nivel}")
+
+        chaves = ["campus_id"] if nivel == "campus" else ["campus_id", "disciplina_id"]
+        rotulos = ["campus"] if nivel == "campus" else ["campus", "disciplina_nome", "curso"]
+        lados = []
+        for periodo in (periodo_a, periodo_b):
+            df = self.resultados(periodo)
+            if nivel == "campus":
+                df = df.groupby("campus_id", sort=False).agg(
+                    {"campus": "last", **{medida: "sum" for medida in MEDIDAS_HISTORICO}}
+                ).reset_index()
+            else:
+                # Disciplina repetida no campus conta uma vez, somada
+                df = df.groupby(chaves, sort=False).agg(
+                    {**{rotulo: "last" for rotulo in rotulos}, **{medida: "sum" for medida in MEDIDAS_HISTORICO}}
+                ).reset_index()
+            lados.append(df)
+
+        comparacao = lados[0].merge(lados[1], on=chaves, how="outer", suffixes=("_a", "_b"), indicator=True)
+        comparacao["situacao"] = comparacao.pop("_merge").map({"left_only": "removido", "right_only": "novo", "both": "mantido"}).astype(str)
+        for rotulo in rotulos:
+            comparacao[rotulo] = comparacao.pop(f"{rotulo}_b").fillna(comparacao.pop(f"{rotulo}_a"))
+
+        for medida in MEDIDAS_HISTORICO:
+            tipo = lados[0][medida].dtype
+            a = comparacao[f"{medida}_a"].fillna(0).astype(tipo)
+            b = comparacao[f"{medida}_b"].fillna(0).astype(tipo)
+            comparacao[f"{medida}_a"] = a
+            comparacao[f"{medida}_b"] = b
+            comparacao[f"var_{medida}"] = b - a
+            with np.errstate(divide="ignore", invalid="ignore"):
+                comparacao[f"var_pct_{medida}"] = np.where(a != 0, (b - a) / np.abs(a) * 100, np.nan)
+
+        colunas = chaves + rotulos + ["situacao"] + [
+            coluna for medida in MEDIDAS_HISTORICO
+            for coluna in (f"{medida}_a", f"{medida}_b", f"var_{medida}", f"var_pct_{medida}")
+        ]
+        return comparacao[colunas]
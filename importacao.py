@@ -0,0 +1,245 @@
+"""
+Importação em lote dos dados reais de um campus a partir de CSV ou XLSX.
+O arquivo é lido em blocos, cada bloco é validado com operações
+vetorizadas e todas as linhas válidas são gravadas de uma só vez pelo
+gerenciador de dados. As linhas inválidas viram um relatório CSV.
+"""
+
+import io
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from models import MAXIMO_ALUNOS_REAIS, Disciplina, Campus, DadosReaisCampus
+
+# Nomes aceitos no cabeçalho (já normalizados) para cada coluna esperada
+ALIASES_COLUNAS = {
+    "disciplina_id": "disciplina_id",
+    "id": "disciplina_id",
+    "disciplina": "disciplina",
+    "disciplina_nome": "disciplina",
+    "nome": "disciplina",
+    "curso": "curso",
+    "alunos_reais": "alunos_reais",
+    "alunos": "alunos_reais",
+    "ch_real_total": "ch_real_total",
+    "ch_real": "ch_real_total",
+    "observacoes": "observacoes"
+}
+
+TAMANHO_BLOCO_PADRAO = 5000
+
+@dataclass
+class ResultadoImportacao:
+    linhas_lidas: int = 0
+    linhas_validas: int = 0
+    linhas_invalidas: int = 0
+    registros_gravados: int = 0
+    relatorio_erros: Optional[bytes] = None  # CSV com as linhas rejeitadas e o motivo
+
+def _normalizar(texto) -> str:
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return "_".join(texto.strip().lower().split())
+
+def _chave_nome_curso(nome: str, curso: str) -> str:
+    return f"{nome.strip().casefold()}\x1f{curso.strip().casefold()}"
+
+def _chaves_nome_curso(nome: pd.Series, curso: pd.Series) -> pd.Series:
+    # Versão vetorizada de _chave_nome_curso
+    def limpar(serie):
+        return serie.fillna("").astype(str).str.strip().str.casefold()
+    return limpar(nome) + "\x1f" + limpar(curso)
+
+def ler_em_blocos(arquivo, nome_arquivo: str, tamanho_bloco: int = TAMANHO_BLOCO_PADRAO) -> Iterator[pd.DataFrame]:
+    """
+    Lê um CSV (separador "," ou ";") ou XLSX em blocos de DataFrame com
+    valores em texto, sem carregar o arquivo inteiro em um único DataFrame.
+    O índice de cada bloco é o número da linha no arquivo (cabeçalho = linha
+    1), contando as linhas vazias puladas e as quebras dentro de campos.
+    """
+    if nome_arquivo.lower().endswith(".xlsx"):
+        workbook = load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            linhas = workbook.active.iter_rows(values_only=True)
+            cabecalho = next(linhas, None)
+            if cabecalho is None:
+                return
+            cabecalho = [str(c) if c is not None else "" for c in cabecalho]
+
+            bloco = []
+            numeros = []
+            em_branco = []
+            for numero, linha in enumerate(linhas, start=2):
+                linha = linha[:len(cabecalho)]
+                if all(valor is None or str(valor).strip() == "" for valor in linha):
+                    # Linhas vazias só entram se vier uma linha com dados depois (as do fim são ignoradas)
+                    em_branco.append((numero, linha))
+                    continue
+                for numero_vazia, vazia in em_branco:
+                    numeros.append(numero_vazia)
+                    bloco.append(vazia)
+                em_branco = []
+                numeros.append(numero)
+                bloco.append(linha)
+                if len(bloco) >= tamanho_bloco:
+                    yield pd.DataFrame(bloco, columns=cabecalho, index=numeros, dtype=object)
+                    bloco = []
+                    numeros = []
+            if bloco:
+                yield pd.DataFrame(bloco, columns=cabecalho, index=numeros, dtype=object)
+        finally:
+            workbook.close()
+        return
+
+    # Detectar o separador pela primeira linha
+    primeira = arquivo.readline()
+    if isinstance(primeira, bytes):
+        primeira = primeira.decode("utf-8-sig", errors="ignore")
+    arquivo.seek(0)
+    separador = ";" if primeira.count(";") > primeira.count(",") else ","
+
+    proxima_linha = 2
+    for bloco in pd.read_csv(
+        arquivo, sep=separador, dtype=str, keep_default_na=False,
+        encoding="utf-8-sig", chunksize=tamanho_bloco, skip_blank_lines=False
+    ):
+        # Cada registro começa na linha seguinte ao fim do anterior; um campo entre aspas
+        # com quebras de linha ocupa linhas a mais (contadas só nas colunas que as têm)
+        quebras = np.zeros(len(bloco), dtype=np.int64)
+        for coluna in bloco.columns:
+            valores = bloco[coluna]
+            if "\n" in "".join(valores.dropna().tolist()):
+                quebras += valores.str.count("\n").fillna(0).to_numpy(dtype=np.int64)
+        fins = proxima_linha + np.arange(len(bloco)) + np.cumsum(quebras)
+        bloco.index = fins - quebras
+        if len(bloco):
+            proxima_linha = int(fins[-1]) + 1
+
+        # Linhas vazias (todos os campos vazios) ficam de fora, como faria skip_blank_lines
+        candidatas = bloco[bloco.iloc[:, 0] == ""]
+        if len(candidatas):
+            vazias = candidatas.index[(candidatas == "").all(axis=1).to_numpy()]
+            bloco = bloco.drop(vazias)
+        if len(bloco):
+            yield bloco
+
+def validar_bloco(bloco: pd.DataFrame, campus: Campus, id_por_nome_curso: Dict[str, str],
+                  ids_validos: set) -> pd.DataFrame:
+    """
+    Valida um bloco já com colunas normalizadas. Devolve o bloco com as
+    colunas disciplina_id, alunos_reais, ch_real_total, observacoes e erro
+    (vazio nas linhas válidas).
+    """
+    erro = pd.Series("", index=bloco.index, dtype=object)
+
+    def marcar(mascara, motivo):
+        # Mantém o primeiro erro encontrado em cada linha
+        erro[mascara & (erro == "")] = motivo
+
+    # Identificar a disciplina por id ou pelo par nome + curso
+    disc_id = bloco["disciplina_id"].fillna("").astype(str).str.strip() if "disciplina_id" in bloco else pd.Series("", index=bloco.index)
+    if "disciplina" in bloco and "curso" in bloco:
+        por_nome = _chaves_nome_curso(bloco["disciplina"], bloco["curso"]).map(id_por_nome_curso).fillna("")
+        disc_id = disc_id.where(disc_id != "", por_nome)
+    marcar(disc_id == "", "Disciplina não encontrada (informe disciplina_id ou disciplina + curso)")
+    marcar(~disc_id.isin(ids_validos), "Disciplina não cadastrada")
+    marcar(~disc_id.isin(set(campus.disciplinas)), f"Disciplina não oferecida no campus {campus.nome}")
+
+    # Alunos reais: obrigatório, inteiro e não negativo
+    texto_alunos = bloco["alunos_reais"].fillna("").astype(str).str.strip() if "alunos_reais" in bloco else pd.Series("", index=bloco.index)
+    alunos = pd.to_numeric(texto_alunos.str.replace(",", ".", regex=False), errors="coerce")
+    marcar(alunos.isna(), "alunos_reais ausente ou não numérico")
+    marcar(~np.isfinite(alunos), "alunos_reais não finito")
+    marcar(alunos < 0, "alunos_reais negativo")
+    # Em float, MAXIMO_ALUNOS_REAIS arredonda para 2**63, que já não cabe em int64
+    marcar(alunos >= float(MAXIMO_ALUNOS_REAIS), "alunos_reais grande demais")
+    marcar(alunos.notna() & (alunos != np.floor(alunos)), "alunos_reais deve ser inteiro")
+
+    # CH real total: opcional (vazio = calculado automaticamente), não negativa
+    if "ch_real_total" in bloco:
+        texto_ch = bloco["ch_real_total"].fillna("").astype(str).str.strip()
+        ch = pd.to_numeric(texto_ch.str.replace(",", ".", regex=False), errors="coerce")
+        marcar((texto_ch != "") & ch.isna(), "ch_real_total não numérico")
+        marcar(ch.notna() & ~np.isfinite(ch), "ch_real_total não finito")
+        marcar(ch < 0, "ch_real_total negativo")
+        ch = ch.fillna(0.0)
+    else:
+        ch = pd.Series(0.0, index=bloco.index)
+
+    observacoes = bloco["observacoes"].fillna("").astype(str) if "observacoes" in bloco else pd.Series("", index=bloco.index)
+
+    # Linhas com erro viram 0 antes da conversão (os valores delas não são gravados)
+    invalidas = erro != ""
+    return pd.DataFrame({
+        "disciplina_id": disc_id,
+        "alunos_reais": alunos.mask(invalidas, 0).fillna(0).astype(np.int64),
+        "ch_real_total": ch.mask(invalidas, 0.0).astype(np.float64),
+        "observacoes": observacoes,
+        "erro": erro
+    })
+
+def importar_dados_reais(arquivo, nome_arquivo: str, campus: Campus, disciplinas: List[Disciplina],
+                         data_manager, gravar: bool = True,
+                         tamanho_bloco: int = TAMANHO_BLOCO_PADRAO) -> ResultadoImportacao:
+    """
+    Importa os dados reais de um campus. As linhas válidas são gravadas em
+    um único lote (save_dados_reais_lote); se a mesma disciplina aparece
+    mais de uma vez, vale a última linha.
+    """
+    id_por_nome_curso = {_chave_nome_curso(d.nome, d.curso): d.id for d in disciplinas}
+    ids_validos = {d.id for d in disciplinas}
+
+    resultado = ResultadoImportacao()
+    validos: Dict[str, DadosReaisCampus] = {}
+    erros = io.StringIO()
+    cabecalho_erros_escrito = False
+
+    for bloco in ler_em_blocos(arquivo, nome_arquivo, tamanho_bloco):
+        original = bloco
+        colunas = {}
+        for coluna in bloco.columns:
+            nome = ALIASES_COLUNAS.get(_normalizar(coluna))
+            if nome is not None and nome not in colunas.values():
+                colunas[coluna] = nome
+        bloco = bloco[list(colunas)].rename(columns=colunas)
+
+        validado = validar_bloco(bloco, campus, id_por_nome_curso, ids_validos)
+        invalidas = validado["erro"] != ""
+
+        # Número da linha no arquivo (cabeçalho = linha 1)
+        linhas = original.index.to_numpy()
+        resultado.linhas_lidas += len(bloco)
+        resultado.linhas_invalidas += int(invalidas.sum())
+        resultado.linhas_validas += int((~invalidas).sum())
+
+        if invalidas.any():
+            rejeitadas = original[invalidas.to_numpy()].copy()
+            rejeitadas.insert(0, "linha", linhas[invalidas.to_numpy()])
+            rejeitadas["erro"] = validado.loc[invalidas, "erro"].to_numpy()
+            rejeitadas.to_csv(erros, index=False, header=not cabecalho_erros_escrito)
+            cabecalho_erros_escrito = True
+
+        # Só a última linha de cada disciplina importa
+        ok = validado[~invalidas].drop_duplicates("disciplina_id", keep="last")
+        for disc_id, alunos_reais, ch_real_total, observacoes in zip(
+            ok["disciplina_id"], ok["alunos_reais"].tolist(), ok["ch_real_total"].tolist(), ok["observacoes"]
+        ):
+            validos[disc_id] = DadosReaisCampus(
+                disciplina_id=disc_id,
+                alunos_reais=alunos_reais,
+                ch_real_total=ch_real_total,
+                observacoes=observacoes
+            )
+
+    if gravar and validos:
+        data_manager.save_dados_reais_lote(campus.id, list(validos.values()))
+        resultado.registros_gravados = len(validos)
+
+    if cabecalho_erros_escrito:
+        resultado.relatorio_erros = erros.getvalue().encode("utf-8-sig")
+
+    return resultado
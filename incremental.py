@@ -0,0 +1,212 @@
+"""
+Recálculo incremental dos resultados e das métricas resumo.
+Mantém as colunas do último cálculo e o cubo de agregados (CuboAgregado)
+e, a cada conjunto de alterações, recalcula só as linhas afetadas,
+aplicando as diferenças às células do cubo.
+"""
+
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cubo import CuboAgregado
+from models import Disciplina, Campus, ResultFrame
+from regras import REGRAS_PADRAO, RegrasStatus
+from utils import calcular_colunas, metricas_de_totais, calcular_resultados, calcular_metricas_resumo
+
+# Tipos de alteração aceitos por CalculadoraIncremental.atualizar
+TIPOS_ALTERACAO = (
+    "disciplina",  # Disciplina criada, editada ou removida
+    "campus",  # Campus criado, renomeado ou removido
+    "campus_disciplina_adicionada",
+    "campus_disciplina_removida",
+    "dados_reais"  # Dados reais de uma disciplina de um campus salvos
+)
+
+# Alterações que mudam quais linhas existem (e não só seus valores)
+_ALTERACOES_ESTRUTURAIS = ("campus", "campus_disciplina_adicionada", "campus_disciplina_removida")
+
+@dataclass
+class Alteracao:
+    tipo: str
+    campus_id: Optional[str] = None
+    disciplina_id: Optional[str] = None
+
+    def __post_init__(self):
+        if self.tipo not in TIPOS_ALTERACAO:
+            raise ValueError(f"Tipo de alteração desconhecido: {self.tipo}")
+
+Chave = Tuple[str, str]  # (campus_id, disciplina_id)
+
+class CalculadoraIncremental:
+    """
+    Guarda os resultados do último cálculo e os atualiza a partir de uma
+    lista de Alteracao. O chamador passa sempre o estado atual completo
+    (disciplinas e campus); só as linhas afetadas são recalculadas.
+    """
+
+    def __init__(self, disciplinas: List[Disciplina], campus_list: List[Campus],
+                 resultados: Optional[ResultFrame] = None, regras: Optional[RegrasStatus] = None):
+        # resultados: cálculo completo já disponível (ex.: snapshot) para não recalcular,
+        # calculado com as mesmas regras de status
+        self.regras = regras or REGRAS_PADRAO
+        disc_ids = {d.id for d in disciplinas}
+        chaves = [(c.id, disc_id) for c in campus_list for disc_id in c.disciplinas if disc_id in disc_ids]
+        if resultados is None or len(resultados) != len(chaves):
+            # Com CALC_PRECPT_WORKERS > 1, redes grandes são calculadas em vários processos
+            resultados = calcular_resultados(disciplinas, campus_list, engine="paralelo", regras=self.regras)
+        self._colunas = {campo: resultados.coluna(campo).copy() for campo in ResultFrame.CAMPOS}
+        self._indexar(chaves)
+        self._disciplinas_existentes = disc_ids
+        self.cubo = CuboAgregado()
+        self.cubo.aplicar(self._colunas)
+
+    def _indexar(self, chaves: List[Chave]):
+        self._chaves = chaves
+        self._posicoes: Dict[Chave, List[int]] = defaultdict(list)
+        self._posicoes_disciplina: Dict[str, List[int]] = defaultdict(list)
+        for pos, (campus_id, disc_id) in enumerate(chaves):
+            self._posicoes[(campus_id, disc_id)].append(pos)
+            self._posicoes_disciplina[disc_id].append(pos)
+
+    @property
+    def resultados(self) -> ResultFrame:
+        return ResultFrame({campo: array.copy() for campo, array in self._colunas.items()})
+
+    @property
+    def metricas(self) -> Dict:
+        return metricas_de_totais(self.cubo.totais())
+
+    def atualizar(self, disciplinas: List[Disciplina], campus_list: List[Campus],
+                  alteracoes: List[Alteracao]) -> Tuple[ResultFrame, Dict]:
+        """Aplica as alterações e devolve (resultados, métricas) atualizados"""
+        disc_ids = {d.id for d in disciplinas}
+        estrutural = any(
+            a.tipo in _ALTERACOES_ESTRUTURAIS
+            # Disciplina criada ou removida muda quais pares geram linhas
+            or (a.tipo == "disciplina" and (a.disciplina_id in disc_ids) != (a.disciplina_id in self._disciplinas_existentes))
+            for a in alteracoes
+        )
+
+        if estrutural:
+            self._reestruturar(disciplinas, campus_list, alteracoes, disc_ids)
+        else:
+            posicoes = set()
+            for a in alteracoes:
+                if a.tipo == "dados_reais":
+                    posicoes.update(self._posicoes.get((a.campus_id, a.disciplina_id), ()))
+                else:
+                    posicoes.update(self._posicoes_disciplina.get(a.disciplina_id, ()))
+            self._recalcular_posicoes(disciplinas, campus_list, np.array(sorted(posicoes), dtype=np.int64))
+
+        self._disciplinas_existentes = disc_ids
+        return self.resultados, self.metricas
+
+    def _calcular_chaves(self, disciplinas: List[Disciplina], campus_list: List[Campus],
+                         chaves: List[Chave]) -> Tuple[ResultFrame, Dict[Chave, int]]:
+        """Calcula apenas os pares informados com a mesma engine do cálculo completo"""
+        disc_por_id = {d.id: d for d in disciplinas}
+        campus_por_id = {c.id: c for c in campus_list}
+
+        disciplinas_por_campus: Dict[str, List[str]] = defaultdict(list)
+        for campus_id, disc_id in chaves:
+            disciplinas_por_campus[campus_id].append(disc_id)
+
+        parciais = []
+        linha_da_chave = {}
+        for campus_id, disc_ids in disciplinas_por_campus.items():
+            campus = campus_por_id[campus_id]
+            parciais.append(Campus(id=campus.id, nome=campus.nome, disciplinas=disc_ids, dados_reais=campus.dados_reais))
+            for disc_id in disc_ids:
+                linha_da_chave[(campus_id, disc_id)] = len(linha_da_chave)
+
+        usadas = {disc_id for _, disc_id in chaves}
+        return calcular_colunas([d for d in disc_por_id.values() if d.id in usadas], parciais, self.regras), linha_da_chave
+
+    def _aplicar_no_cubo(self, colunas: Dict[str, np.ndarray], sinal: int):
+        self.cubo.aplicar(colunas, sinal)
+
+    def _recalcular_posicoes(self, disciplinas: List[Disciplina], campus_list: List[Campus], posicoes: np.ndarray):
+        if not len(posicoes):
+            return
+
+        chaves = list(dict.fromkeys(self._chaves[p] for p in posicoes))
+        novos, linha_da_chave = self._calcular_chaves(disciplinas, campus_list, chaves)
+        linhas = np.array([linha_da_chave[self._chaves[p]] for p in posicoes], dtype=np.int64)
+
+        self._aplicar_no_cubo({campo: array[posicoes] for campo, array in self._colunas.items()}, -1)
+        for campo, array in self._colunas.items():
+            array[posicoes] = novos.coluna(campo)[linhas]
+        self._aplicar_no_cubo({campo: array[posicoes] for campo, array in self._colunas.items()}, +1)
+
+    def _reestruturar(self, disciplinas: List[Disciplina], campus_list: List[Campus],
+                      alteracoes: List[Alteracao], disc_ids: set):
+        # Pares que precisam ser recalculados mesmo que já existissem
+        afetadas = set()
+        campus_afetados = set()
+        disciplinas_afetadas = set()
+        for a in alteracoes:
+            if a.tipo == "campus":
+                campus_afetados.add(a.campus_id)
+            elif a.tipo == "disciplina":
+                disciplinas_afetadas.add(a.disciplina_id)
+            else:
+                afetadas.add((a.campus_id, a.disciplina_id))
+
+        novas_chaves = [(c.id, disc_id) for c in campus_list for disc_id in c.disciplinas if disc_id in disc_ids]
+
+        # Para cada nova linha, a posição antiga reaproveitável (ou -1 para recalcular)
+        origem = np.fromiter(
+            (
+                -1 if (chave in afetadas or chave[0] in campus_afetados or chave[1] in disciplinas_afetadas)
+                else self._posicoes[chave][0] if chave in self._posicoes else -1
+                for chave in novas_chaves
+            ),
+            dtype=np.int64,
+            count=len(novas_chaves)
+        )
+        recalcular = np.flatnonzero(origem < 0)
+        chaves_recalculo = list(dict.fromkeys(novas_chaves[p] for p in recalcular))
+        novos, linha_da_chave = self._calcular_chaves(disciplinas, campus_list, chaves_recalculo)
+
+        # Linhas antigas usadas 0 vezes saem do cubo; usadas k > 1 vezes entram k - 1 vezes a mais
+        uso = np.bincount(origem[origem >= 0], minlength=len(self._chaves)) - 1
+        for sinal in (-1, +1):
+            pos = np.flatnonzero(uso * sinal > 0)
+            pos = np.repeat(pos, np.abs(uso[pos]))
+            self._aplicar_no_cubo({campo: array[pos] for campo, array in self._colunas.items()}, sinal)
+
+        linhas = np.array([linha_da_chave[novas_chaves[p]] for p in recalcular], dtype=np.int64)
+        reaproveitar = origem >= 0
+        colunas = {}
+        for campo, array in self._colunas.items():
+            nova = np.empty(len(novas_chaves), dtype=array.dtype)
+            nova[reaproveitar] = array[origem[reaproveitar]]
+            nova[recalcular] = novos.coluna(campo)[linhas]
+            colunas[campo] = nova
+        self._colunas = colunas
+        self._indexar(novas_chaves)
+
+        self._aplicar_no_cubo({campo: array[recalcular] for campo, array in self._colunas.items()}, +1)
+
+    def verificar(self, disciplinas: List[Disciplina], campus_list: List[Campus]) -> bool:
+        """
+        Confere o estado incremental contra um recálculo completo: linhas
+        idênticas, contagens exatas e somas iguais a menos de arredondamento.
+        """
+        completo = calcular_resultados(disciplinas, campus_list, regras=self.regras)
+        if self.resultados != completo:
+            return False
+
+        esperado = calcular_metricas_resumo(completo)
+        obtido = self.metricas
+        if esperado.keys() != obtido.keys():
+            return False
+        return all(
+            esperado[k] == obtido[k] if isinstance(esperado[k], int)
+            else math.isclose(esperado[k], obtido[k], rel_tol=1e-9, abs_tol=1e-6)
+            for k in esperado
+        )
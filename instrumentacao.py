@@ -0,0 +1,197 @@
+"""
+Instrumentação dos caminhos quentes: timers de trecho (spans) e contadores.
+Só é ligada com CALC_PRECPT_INSTRUMENTACAO=1 (lido na importação); desligada,
+medir() devolve a própria função, span() um contexto vazio compartilhado e
+contar() não faz nada, sem custo nos caminhos instrumentados.
+
+Ligada, cada span de nível mais alto (ex.: a renderização de uma página)
+vira uma linha JSON, com a árvore dos spans internos, em um log rotativo;
+os agregados vão para um arquivo no formato texto do Prometheus, reescrito
+periodicamente, para um coletor local (ex.: node_exporter textfile).
+"""
+
+import atexit
+import contextlib
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from concorrencia import gravar_atomico
+
+ATIVO = os.environ.get("CALC_PRECPT_INSTRUMENTACAO", "") == "1"
+DIRETORIO = os.environ.get("CALC_PRECPT_INSTRUMENTACAO_DIR", os.path.join("data", "instrumentacao"))
+
+# Log JSON: arquivo atual + backups rotacionados ao atingir o tamanho máximo
+TAMANHO_MAX_LOG = 1024 * 1024
+BACKUPS_LOG = 3
+
+# Intervalo mínimo entre reescritas do arquivo Prometheus (segundos)
+INTERVALO_PROMETHEUS = 5.0
+
+# Limites (segundos) dos buckets do histograma de duração
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_CONTEXTO_VAZIO = contextlib.nullcontext()
+
+class _Registro:
+    """Agregados de spans e contadores, compartilhados entre threads"""
+
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        self.arquivo_prometheus = os.path.join(diretorio, "metricas.prom")
+        self._lock = threading.Lock()
+        self._spans: Dict[str, Dict] = {}
+        self._contadores: Dict[str, float] = {}
+        self._ultima_exportacao = 0.0
+        self._local = threading.local()
+
+        os.makedirs(diretorio, exist_ok=True)
+        self._log = logging.getLogger("calc_precpt.instrumentacao")
+        self._log.propagate = False
+        self._log.setLevel(logging.INFO)
+        if not self._log.handlers:
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(diretorio, "spans.jsonl"), maxBytes=TAMANHO_MAX_LOG,
+                backupCount=BACKUPS_LOG, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._log.addHandler(handler)
+
+    def pilha(self) -> List[Dict]:
+        if not hasattr(self._local, "pilha"):
+            self._local.pilha = []
+        return self._local.pilha
+
+    def registrar_span(self, nome: str, duracao: float):
+        with self._lock:
+            estatisticas = self._spans.get(nome)
+            if estatisticas is None:
+                estatisticas = self._spans[nome] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(BUCKETS)}
+            estatisticas["count"] += 1
+            estatisticas["sum"] += duracao
+            estatisticas["max"] = max(estatisticas["max"], duracao)
+            for i, limite in enumerate(BUCKETS):
+                if duracao <= limite:
+                    estatisticas["buckets"][i] += 1
+
+    def contar(self, nome: str, valor: float = 1):
+        with self._lock:
+            self._contadores[nome] = self._contadores.get(nome, 0) + valor
+
+    def escrever_log(self, registro: Dict):
+        self._log.info(json.dumps(registro, ensure_ascii=False))
+
+    def exportar_prometheus(self, forcar: bool = False):
+        agora = time.monotonic()
+        with self._lock:
+            if not forcar and agora - self._ultima_exportacao < INTERVALO_PROMETHEUS:
+                return
+            self._ultima_exportacao = agora
+            texto = self._texto_prometheus()
+
+        # Escrita atômica: o coletor nunca lê um arquivo pela metade
+        gravar_atomico(self.arquivo_prometheus, texto.encode("utf-8"))
+
+    def _texto_prometheus(self) -> str:
+        # Chamado com o lock adquirido
+        linhas = [
+            "# HELP calc_precpt_span_segundos Duração dos trechos instrumentados.",
+            "# TYPE calc_precpt_span_segundos histogram"
+        ]
+        for nome, estatisticas in sorted(self._spans.items()):
+            rotulo = _rotulo(nome)
+            for limite, quantidade in zip(BUCKETS, estatisticas["buckets"]):
+                linhas.append(f'calc_precpt_span_segundos_bucket{{span="{rotulo}",le="{limite}"}} {quantidade}')
+            linhas.append(f'calc_precpt_span_segundos_bucket{{span="{rotulo}",le="+Inf"}} {estatisticas["count"]}')
+            linhas.append(f'calc_precpt_span_segundos_sum{{span="{rotulo}"}} {estatisticas["sum"]:.6f}')
+            linhas.append(f'calc_precpt_span_segundos_count{{span="{rotulo}"}} {estatisticas["count"]}')
+
+        linhas += [
+            "# HELP calc_precpt_span_max_segundos Maior duração observada de cada trecho.",
+            "# TYPE calc_precpt_span_max_segundos gauge"
+        ]
+        for nome, estatisticas in sorted(self._spans.items()):
+            linhas.append(f'calc_precpt_span_max_segundos{{span="{_rotulo(nome)}"}} {estatisticas["max"]:.6f}')
+
+        linhas += [
+            "# HELP calc_precpt_eventos_total Contadores dos caminhos instrumentados.",
+            "# TYPE calc_precpt_eventos_total counter"
+        ]
+        for nome, valor in sorted(self._contadores.items()):
+            linhas.append(f'calc_precpt_eventos_total{{nome="{_rotulo(nome)}"}} {valor:g}')
+        return "\n".join(linhas) + "\n"
+
+def _rotulo(texto: str) -> str:
+    # Escapes exigidos em valores de rótulo do formato texto do Prometheus
+    return texto.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+_registro: Optional[_Registro] = None
+if ATIVO:
+    _registro = _Registro(DIRETORIO)
+    atexit.register(_registro.exportar_prometheus, True)
+
+class _Span:
+    __slots__ = ("nome", "inicio", "filhos")
+
+    def __init__(self, nome: str):
+        self.nome = nome
+
+    def __enter__(self):
+        self.filhos = []
+        _registro.pilha().append(self)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duracao = time.perf_counter() - self.inicio
+        pilha = _registro.pilha()
+        pilha.pop()
+        _registro.registrar_span(self.nome, duracao)
+
+        no = {"span": self.nome, "ms": round(duracao * 1000, 3)}
+        if self.filhos:
+            no["filhos"] = self.filhos
+        if pilha:
+            pilha[-1].filhos.append(no)
+        else:
+            # Span de nível mais alto: uma linha no log com a árvore completa
+            no["ts"] = time.time()
+            no["thread"] = threading.current_thread().name
+            _registro.escrever_log(no)
+            _registro.exportar_prometheus()
+        return False
+
+def span(nome: str):
+    """Contexto que mede o trecho com o nome informado"""
+    if not ATIVO:
+        return _CONTEXTO_VAZIO
+    return _Span(nome)
+
+def medir(nome: Optional[str] = None):
+    """Decorador que mede cada chamada da função (nome padrão: módulo.função)"""
+    def decorador(funcao):
+        if not ATIVO:
+            return funcao
+        nome_span = nome or f"{funcao.__module__}.{funcao.__qualname__}"
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with _Span(nome_span):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorador
+
+def contar(nome: str, valor: float = 1):
+    """Soma valor ao contador informado"""
+    if ATIVO:
+        _registro.contar(nome, valor)
+
+def exportar():
+    """Reescreve agora o arquivo Prometheus (ex.: antes de encerrar um script)"""
+    if ATIVO:
+        _registro.exportar_prometheus(forcar=True)
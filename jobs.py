@@ -0,0 +1,104 @@
+"""
+Fila de geração de relatórios em segundo plano.
+Os pedidos rodam em um pool de threads, pedidos idênticos em andamento
+são unificados pela chave e os arquivos prontos ficam disponíveis para
+download até serem despejados (por tempo de vida ou por limite de itens).
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+# Estados possíveis de um JobRelatorio
+STATUS_JOB = ("pendente", "executando", "concluido", "erro")
+
+@dataclass
+class JobRelatorio:
+    chave: str
+    nome_arquivo: str
+    status: str = "pendente"
+    progresso: float = 0.0  # De 0 a 1
+    resultado: Optional[bytes] = None
+    erro: Optional[str] = None
+    criado_em: float = field(default_factory=time.time)
+    concluido_em: Optional[float] = None
+    ultimo_acesso: float = field(default_factory=time.time)
+
+    @property
+    def em_andamento(self) -> bool:
+        return self.status in ("pendente", "executando")
+
+class FilaRelatorios:
+    """
+    Fila de relatórios compartilhada entre as sessões. A função enviada
+    recebe um callback de progresso (fração de 0 a 1) e devolve os bytes
+    do arquivo gerado.
+    """
+
+    def __init__(self, max_workers: int = 2, max_artefatos: int = 20, ttl_segundos: float = 1800.0):
+        self.max_artefatos = max_artefatos
+        self.ttl_segundos = ttl_segundos
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="relatorio")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, JobRelatorio] = {}
+
+    def enviar(self, chave: str, funcao: Callable[[Callable[[float], None]], bytes], nome_arquivo: str) -> JobRelatorio:
+        """
+        Agenda a geração do relatório identificado por chave. Se já existe um
+        job com a mesma chave em andamento ou concluído, ele é devolvido.
+        """
+        with self._lock:
+            self._despejar()
+            job = self._jobs.get(chave)
+            if job is not None and job.status != "erro":
+                job.ultimo_acesso = time.time()
+                return job
+
+            job = JobRelatorio(chave=chave, nome_arquivo=nome_arquivo)
+            self._jobs[chave] = job
+
+        self._executor.submit(self._executar, job, funcao)
+        return job
+
+    def _executar(self, job: JobRelatorio, funcao: Callable[[Callable[[float], None]], bytes]):
+        job.status = "executando"
+
+        def progresso(fracao: float):
+            job.progresso = min(max(fracao, 0.0), 1.0)
+
+        try:
+            job.resultado = funcao(progresso)
+            job.progresso = 1.0
+            job.status = "concluido"
+        except Exception as e:
+            job.erro = str(e)
+            job.status = "erro"
+        finally:
+            job.concluido_em = time.time()
+
+    def obter(self, chave: str) -> Optional[JobRelatorio]:
+        """Job da chave, se ainda existir (renova o acesso para a política de despejo)"""
+        with self._lock:
+            self._despejar()
+            job = self._jobs.get(chave)
+            if job is not None:
+                job.ultimo_acesso = time.time()
+            return job
+
+    def _despejar(self):
+        # Chamado com o lock adquirido; jobs em andamento nunca são despejados
+        agora = time.time()
+        finalizados = [j for j in self._jobs.values() if not j.em_andamento]
+
+        for job in finalizados:
+            if agora - job.ultimo_acesso > self.ttl_segundos:
+                del self._jobs[job.chave]
+
+        restantes = sorted((j for j in finalizados if j.chave in self._jobs), key=lambda j: j.ultimo_acesso)
+        for job in restantes[:max(0, len(restantes) - self.max_artefatos)]:
+            del self._jobs[job.chave]
+
+    def encerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,7 +1,22 @@
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from dataclasses import dataclass, field, fields, replace
+from typing import Dict, Iterable, Iterator, List, Optional
+import hashlib
 import json
+import logging
 import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+from concorrencia import TravasDiretorio, gravar_atomico
+from instrumentacao import medir, contar
+from serializacao import (
+    CODECS, obter_codec, codec_do_diretorio, definir_codec_do_diretorio,
+    decodificar_arquivo, empacotar, desempacotar
+)
+
+logger = logging.getLogger("calc_precpt.dados")
 
 @dataclass
 class Disciplina:
@@ -18,6 +33,10 @@ class DadosReaisCampus:
     alunos_reais: int = 0
     ch_real_total: float = 0.0
     observacoes: str = ""
+    versao: int = 0  # Número de gravações do registro (0: nunca gravado)
+
+# Maior alunos_reais aceito na entrada de dados (importação, API): o cálculo usa colunas int64
+MAXIMO_ALUNOS_REAIS = int(np.iinfo(np.int64).max)
 
 @dataclass
 class Campus:
@@ -26,6 +45,13 @@ class Campus:
     disciplinas: List[str] = field(default_factory=list)
     dados_reais: Dict[str, DadosReaisCampus] = field(default_factory=dict)
 
+@dataclass
+class EntradaManifesto:
+    """Campus sem os dados reais: o suficiente para listar e escolher um campus"""
+    id: str
+    nome: str
+    disciplinas: List[str] = field(default_factory=list)
+
 @dataclass
 class CalculoResultado:
     disciplina_id: str
@@ -40,14 +66,292 @@ class CalculoResultado:
     diferenca_alunos: int
     eficiencia: float  # CH Real / CH Prevista
     status: str  # "Excesso", "Falta", "Adequado"
+    faixa: str  # O status ou uma faixa dele definida nas regras (ver regras.py)
+
+# Rótulos das colunas de resultados usados pelos relatórios Excel
+COLUNAS_RELATORIO = {
+    "campus": "Campus",
+    "curso": "Curso",
+    "disciplina_nome": "Disciplina",
+    "ch_prevista": "CH Prevista",
+    "ch_real": "CH Real",
+    "diferenca_ch": "Diferença CH",
+    "alunos_previstos": "Alunos Previstos",
+    "alunos_reais": "Alunos Reais",
+    "diferenca_alunos": "Diferença Alunos",
+    "eficiencia": "Eficiência %",
+    "status": "Status",
+    "faixa": "Faixa"
+}
+
+# Rótulos das colunas de resultados usados pelo dashboard
+COLUNAS_DASHBOARD = {
+    "campus": "Campus",
+    "curso": "Curso",
+    "disciplina_nome": "Disciplina",
+    "ch_prevista": "CH Prevista",
+    "ch_real": "CH Real",
+    "diferenca_ch": "Diferença",
+    "status": "Status"
+}
+
+class ResultFrame:
+    """
+    Resultados do cálculo armazenados uma única vez em colunas tipadas.
+    As colunas são somente leitura e compartilhadas (sem cópia) pelas
+    visões em DataFrame/NumPy; iterar devolve CalculoResultado.
+    """
+    CAMPOS = tuple(f.name for f in fields(CalculoResultado))
+    TIPOS = {
+        "disciplina_id": object,
+        "disciplina_nome": object,
+        "curso": object,
+        "campus": object,
+        "ch_prevista": np.float64,
+        "ch_real": np.float64,
+        "diferenca_ch": np.float64,
+        "alunos_previstos": np.int64,
+        "alunos_reais": np.int64,
+        "diferenca_alunos": np.int64,
+        "eficiencia": np.float64,
+        "status": object,
+        "faixa": object
+    }
+    
+    def __init__(self, colunas: Dict[str, np.ndarray]):
+        faltando = set(self.CAMPOS) - set(colunas)
+        if faltando:
+            raise ValueError(f"Colunas ausentes no ResultFrame: {sorted(faltando)}")
+        
+        self._colunas = {}
+        for campo in self.CAMPOS:
+            array = np.asarray(colunas[campo], dtype=self.TIPOS[campo])
+            array.setflags(write=False)
+            self._colunas[campo] = array
+        
+        tamanhos = {len(a) for a in self._colunas.values()}
+        if len(tamanhos) > 1:
+            raise ValueError("Colunas do ResultFrame com tamanhos diferentes")
+        self._tamanho = tamanhos.pop() if tamanhos else 0
+    
+    @classmethod
+    def from_records(cls, registros: Iterable[CalculoResultado]) -> "ResultFrame":
+        registros = list(registros)
+        return cls({
+            campo: np.array([getattr(r, campo) for r in registros], dtype=cls.TIPOS[campo])
+            for campo in cls.CAMPOS
+        })
+    
+    def __len__(self) -> int:
+        return self._tamanho
+    
+    def __iter__(self) -> Iterator[CalculoResultado]:
+        for i in range(self._tamanho):
+            yield self[i]
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.filtrar(i)
+
+        valores = {}
+        for campo in self.CAMPOS:
+            valor = self._colunas[campo][i]
+            valores[campo] = valor.item() if isinstance(valor, np.generic) else valor
+        return CalculoResultado(**valores)
+    
+    def __eq__(self, outro) -> bool:
+        if not isinstance(outro, ResultFrame):
+            return NotImplemented
+        return len(self) == len(outro) and all(
+            np.array_equal(self._colunas[c], outro._colunas[c]) for c in self.CAMPOS
+        )
+    
+    def coluna(self, campo: str) -> np.ndarray:
+        """Visão NumPy (somente leitura) de uma coluna"""
+        return self._colunas[campo]
+    
+    def to_dataframe(self, rotulos: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """
+        Visão em DataFrame sobre as mesmas colunas, sem cópia.
+        rotulos mapeia campo -> nome da coluna (e define quais colunas entram).
+        """
+        if rotulos is None:
+            rotulos = {campo: campo for campo in self.CAMPOS}
+        return pd.DataFrame({rotulo: self._colunas[campo] for campo, rotulo in rotulos.items()}, copy=False)
+    
+    def filtrar(self, selecao) -> "ResultFrame":
+        """Novo ResultFrame com as linhas da máscara booleana ou dos índices"""
+        return ResultFrame({campo: array[selecao] for campo, array in self._colunas.items()})
+    
+    def ordenar(self, campo: str, decrescente: bool = False) -> "ResultFrame":
+        """Ordenação estável por uma coluna numérica"""
+        chave = self._colunas[campo]
+        ordem = np.argsort(-chave if decrescente else chave, kind="stable")
+        return self.filtrar(ordem)
+
+# Backends de armazenamento disponíveis para criar_data_manager
+BACKENDS_ARMAZENAMENTO = ("json", "sqlite", "shards")
+
+def criar_data_manager(data_dir: str = "data", backend: Optional[str] = None, journal: Optional[bool] = None,
+                       codec: Optional[str] = None):
+    """
+    Cria o gerenciador de dados do backend escolhido. Sem backend explícito,
+    usa a variável de ambiente CALC_PRECPT_BACKEND (padrão: "json");
+    CALC_PRECPT_JOURNAL=1 liga o journal de edições do backend JSON.
+    codec: codec dos arquivos do backend JSON (ver serializacao.CODECS).
+    """
+    backend = backend or os.environ.get("CALC_PRECPT_BACKEND", "json")
+    if backend not in BACKENDS_ARMAZENAMENTO:
+        raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
+    
+    if backend == "sqlite":
+        from sqlite_manager import SQLiteDataManager
+        return SQLiteDataManager(data_dir)
+    if backend == "shards":
+        from shard_manager import ShardedDataManager
+        return ShardedDataManager(data_dir, codec=codec)
+    
+    if journal is None:
+        journal = os.environ.get("CALC_PRECPT_JOURNAL", "") == "1"
+    return DataManager(data_dir, journal=journal, codec=codec)
+
+def dados_reais_para_dict(dados: DadosReaisCampus) -> Dict:
+    return {
+        "disciplina_id": dados.disciplina_id,
+        "alunos_reais": dados.alunos_reais,
+        "ch_real_total": dados.ch_real_total,
+        "observacoes": dados.observacoes,
+        "versao": dados.versao
+    }
+
+def dados_reais_de_dict(dados_dict: Dict) -> DadosReaisCampus:
+    return DadosReaisCampus(
+        disciplina_id=dados_dict["disciplina_id"],
+        alunos_reais=dados_dict.get("alunos_reais", 0),
+        ch_real_total=dados_dict.get("ch_real_total", 0.0),
+        observacoes=dados_dict.get("observacoes", ""),
+        versao=dados_dict.get("versao", 0)
+    )
+
+class ConflitoVersao(Exception):
+    """
+    Gravação com verificar_versao=True de um registro que outra pessoa
+    gravou depois de ele ter sido lido (a versão lida não é mais a atual).
+    """
+    def __init__(self, campus_id: str, disciplina_id: str, versao_lida: int, versao_atual: int):
+        super().__init__(
+            f"Dados reais da disciplina {disciplina_id} no campus {campus_id} foram alterados "
+            f"por outra gravação (versão lida {versao_lida}, atual {versao_atual})"
+        )
+        self.campus_id = campus_id
+        self.disciplina_id = disciplina_id
+        self.versao_lida = versao_lida
+        self.versao_atual = versao_atual
+
+def versionar_lote(campus_id: str, atuais: Dict[str, DadosReaisCampus], lote: List[DadosReaisCampus],
+                   verificar_versao: bool) -> List[DadosReaisCampus]:
+    """
+    Cópias dos registros do lote com a versão seguinte à gravada em `atuais`.
+    Com verificar_versao, a versão de cada registro do lote deve ser a que
+    foi lida (0 para um registro novo) e ainda ser a atual; senão, nada é
+    gravado e ConflitoVersao é levantada.
+    """
+    versoes = {disc_id: dados.versao for disc_id, dados in atuais.items()}
+    if verificar_versao:
+        for dados in lote:
+            if dados.versao != versoes.get(dados.disciplina_id, 0):
+                raise ConflitoVersao(campus_id, dados.disciplina_id, dados.versao, versoes.get(dados.disciplina_id, 0))
+    
+    gravados = []
+    for dados in lote:
+        versoes[dados.disciplina_id] = versoes.get(dados.disciplina_id, 0) + 1
+        gravados.append(replace(dados, versao=versoes[dados.disciplina_id]))
+    return gravados
+
+@dataclass
+class _EntradaCache:
+    assinatura: tuple  # (mtime_ns, tamanho, inode) de cada arquivo de origem
+    hash: bytes  # Hash do conteúdo dos arquivos de origem
+    valor: list
 
 class DataManager:
-    def __init__(self, data_dir="data"):
+    """
+    Armazenamento em arquivos (JSON por padrão; o codec de cada diretório
+    é configurável, ver serializacao.py).
+
+    As leituras ficam em cache, indexadas por mtime, tamanho e hash do
+    conteúdo de cada arquivo: se nada mudou em disco, load_* devolve os
+    objetos já montados (compartilhados entre chamadas; só a lista é nova).
+    As gravações do próprio gerenciador invalidam o cache e alterações de
+    outros processos são detectadas pelo stat dos arquivos.
+
+    Com journal=True, save_dados_reais não reescreve campus.json: cada edição
+    vira uma linha (com fsync) em campus.journal, reaplicada por load_campus.
+    Quando o journal passa de limite_journal_bytes ou idade_max_journal
+    segundos, uma thread em segundo plano o compacta em campus.json.
+
+    Gravações concorrentes (threads ou processos sobre o mesmo diretório):
+    todo arquivo é gravado em um temporário e renomeado; cada campus tem a
+    sua trava (concorrencia.TravasDiretorio), mantida durante a verificação
+    e a gravação dos dados reais dele, e a leitura-alteração-gravação de
+    campus.json é feita sob a trava do arquivo, então nenhuma gravação
+    apaga a de outra. Cada registro de dados reais tem uma versão: com
+    verificar_versao=True, save_dados_reais_lote recusa (ConflitoVersao)
+    registros alterados por outra pessoa desde a leitura.
+    """
+    def __init__(self, data_dir="data", journal: bool = False,
+                 limite_journal_bytes: int = 1024 * 1024, idade_max_journal: float = 300.0,
+                 codec: Optional[str] = None):
         self.data_dir = data_dir
         os.makedirs(data_dir, exist_ok=True)
-        self.disciplinas_file = os.path.join(data_dir, "disciplinas.json")
-        self.campus_file = os.path.join(data_dir, "campus.json")
         
+        # Codec dos arquivos: o informado passa a ser o do diretório; senão, o já configurado
+        if codec is not None:
+            definir_codec_do_diretorio(data_dir, codec)
+        self.codec = obter_codec(codec or codec_do_diretorio(data_dir))
+        self.disciplinas_file = os.path.join(data_dir, "disciplinas" + self.codec.extensao)
+        self.campus_file = os.path.join(data_dir, "campus" + self.codec.extensao)
+        self._converter_arquivos_de_outro_codec()
+        self.journal_file = os.path.join(data_dir, "campus.journal")
+        # Journal congelado durante a compactação (novas edições vão para journal_file)
+        self.journal_compactando_file = self.journal_file + ".compactando"
+        # Linhas ilegíveis encontradas na compactação
+        self.journal_rejeitadas_file = self.journal_file + ".rejeitadas"
+        
+        self.journal = journal
+        self.limite_journal_bytes = limite_journal_bytes
+        self.idade_max_journal = idade_max_journal
+        # Trava "campus": campus.json (e compactação); "journal": o journal
+        self._travas = TravasDiretorio(data_dir)
+        self._compactacao_thread: Optional[threading.Thread] = None
+        self._journal_inicio = os.path.getmtime(self.journal_file) if os.path.exists(self.journal_file) else None
+        
+        self._lock_cache = threading.Lock()
+        self._cache: Dict[str, _EntradaCache] = {}
+        self._cache_stats = {
+            chave: {"hits": 0, "misses": 0, "leituras_disco": 0}
+            for chave in ("disciplinas", "campus")
+        }
+        
+    def _converter_arquivos_de_outro_codec(self):
+        # Ao trocar para um codec de outra extensão, regrava os arquivos existentes no novo formato
+        for destino in (self.disciplinas_file, self.campus_file):
+            if os.path.exists(destino):
+                continue
+            base = os.path.splitext(destino)[0]
+            for extensao in {codec.extensao for codec in CODECS.values()} - {self.codec.extensao}:
+                origem = base + extensao
+                conteudo = self._ler_bytes(origem)
+                if conteudo is not None:
+                    self._gravar_bytes(destino, self.codec.codificar(decodificar_arquivo(conteudo)))
+                    os.remove(origem)
+                    break
+    
+    @staticmethod
+    def _gravar_bytes(path: str, conteudo: bytes):
+        gravar_atomico(path, conteudo)
+    
+    @medir("datamanager.save_disciplinas")
     def save_disciplinas(self, disciplinas: List[Disciplina]):
         data = [
             {
@@ -60,15 +364,20 @@ class DataManager:
             }
             for d in disciplinas
         ]
-        with open(self.disciplinas_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self._gravar_bytes(self.disciplinas_file, self.codec.codificar(empacotar("disciplinas", data)))
+        self._invalidar_cache("disciplinas")
     
+    @medir("datamanager.load_disciplinas")
     def load_disciplinas(self) -> List[Disciplina]:
-        if not os.path.exists(self.disciplinas_file):
+        return list(self._carregar_com_cache("disciplinas", [self.disciplinas_file], self._parse_disciplinas))
+    
+    @staticmethod
+    def _parse_disciplinas(conteudos: List[Optional[bytes]]) -> List[Disciplina]:
+        (conteudo,) = conteudos
+        if conteudo is None:
             return []
         
-        with open(self.disciplinas_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = desempacotar("disciplinas", decodificar_arquivo(conteudo))
         
         return [
             Disciplina(
@@ -82,7 +391,47 @@ class DataManager:
             for item in data
         ]
     
+    @medir("datamanager.save_campus")
     def save_campus(self, campus_list: List[Campus]):
+        """
+        Substitui todos os campus, com os dados reais, pelos de campus_list.
+        Edições gravadas depois da leitura de campus_list se perdem: para
+        incluir ou remover um campus use adicionar_campus/remover_campus, e
+        para dados reais, save_dados_reais_lote.
+        """
+        with self._travas.arquivo("campus"), self._travas.arquivo("journal"):
+            self._substituir_campus(campus_list)
+    
+    def _substituir_campus(self, campus_list: List[Campus]):
+        # Com as travas "campus" e "journal": campus_list já inclui as edições do journal
+        self._escrever_campus(campus_list)
+        for path in (self.journal_compactando_file, self.journal_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self._journal_inicio = None
+        self._invalidar_cache("campus")
+    
+    @medir("datamanager.adicionar_campus")
+    def adicionar_campus(self, campus: Campus):
+        """Inclui um campus no fim da lista, sem regravar os dados dos demais a partir de uma leitura antiga"""
+        with self._travas.arquivo("campus"), self._travas.arquivo("journal"):
+            campus_list = self._load_campus_travado()
+            if any(c.id == campus.id for c in campus_list):
+                raise ValueError(f"Campus já cadastrado: {campus.id}")
+            self._substituir_campus(campus_list + [campus])
+    
+    @medir("datamanager.remover_campus")
+    def remover_campus(self, campus_id: str) -> Campus:
+        """Remove um campus (com os dados reais dele) e o devolve"""
+        with self._travas.campus(campus_id), self._travas.arquivo("campus"), self._travas.arquivo("journal"):
+            campus_list = self._load_campus_travado()
+            removido = next((c for c in campus_list if c.id == campus_id), None)
+            if removido is None:
+                raise KeyError(f"Campus não encontrado: {campus_id}")
+            self._substituir_campus([c for c in campus_list if c.id != campus_id])
+        return removido
+    
+    def _escrever_campus(self, campus_list: List[Campus]):
         data = []
         for campus in campus_list:
             campus_data = {
@@ -93,24 +442,53 @@ class DataManager:
             }
             
             for disc_id, dados in campus.dados_reais.items():
-                campus_data["dados_reais"][disc_id] = {
-                    "disciplina_id": dados.disciplina_id,
-                    "alunos_reais": dados.alunos_reais,
-                    "ch_real_total": dados.ch_real_total,
-                    "observacoes": dados.observacoes
-                }
+                campus_data["dados_reais"][disc_id] = dados_reais_para_dict(dados)
             
             data.append(campus_data)
         
-        with open(self.campus_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self._gravar_bytes(self.campus_file, self.codec.codificar(empacotar("campus", data)))
     
+    @medir("datamanager.load_campus")
     def load_campus(self) -> List[Campus]:
-        if not os.path.exists(self.campus_file):
+        # Cópias da lista de disciplinas e do dicionário de dados reais de cada campus: os
+        # objetos do cache de leitura são compartilhados entre as chamadas
+        return [
+            replace(c, disciplinas=list(c.disciplinas), dados_reais=dict(c.dados_reais))
+            for c in self._campus_em_cache()
+        ]
+    
+    def _campus_em_cache(self) -> List[Campus]:
+        """Campus do próprio cache de leitura, para uso interno sem alterá-los"""
+        # Evita ler campus.json e o journal no meio de uma compactação (deste ou de outro processo)
+        with self._travas.arquivo("campus"):
+            return self._load_campus_travado()
+    
+    def _load_campus_travado(self) -> List[Campus]:
+        return list(self._carregar_com_cache(
+            "campus",
+            [self.campus_file, self.journal_compactando_file, self.journal_file],
+            self._parse_campus
+        ))
+    
+    def _parse_campus(self, conteudos: List[Optional[bytes]]) -> List[Campus]:
+        base, compactando, journal = conteudos
+        campus_list = self._campus_de_bytes(base)
+        
+        # Reaplicar as edições ainda não compactadas, na ordem em que foram gravadas
+        self._aplicar_journal(campus_list, self._entradas_journal(compactando))
+        self._aplicar_journal(campus_list, self._entradas_journal(journal))
+        
+        return campus_list
+    
+    def _load_campus_base(self) -> List[Campus]:
+        return self._campus_de_bytes(self._ler_bytes(self.campus_file))
+    
+    @staticmethod
+    def _campus_de_bytes(conteudo: Optional[bytes]) -> List[Campus]:
+        if conteudo is None:
             return []
         
-        with open(self.campus_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = desempacotar("campus", decodificar_arquivo(conteudo))
         
         campus_list = []
         for item in data:
@@ -121,13 +499,266 @@ class DataManager:
             )
             
             for disc_id, dados_dict in item.get("dados_reais", {}).items():
-                campus.dados_reais[disc_id] = DadosReaisCampus(
-                    disciplina_id=dados_dict["disciplina_id"],
-                    alunos_reais=dados_dict.get("alunos_reais", 0),
-                    ch_real_total=dados_dict.get("ch_real_total", 0.0),
-                    observacoes=dados_dict.get("observacoes", "")
-                )
+                campus.dados_reais[disc_id] = dados_reais_de_dict(dados_dict)
             
             campus_list.append(campus)
         
-        return campus_list
\ No newline at end of file
+        return campus_list
+    
+    def load_manifesto(self) -> List[EntradaManifesto]:
+        """Id, nome e disciplinas de cada campus, sem os dados reais"""
+        return [EntradaManifesto(id=c.id, nome=c.nome, disciplinas=list(c.disciplinas)) for c in self._campus_em_cache()]
+    
+    def load_campus_por_id(self, campus_id: str) -> Optional[Campus]:
+        """Um único campus com os dados reais (None se não existir)"""
+        campus = next((c for c in self._campus_em_cache() if c.id == campus_id), None)
+        if campus is None:
+            return None
+        return replace(campus, disciplinas=list(campus.disciplinas), dados_reais=dict(campus.dados_reais))
+    
+    def save_dados_reais(self, campus_id: str, dados: DadosReaisCampus,
+                         verificar_versao: bool = False) -> DadosReaisCampus:
+        """Grava os dados reais de uma disciplina de um campus (ver save_dados_reais_lote)"""
+        return self.save_dados_reais_lote(campus_id, [dados], verificar_versao)[0]
+    
+    @medir("datamanager.save_dados_reais_lote")
+    def save_dados_reais_lote(self, campus_id: str, lote: List[DadosReaisCampus],
+                              verificar_versao: bool = False) -> List[DadosReaisCampus]:
+        """
+        Grava de uma vez os dados reais de várias disciplinas de um campus e
+        devolve os registros gravados, com a nova versão. Sem
+        verificar_versao, a última gravação vale (ex.: importação de planilha).
+        """
+        if not lote:
+            return []
+        
+        with self._travas.campus(campus_id):
+            with self._travas.arquivo("campus"):
+                campus_list = self._load_campus_travado()
+                posicao = next((i for i, c in enumerate(campus_list) if c.id == campus_id), None)
+                if posicao is None:
+                    raise KeyError(f"Campus não encontrado: {campus_id}")
+                campus = campus_list[posicao]
+                gravados = versionar_lote(campus_id, campus.dados_reais, lote, verificar_versao)
+                
+                if not self.journal:
+                    # Cópia do campus: os objetos da lista são os do cache de leitura
+                    dados_reais = dict(campus.dados_reais)
+                    dados_reais.update((dados.disciplina_id, dados) for dados in gravados)
+                    campus_list[posicao] = replace(campus, dados_reais=dados_reais)
+                    with self._travas.arquivo("journal"):
+                        self._substituir_campus(campus_list)
+                    return gravados
+            
+            # Com journal, só a trava do campus fica com a gravação: campus diferentes anexam em paralelo
+            self._anexar_journal(campus_id, gravados)
+        return gravados
+    
+    def _anexar_journal(self, campus_id: str, lote: List[DadosReaisCampus]):
+        agora = time.time()
+        linhas = "".join(
+            json.dumps(
+                {"campus_id": campus_id, "dados": dados_reais_para_dict(dados), "ts": agora},
+                ensure_ascii=False
+            ) + "\n"
+            for dados in lote
+        )
+        
+        with self._travas.arquivo("journal"):
+            # Uma queda durante a escrita pode deixar a última linha sem "\n": a nova
+            # entrada começa em outra linha para não ficar colada à incompleta
+            if not self._termina_em_nova_linha(self.journal_file):
+                linhas = "\n" + linhas
+            # Um único write + fsync para o lote inteiro
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(linhas)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._journal_inicio is None:
+                self._journal_inicio = time.time()
+            tamanho = os.path.getsize(self.journal_file)
+            idade = time.time() - self._journal_inicio
+        self._invalidar_cache("campus")
+        
+        if tamanho >= self.limite_journal_bytes or idade >= self.idade_max_journal:
+            self._compactar_em_segundo_plano()
+    
+    @staticmethod
+    def _termina_em_nova_linha(path: str) -> bool:
+        """Se o arquivo não existe, está vazio ou termina em nova linha"""
+        try:
+            with open(path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return True
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) == b"\n"
+        except FileNotFoundError:
+            return True
+    
+    @classmethod
+    def _ler_journal(cls, path: str, invalidas: Optional[List[bytes]] = None) -> List[Dict]:
+        return cls._entradas_journal(cls._ler_bytes(path), invalidas)
+    
+    @staticmethod
+    def _entradas_journal(conteudo: Optional[bytes], invalidas: Optional[List[bytes]] = None) -> List[Dict]:
+        """
+        Entradas do journal. Uma linha ilegível (ex.: incompleta por uma queda
+        durante a escrita) é pulada, sem descartar as seguintes, e guardada
+        em `invalidas` quando informada.
+        """
+        if not conteudo:
+            return []
+        
+        entradas = []
+        for linha in conteudo.splitlines():
+            if not linha.strip():
+                continue
+            try:
+                entradas.append(json.loads(linha))
+            except ValueError:
+                if invalidas is not None:
+                    invalidas.append(linha)
+        return entradas
+    
+    @staticmethod
+    def _aplicar_journal(campus_list: List[Campus], entradas: List[Dict]):
+        if not entradas:
+            return
+        
+        campus_por_id = {c.id: c for c in campus_list}
+        for entrada in entradas:
+            campus = campus_por_id.get(entrada["campus_id"])
+            if campus is None:
+                # Campus removido depois da edição
+                continue
+            dados = dados_reais_de_dict(entrada["dados"])
+            campus.dados_reais[dados.disciplina_id] = dados
+    
+    def _compactar_em_segundo_plano(self):
+        if self._compactacao_thread is not None and self._compactacao_thread.is_alive():
+            return
+        self._compactacao_thread = threading.Thread(target=self.compactar, name="compactacao-journal", daemon=True)
+        self._compactacao_thread.start()
+    
+    @medir("datamanager.compactar")
+    def compactar(self):
+        """Incorpora o journal em campus.json e o descarta"""
+        with self._travas.arquivo("campus"):
+            with self._travas.arquivo("journal"):
+                # Um journal congelado pendente (queda anterior) é compactado antes de congelar outro
+                if not os.path.exists(self.journal_compactando_file):
+                    if not os.path.exists(self.journal_file):
+                        return
+                    os.replace(self.journal_file, self.journal_compactando_file)
+                    self._journal_inicio = None
+            
+            # As novas edições continuam sendo anexadas ao journal enquanto compactamos
+            campus_list = self._load_campus_base()
+            invalidas = []
+            self._aplicar_journal(campus_list, self._ler_journal(self.journal_compactando_file, invalidas))
+            if invalidas:
+                # O journal é descartado a seguir: as linhas ilegíveis ficam guardadas para análise
+                with open(self.journal_rejeitadas_file, 'ab') as f:
+                    f.write(b"".join(linha + b"\n" for linha in invalidas))
+                    f.flush()
+                    os.fsync(f.fileno())
+                logger.warning(
+                    "Compactação do journal: %d linha(s) ilegível(is) ignorada(s), guardada(s) em %s",
+                    len(invalidas), self.journal_rejeitadas_file
+                )
+            self._escrever_campus(campus_list)
+            os.remove(self.journal_compactando_file)
+            self._invalidar_cache("campus")
+    
+    @staticmethod
+    def _ler_bytes(path: str) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    @staticmethod
+    def _assinatura_arquivo(path: str) -> Optional[tuple]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        # O inode muda a cada gravação atômica (arquivo novo renomeado sobre o antigo)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
+    def _carregar_com_cache(self, chave: str, paths: List[str], parse) -> list:
+        """
+        Valor de parse(conteúdos dos arquivos), relido só quando algum
+        arquivo muda. O valor é o mesmo objeto para todas as chamadas: os
+        load_* públicos devolvem cópias dos objetos mutáveis (listas e
+        dicionários de Campus); Disciplina e DadosReaisCampus são tratados
+        como valores e trocados com replace, nunca alterados.
+        """
+        stats = self._cache_stats.setdefault(chave, {"hits": 0, "misses": 0, "leituras_disco": 0})
+        assinatura = tuple(self._assinatura_arquivo(p) for p in paths)
+        
+        with self._lock_cache:
+            entrada = self._cache.get(chave)
+            if entrada is not None and entrada.assinatura == assinatura:
+                stats["hits"] += 1
+                contar(f"datamanager.cache_hit.{chave}")
+                return entrada.valor
+        
+        conteudos = [self._ler_bytes(p) for p in paths]
+        contar("datamanager.bytes_lidos", sum(len(c) for c in conteudos if c is not None))
+        digest = self._hash_conteudos(conteudos)
+        
+        with self._lock_cache:
+            stats["leituras_disco"] += 1
+            entrada = self._cache.get(chave)
+            if entrada is not None and entrada.hash == digest:
+                # Arquivo tocado mas com o mesmo conteúdo: reaproveitar os objetos
+                entrada.assinatura = assinatura
+                stats["hits"] += 1
+                contar(f"datamanager.cache_hit.{chave}")
+                return entrada.valor
+        
+        valor = parse(conteudos)
+        contar(f"datamanager.cache_miss.{chave}")
+        with self._lock_cache:
+            stats["misses"] += 1
+            self._cache[chave] = _EntradaCache(assinatura=assinatura, hash=digest, valor=valor)
+        return valor
+    
+    @staticmethod
+    def _hash_conteudos(conteudos: List[Optional[bytes]]) -> bytes:
+        h = hashlib.blake2b(digest_size=16)
+        for conteudo in conteudos:
+            # Prefixo de tamanho para que arquivo ausente e vazio não colidam
+            h.update(b"-" if conteudo is None else len(conteudo).to_bytes(8, "little") + conteudo)
+        return h.digest()
+    
+    def _invalidar_cache(self, chave: str):
+        with self._lock_cache:
+            self._cache.pop(chave, None)
+    
+    def estatisticas_cache(self) -> Dict[str, Dict[str, int]]:
+        """Contadores de hits, misses e leituras de disco do cache de leitura"""
+        with self._lock_cache:
+            return {chave: dict(stats) for chave, stats in self._cache_stats.items()}
+    
+    @medir("datamanager.versao_dados")
+    def versao_dados(self) -> str:
+        """
+        Identificador do conteúdo atual de disciplinas e campus: muda sempre
+        que qualquer um dos arquivos muda de conteúdo.
+        """
+        self.load_disciplinas()
+        self._campus_em_cache()
+        with self._lock_cache:
+            h = hashlib.blake2b(digest_size=8)
+            for chave in ("disciplinas", "campus"):
+                entrada = self._cache.get(chave)
+                h.update(entrada.hash if entrada is not None else b"-")
+        return h.hexdigest()
+    
+    def versao_catalogo(self) -> str:
+        """Identificador de disciplinas e da lista de campus (sem os dados reais, quando o backend os separa)"""
+        return self.versao_dados()
@@ -0,0 +1,100 @@
+"""
+Índices por categoria para filtrar e paginar a tabela de resultados.
+Para cada combinação de dimensões filtradas (campus, curso, status) é
+montado, uma única vez, um índice ordenado das linhas; buscar uma página
+filtrada custa só um acesso ao dicionário e o fatiamento da página.
+"""
+
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from models import ResultFrame
+
+# Dimensões que podem ser filtradas na tabela detalhada
+DIMENSOES_FILTRO = ("campus", "curso", "status")
+
+class IndiceResultados:
+    def __init__(self, resultados: ResultFrame):
+        self.resultados = resultados
+        self._codigos: Dict[str, np.ndarray] = {}
+        self._categorias: Dict[str, List[str]] = {}
+        self._codigo_da_categoria: Dict[str, Dict[str, int]] = {}
+        for dimensao in DIMENSOES_FILTRO:
+            # Categorias na ordem em que aparecem (mesma ordem de Series.unique)
+            codigos, categorias = pd.factorize(resultados.coluna(dimensao))
+            self._codigos[dimensao] = codigos.astype(np.int64)
+            self._categorias[dimensao] = list(categorias)
+            self._codigo_da_categoria[dimensao] = {valor: i for i, valor in enumerate(categorias)}
+
+        # (dimensões) -> (linhas ordenadas por grupo, {chave do grupo: (início, fim)})
+        self._indices: Dict[Tuple[str, ...], Tuple[np.ndarray, Dict[int, Tuple[int, int]]]] = {}
+
+    def categorias(self, dimensao: str) -> List[str]:
+        return self._categorias[dimensao]
+
+    def _chave(self, dimensoes: Tuple[str, ...], valores) -> np.ndarray:
+        # Combina os códigos das dimensões em um único inteiro por linha/grupo
+        chave = np.zeros(np.shape(valores[0]) if valores else (), dtype=np.int64)
+        for dimensao, valor in zip(dimensoes, valores):
+            chave = chave * len(self._categorias[dimensao]) + valor
+        return chave
+
+    def _indice(self, dimensoes: Tuple[str, ...]):
+        if dimensoes not in self._indices:
+            chaves = self._chave(dimensoes, [self._codigos[d] for d in dimensoes])
+            # Ordenação estável: dentro de cada grupo as linhas mantêm a ordem original
+            ordem = np.argsort(chaves, kind="stable")
+            grupos, inicios, contagens = np.unique(chaves[ordem], return_index=True, return_counts=True)
+            limites = {
+                int(g): (int(i), int(i + n))
+                for g, i, n in zip(grupos, inicios, contagens)
+            }
+            self._indices[dimensoes] = (ordem, limites)
+        return self._indices[dimensoes]
+
+    def preparar(self):
+        """Monta antecipadamente os índices de todas as combinações de filtros"""
+        for tamanho in range(1, len(DIMENSOES_FILTRO) + 1):
+            for dimensoes in combinations(DIMENSOES_FILTRO, tamanho):
+                self._indice(dimensoes)
+
+    def _faixa(self, filtros: Dict[str, str]) -> Tuple[Optional[np.ndarray], int, int]:
+        dimensoes = tuple(d for d in DIMENSOES_FILTRO if d in filtros)
+        if not dimensoes:
+            return None, 0, len(self.resultados)
+
+        codigos = []
+        for dimensao in dimensoes:
+            codigo = self._codigo_da_categoria[dimensao].get(filtros[dimensao])
+            if codigo is None:
+                return None, 0, 0
+            codigos.append(codigo)
+
+        ordem, limites = self._indice(dimensoes)
+        inicio, fim = limites.get(int(self._chave(dimensoes, codigos)), (0, 0))
+        return ordem, inicio, fim
+
+    def contar(self, filtros: Dict[str, str]) -> int:
+        """Quantidade de linhas que atendem aos filtros ({dimensão: valor})"""
+        _, inicio, fim = self._faixa(filtros)
+        return fim - inicio
+
+    def posicoes(self, filtros: Dict[str, str], pagina: int, tamanho_pagina: int) -> np.ndarray:
+        """Posições (no ResultFrame) das linhas da página, começando em 0"""
+        ordem, inicio, fim = self._faixa(filtros)
+        de = min(inicio + pagina * tamanho_pagina, fim)
+        ate = min(de + tamanho_pagina, fim)
+        if ordem is None:
+            return np.arange(de, ate)
+        return ordem[de:ate]
+
+    def pagina(self, filtros: Dict[str, str], pagina: int, tamanho_pagina: int,
+               rotulos: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """DataFrame só com as linhas da página, indexado pela posição original"""
+        posicoes = self.posicoes(filtros, pagina, tamanho_pagina)
+        df = self.resultados.filtrar(posicoes).to_dataframe(rotulos)
+        df.index = posicoes
+        return df
@@ -0,0 +1,154 @@
+"""
+Cálculo dos resultados em um pool de processos, para recálculos da
+instituição inteira (ex.: execuções noturnas).
+
+A lista de campus é dividida em partições contíguas, com quantidades de
+pares campus × disciplina parecidas, e cada processo calcula as suas com
+as mesmas funções da engine vetorizada (utils.achatar_pares e
+utils.calcular_pares). A tabela de disciplinas vai uma única vez para
+memória compartilhada, em vez de ser serializada a cada tarefa. As
+partes voltam na ordem das partições e são concatenadas, então o
+resultado é idêntico ao de calcular_colunas; os agregados (CuboAgregado,
+métricas) são montados a partir do resultado concatenado, como no
+cálculo em um processo.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from instrumentacao import medir, span
+from models import Campus, Disciplina, ResultFrame
+from regras import RegrasStatus
+from utils import achatar_pares, calcular_colunas, calcular_pares, montar_result_frame, tabela_disciplinas
+
+# Cada processo leva cerca de 1 s para iniciar (importa NumPy/pandas) e a
+# engine vetorizada calcula ~1 milhão de pares por segundo: abaixo disso o
+# pool não compensa
+MINIMO_PARES_PARALELO = 1_000_000
+
+# Partições por processo: tarefas menores equilibram campus de tamanhos diferentes
+PARTICOES_POR_WORKER = 4
+
+# Colunas numéricas da tabela de disciplinas, na ordem em que ficam no bloco compartilhado
+_COLUNAS_TABELA = (("ch_prevista", np.float64), ("alunos_previstos", np.int64), ("ch_por_aluno", np.float64))
+
+def workers_configurados() -> int:
+    """
+    Processos a usar: variável de ambiente CALC_PRECPT_WORKERS (padrão 1,
+    cálculo em um processo; 0 usa um processo por CPU).
+    """
+    workers = int(os.environ.get("CALC_PRECPT_WORKERS", "1"))
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+def _criar_bloco_disciplinas(disciplinas: List[Disciplina]) -> Tuple[shared_memory.SharedMemory, Dict]:
+    """
+    Copia a tabela de disciplinas para um bloco de memória compartilhada:
+    as colunas numéricas, seguidas dos offsets e dos bytes UTF-8 dos ids.
+    Retorna o bloco e o layout que os processos usam para ler.
+    """
+    n = len(disciplinas)
+    tabela = tabela_disciplinas(disciplinas)
+    ids = [d.id.encode("utf-8") for d in disciplinas]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(i) for i in ids], out=offsets[1:])
+
+    tamanho = 8 * n * len(_COLUNAS_TABELA) + 8 * (n + 1) + int(offsets[-1])
+    bloco = shared_memory.SharedMemory(create=True, size=max(tamanho, 1))
+    try:
+        inicio = 0
+        for nome, dtype in _COLUNAS_TABELA:
+            np.ndarray(n, dtype=dtype, buffer=bloco.buf, offset=inicio)[:] = tabela[nome]
+            inicio += 8 * n
+        np.ndarray(n + 1, dtype=np.int64, buffer=bloco.buf, offset=inicio)[:] = offsets
+        inicio += 8 * (n + 1)
+        bloco.buf[inicio:inicio + int(offsets[-1])] = b"".join(ids)
+    except BaseException:
+        bloco.close()
+        bloco.unlink()
+        raise
+    return bloco, {"nome": bloco.name, "n": n}
+
+# Estado de cada processo do pool, preenchido por _iniciar_worker
+_bloco_worker: Optional[shared_memory.SharedMemory] = None
+_tabela_worker: Optional[Dict] = None
+
+def _iniciar_worker(layout: Dict):
+    global _bloco_worker, _tabela_worker
+    _bloco_worker = shared_memory.SharedMemory(name=layout["nome"])
+    n = layout["n"]
+
+    tabela = {}
+    inicio = 0
+    for nome, dtype in _COLUNAS_TABELA:
+        tabela[nome] = np.ndarray(n, dtype=dtype, buffer=_bloco_worker.buf, offset=inicio)
+        inicio += 8 * n
+    offsets = np.ndarray(n + 1, dtype=np.int64, buffer=_bloco_worker.buf, offset=inicio)
+    inicio += 8 * (n + 1)
+    blob = bytes(_bloco_worker.buf[inicio:inicio + int(offsets[n])])
+    # Mesmo critério de tabela_disciplinas: com ids repetidos vale o último
+    tabela["posicao"] = {blob[offsets[i]:offsets[i + 1]].decode("utf-8"): i for i in range(n)}
+    _tabela_worker = tabela
+
+def _calcular_particao(particao: List[Campus]) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    pares = achatar_pares(particao, _tabela_worker["posicao"])
+    colunas = calcular_pares(pares["idx"], pares["alunos_reais"], pares["ch_informada"], _tabela_worker)
+    return pares["idx"], pares["campus_pos"], colunas
+
+def particionar(campus_list: List[Campus], n_particoes: int) -> List[Tuple[int, int]]:
+    """
+    Intervalos [início, fim) contíguos de campus_list com números de pares
+    (disciplinas por campus) parecidos. Nenhum intervalo fica vazio.
+    """
+    n_particoes = max(1, min(n_particoes, len(campus_list)))
+    acumulado = np.cumsum([len(c.disciplinas) for c in campus_list])
+    total = int(acumulado[-1]) if len(acumulado) else 0
+
+    limites = [0]
+    for k in range(1, n_particoes):
+        corte = int(np.searchsorted(acumulado, total * k / n_particoes, side="left")) + 1
+        corte = min(max(corte, limites[-1] + 1), len(campus_list) - (n_particoes - k))
+        limites.append(corte)
+    limites.append(len(campus_list))
+    return list(zip(limites[:-1], limites[1:]))
+
+@medir("paralelo.calcular_paralelo")
+def calcular_paralelo(disciplinas: List[Disciplina], campus_list: List[Campus],
+                      workers: Optional[int] = None, regras: Optional[RegrasStatus] = None) -> ResultFrame:
+    """
+    Mesmo resultado de calcular_colunas, com as colunas numéricas das
+    partições de campus calculadas em `workers` processos (padrão:
+    workers_configurados()); status e faixa são classificados depois, sobre
+    o resultado concatenado. Com um processo, poucos pares ou se o pool não
+    puder ser iniciado, o cálculo é feito neste processo.
+    """
+    workers = workers_configurados() if workers is None else workers
+    n_pares = sum(len(c.disciplinas) for c in campus_list)
+    if workers <= 1 or len(campus_list) < 2 or n_pares < MINIMO_PARES_PARALELO:
+        return calcular_colunas(disciplinas, campus_list, regras)
+
+    particoes = particionar(campus_list, workers * PARTICOES_POR_WORKER)
+    bloco, layout = _criar_bloco_disciplinas(disciplinas)
+    try:
+        # spawn: fork não é seguro no processo do Streamlit, que tem várias threads
+        contexto = multiprocessing.get_context("spawn")
+        with span("paralelo.pool"):
+            with ProcessPoolExecutor(max_workers=min(workers, len(particoes)), mp_context=contexto,
+                                     initializer=_iniciar_worker, initargs=(layout,)) as executor:
+                partes = list(executor.map(_calcular_particao, [campus_list[i:f] for i, f in particoes]))
+    except (OSError, BrokenProcessPool):
+        return calcular_colunas(disciplinas, campus_list, regras)
+    finally:
+        bloco.close()
+        bloco.unlink()
+
+    # campus_pos de cada parte é relativo ao início da sua partição
+    idx = np.concatenate([p[0] for p in partes])
+    campus_pos = np.concatenate([p[1] + inicio for p, (inicio, _) in zip(partes, particoes)])
+    colunas = {campo: np.concatenate([p[2][campo] for p in partes]) for campo in partes[0][2]}
+    return montar_result_frame(disciplinas, campus_list, idx, campus_pos, colunas, regras)
@@ -0,0 +1,182 @@
+"""
+Regras de classificação do status das disciplinas.
+
+As regras são declarativas (RegrasStatus, gravadas em
+<data_dir>/regras_status.json):
+- tolerâncias: a disciplina é "Adequado" se |diferença| <= max(relativa ×
+  CH prevista, horas); regras podem valer só para um campus e/ou curso, e
+  a última regra que se aplica a uma linha vale;
+- faixas: subdivisões de um status (ex.: "Excesso Crítico") a partir de
+  limites em horas e/ou relativos à CH prevista; a primeira faixa que se
+  aplica vale e, sem nenhuma, a faixa é o próprio status.
+
+RegrasStatus.compilar resolve as regras para as linhas de um cálculo em
+arrays de limites, e a classificação é feita com máscaras NumPy, sem
+avaliar regra por linha em Python. Todas as engines de cálculo, os
+cenários e a página de dados por campus usam este módulo. As regras
+padrão reproduzem a classificação original (5% da CH prevista).
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from concorrencia import gravar_atomico
+
+# Status na ordem dos códigos de ClassificadorStatus.codigos
+STATUS = ("Adequado", "Excesso", "Falta")
+
+# Tolerância padrão (fração da CH prevista) para considerar a disciplina adequada
+TOLERANCIA_PADRAO = 0.05
+
+ARQUIVO_REGRAS = "regras_status.json"
+
+@dataclass
+class RegraTolerancia:
+    """Tolerância das linhas do campus e/ou curso indicados (sem filtros: todas)"""
+    relativa: float = TOLERANCIA_PADRAO  # fração da CH prevista
+    horas: float = 0.0  # mínimo absoluto, em horas
+    campus: Optional[str] = None  # nome do campus
+    curso: Optional[str] = None
+
+    def __post_init__(self):
+        if self.relativa < 0 or self.horas < 0:
+            raise ValueError("Tolerâncias não podem ser negativas")
+
+@dataclass
+class Faixa:
+    """Linhas do status `grupo` com |diferença| >= min_horas e >= min_relativa × CH prevista"""
+    nome: str
+    grupo: str
+    min_horas: float = 0.0
+    min_relativa: float = 0.0
+
+    def __post_init__(self):
+        if self.grupo not in STATUS:
+            raise ValueError(f"Grupo da faixa {self.nome!r} deve ser um de {', '.join(STATUS)}")
+        if self.min_horas < 0 or self.min_relativa < 0:
+            raise ValueError(f"Limites da faixa {self.nome!r} não podem ser negativos")
+
+@dataclass
+class RegrasStatus:
+    tolerancias: List[RegraTolerancia] = field(default_factory=lambda: [RegraTolerancia()])
+    faixas: List[Faixa] = field(default_factory=list)
+
+    def __post_init__(self):
+        nomes = [f.nome for f in self.faixas]
+        if len(set(nomes)) != len(nomes) or set(nomes) & set(STATUS):
+            raise ValueError("Nomes de faixas devem ser únicos e diferentes dos status")
+
+    @property
+    def nomes_faixas(self) -> Tuple[str, ...]:
+        """Faixas possíveis, na ordem dos códigos: os status e depois as faixas configuradas"""
+        return STATUS + tuple(f.nome for f in self.faixas)
+
+    def para_dict(self) -> Dict:
+        return {"tolerancias": [asdict(r) for r in self.tolerancias], "faixas": [asdict(f) for f in self.faixas]}
+
+    @classmethod
+    def de_dict(cls, dados: Dict) -> "RegrasStatus":
+        return cls(
+            tolerancias=[RegraTolerancia(**r) for r in dados.get("tolerancias", [asdict(RegraTolerancia())])],
+            faixas=[Faixa(**f) for f in dados.get("faixas", [])]
+        )
+
+    def hash(self) -> str:
+        """Identifica as regras (entra na versão dos resultados calculados com elas)"""
+        conteudo = json.dumps(self.para_dict(), sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(conteudo, digest_size=8).hexdigest()
+
+    def compilar(self, curso: Sequence[str], campus: Sequence[str]) -> "ClassificadorStatus":
+        """Classificador das linhas com os cursos e nomes de campus informados"""
+        return ClassificadorStatus(self, np.asarray(curso, dtype=object), np.asarray(campus, dtype=object))
+
+    def classificar(self, diferenca_ch: np.ndarray, ch_prevista: np.ndarray,
+                    curso: Sequence[str], campus: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Status e faixa de cada linha (ver ClassificadorStatus.classificar)"""
+        return self.compilar(curso, campus).classificar(diferenca_ch, ch_prevista)
+
+REGRAS_PADRAO = RegrasStatus()
+
+def _mascara_categoria(codigos: np.ndarray, categorias: pd.Index, valor: Optional[str]) -> Optional[np.ndarray]:
+    # None: a regra não filtra por esta dimensão
+    if valor is None:
+        return None
+    posicao = categorias.get_indexer([valor])[0]
+    return codigos == posicao if posicao >= 0 else np.zeros(len(codigos), dtype=bool)
+
+class ClassificadorStatus:
+    """
+    Regras resolvidas para um conjunto de linhas: tolerância relativa e em
+    horas de cada linha. Os métodos aceitam arrays de qualquer forma cuja
+    última dimensão sejam as linhas (ex.: amostras × linhas nos cenários).
+    """
+
+    def __init__(self, regras: RegrasStatus, curso: np.ndarray, campus: np.ndarray):
+        self.regras = regras
+        n = len(curso)
+        codigos_curso, cursos = pd.factorize(curso)
+        codigos_campus, campus_unicos = pd.factorize(campus)
+
+        self.relativa = np.full(n, TOLERANCIA_PADRAO)
+        self.horas = np.zeros(n)
+        for regra in regras.tolerancias:
+            mascaras = [
+                m for m in (
+                    _mascara_categoria(codigos_curso, pd.Index(cursos), regra.curso),
+                    _mascara_categoria(codigos_campus, pd.Index(campus_unicos), regra.campus)
+                )
+                if m is not None
+            ]
+            if not mascaras:
+                self.relativa.fill(regra.relativa)
+                self.horas.fill(regra.horas)
+                continue
+            mascara = np.logical_and.reduce(mascaras)
+            self.relativa[mascara] = regra.relativa
+            self.horas[mascara] = regra.horas
+        self._com_horas = bool((self.horas > 0).any())
+
+    def codigos(self, diferenca_ch: np.ndarray, ch_prevista: np.ndarray) -> np.ndarray:
+        """Código do status (posição em STATUS) de cada linha"""
+        limite = ch_prevista * self.relativa
+        if self._com_horas:
+            limite = np.where(self.horas > 0, np.maximum(limite, self.horas), limite)
+        return np.select([np.abs(diferenca_ch) <= limite, diferenca_ch > 0], [0, 1], 2)
+
+    def codigos_faixa(self, diferenca_ch: np.ndarray, ch_prevista: np.ndarray, codigos: np.ndarray) -> np.ndarray:
+        """Código da faixa (posição em RegrasStatus.nomes_faixas) de cada linha"""
+        faixas = np.array(codigos, copy=True)
+        magnitude = np.abs(diferenca_ch)
+        # Da última para a primeira: em caso de sobreposição vale a primeira faixa listada
+        for posicao, faixa in reversed(list(enumerate(self.regras.faixas, start=len(STATUS)))):
+            mascara = (codigos == STATUS.index(faixa.grupo)) & (magnitude >= faixa.min_horas)
+            if faixa.min_relativa > 0:
+                mascara &= magnitude >= ch_prevista * faixa.min_relativa
+            faixas[mascara] = posicao
+        return faixas
+
+    def classificar(self, diferenca_ch: np.ndarray, ch_prevista: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Arrays com o nome do status e da faixa de cada linha"""
+        codigos = self.codigos(diferenca_ch, ch_prevista)
+        status = np.array(STATUS)[codigos]
+        if not self.regras.faixas:
+            return status, status
+        return status, np.array(self.regras.nomes_faixas)[self.codigos_faixa(diferenca_ch, ch_prevista, codigos)]
+
+def carregar_regras(data_dir: str) -> RegrasStatus:
+    """Regras gravadas no diretório de dados, ou as regras padrão"""
+    arquivo = os.path.join(data_dir, ARQUIVO_REGRAS)
+    if not os.path.exists(arquivo):
+        return REGRAS_PADRAO
+    with open(arquivo, "r", encoding="utf-8") as f:
+        return RegrasStatus.de_dict(json.load(f))
+
+def salvar_regras(data_dir: str, regras: RegrasStatus):
+    conteudo = json.dumps(regras.para_dict(), ensure_ascii=False, indent=2)
+    gravar_atomico(os.path.join(data_dir, ARQUIVO_REGRAS), conteudo.encode("utf-8"))
@@ -0,0 +1,174 @@
+"""
+Codecs de serialização dos arquivos de dados e versionamento do schema.
+
+Cada arquivo gravado é um envelope {"tipo", "schema", "dados"}: o número
+do schema, independente para cada tipo, permite migrar arquivos antigos
+para o formato atual na leitura (arquivos de disciplinas e campus
+anteriores ao envelope, uma lista simples, são o schema 0).
+O conteúdo é autodescritivo, então qualquer arquivo pode ser lido seja
+qual for o codec configurado; o codec só decide como gravar.
+
+O codec de cada diretório de dados fica em <data_dir>/formato.json.
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, List
+
+from concorrencia import gravar_atomico
+
+# Versão atual do schema de cada tipo de arquivo: ao mudar o formato de um tipo,
+# incremente só a versão dele e registre a migração em MIGRACOES
+VERSOES_SCHEMA: Dict[str, int] = {
+    "disciplinas": 1,
+    "campus": 1,
+    "manifesto": 1,
+    "campus_shard": 1,
+    "historico_completo": 1,
+    "historico_delta": 1
+}
+
+ARQUIVO_FORMATO = "formato.json"
+CODEC_PADRAO = "json"
+
+class Codec:
+    nome = ""
+    extensao = ""
+
+    def codificar(self, objeto) -> bytes:
+        raise NotImplementedError
+
+    def decodificar(self, conteudo: bytes):
+        raise NotImplementedError
+
+class CodecJSON(Codec):
+    """JSON indentado, para leitura e edição manual"""
+    nome = "json"
+    extensao = ".json"
+
+    def codificar(self, objeto) -> bytes:
+        return json.dumps(objeto, ensure_ascii=False, indent=2).encode("utf-8")
+
+    def decodificar(self, conteudo: bytes):
+        return json.loads(conteudo)
+
+class CodecJSONCompacto(CodecJSON):
+    """JSON sem espaços: arquivos menores e leitura/gravação mais rápidas"""
+    nome = "json-compacto"
+
+    def codificar(self, objeto) -> bytes:
+        return json.dumps(objeto, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class CodecMsgpack(Codec):
+    """MessagePack: formato binário, o mais compacto e rápido"""
+    nome = "msgpack"
+    extensao = ".msgpack"
+
+    def __init__(self):
+        import msgpack  # Só é necessário quando este codec é usado
+        self._msgpack = msgpack
+
+    def codificar(self, objeto) -> bytes:
+        return self._msgpack.packb(objeto, use_bin_type=True)
+
+    def decodificar(self, conteudo: bytes):
+        return self._msgpack.unpackb(conteudo, raw=False)
+
+CODECS = {codec.nome: codec for codec in (CodecJSON, CodecJSONCompacto, CodecMsgpack)}
+
+def obter_codec(nome: str) -> Codec:
+    if nome not in CODECS:
+        raise ValueError(f"Codec desconhecido: {nome}")
+    return CODECS[nome]()
+
+def decodificar_arquivo(conteudo: bytes):
+    """Decodifica o conteúdo de um arquivo de dados de qualquer codec"""
+    if conteudo.lstrip()[:1] in (b"{", b"["):
+        return json.loads(conteudo)
+    return obter_codec("msgpack").decodificar(conteudo)
+
+def codec_do_diretorio(data_dir: str) -> str:
+    """
+    Codec configurado para o diretório; sem configuração, usa a variável de
+    ambiente CALC_PRECPT_CODEC (padrão: JSON indentado, o formato original).
+    """
+    arquivo = os.path.join(data_dir, ARQUIVO_FORMATO)
+    if os.path.exists(arquivo):
+        with open(arquivo, "r", encoding="utf-8") as f:
+            return json.load(f)["codec"]
+    return os.environ.get("CALC_PRECPT_CODEC", CODEC_PADRAO)
+
+def definir_codec_do_diretorio(data_dir: str, nome: str):
+    obter_codec(nome)  # Valida o nome (e a dependência do codec)
+    gravar_atomico(os.path.join(data_dir, ARQUIVO_FORMATO), json.dumps({"codec": nome}).encode("utf-8"))
+
+def _migrar_disciplinas_v0(dados: List[Dict]) -> List[Dict]:
+    # Schema 0 (lista simples): campos numéricos podiam faltar
+    return [
+        {
+            "id": item["id"],
+            "nome": item["nome"],
+            "curso": item["curso"],
+            "ch_prevista": item.get("ch_prevista", 0.0),
+            "alunos_previstos": item.get("alunos_previstos", 0),
+            "ch_por_aluno": item.get("ch_por_aluno", 0.0)
+        }
+        for item in dados
+    ]
+
+def _migrar_campus_v0(dados: List[Dict]) -> List[Dict]:
+    # Schema 0 (lista simples): disciplinas, dados reais e seus campos podiam faltar
+    return [
+        {
+            "id": item["id"],
+            "nome": item["nome"],
+            "disciplinas": item.get("disciplinas", []),
+            "dados_reais": {
+                disc_id: {
+                    "disciplina_id": dados_dict["disciplina_id"],
+                    "alunos_reais": dados_dict.get("alunos_reais", 0),
+                    "ch_real_total": dados_dict.get("ch_real_total", 0.0),
+                    "observacoes": dados_dict.get("observacoes", "")
+                }
+                for disc_id, dados_dict in item.get("dados_reais", {}).items()
+            }
+        }
+        for item in dados
+    ]
+
+# tipo -> {versão de origem: função que converte os dados para a versão seguinte}
+MIGRACOES: Dict[str, Dict[int, Callable[[Any], Any]]] = {
+    "disciplinas": {0: _migrar_disciplinas_v0},
+    "campus": {0: _migrar_campus_v0}
+}
+
+def _versao_atual(tipo: str) -> int:
+    if tipo not in VERSOES_SCHEMA:
+        raise ValueError(f"Tipo de arquivo desconhecido: {tipo}")
+    return VERSOES_SCHEMA[tipo]
+
+def empacotar(tipo: str, dados) -> Dict:
+    """Envelope com o tipo e a versão do schema do tipo, pronto para o codec"""
+    return {"tipo": tipo, "schema": _versao_atual(tipo), "dados": dados}
+
+def desempacotar(tipo: str, objeto) -> Any:
+    """Dados do envelope, migrados para a versão atual do schema do tipo"""
+    atual = _versao_atual(tipo)
+    if isinstance(objeto, list):
+        versao, dados = 0, objeto
+    else:
+        if objeto.get("tipo") != tipo:
+            raise ValueError(f"Arquivo de {objeto.get('tipo')} lido como {tipo}")
+        versao, dados = objeto["schema"], objeto["dados"]
+
+    if versao > atual:
+        raise ValueError(
+            f"Arquivo de {tipo} com schema {versao}, mais novo que o suportado ({atual}); atualize a aplicação"
+        )
+    while versao < atual:
+        migracao = MIGRACOES.get(tipo, {}).get(versao)
+        if migracao is None:
+            raise ValueError(f"Sem migração do schema {versao} de {tipo} para o {versao + 1}")
+        dados = migracao(dados)
+        versao += 1
+    return dados
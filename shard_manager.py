@@ -0,0 +1,248 @@
+"""
+Armazenamento particionado por campus.
+
+<data_dir>/manifesto_campus.<ext> guarda id, nome e disciplinas de cada
+campus; os dados reais de cada campus ficam em um arquivo próprio em
+<data_dir>/campus/. load_campus_por_id lê só o arquivo do campus pedido
+e as gravações de dados reais reescrevem só esse arquivo, então o custo
+de editar um campus não depende do tamanho da instituição.
+"""
+
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+from concorrencia import nome_arquivo_seguro
+from instrumentacao import medir
+from models import (
+    Campus, DadosReaisCampus, DataManager, EntradaManifesto, dados_reais_para_dict, dados_reais_de_dict, versionar_lote
+)
+from serializacao import CODECS, decodificar_arquivo, empacotar, desempacotar
+
+class ShardedDataManager(DataManager):
+    """
+    Disciplinas como no DataManager; campus em um manifesto + um arquivo
+    por campus, todos com o codec do diretório e cache de leitura próprio.
+    Na primeira execução sobre um diretório com campus.<ext>, os campus são
+    divididos nos arquivos por campus e o arquivo único é renomeado para
+    campus.<ext>.migrado.
+
+    Gravar dados reais usa só a trava do campus: editores de campus
+    diferentes gravam em paralelo, e os do mesmo campus, um de cada vez.
+    Alterações na lista de campus usam a trava do manifesto.
+    """
+
+    def __init__(self, data_dir="data", codec: Optional[str] = None):
+        super().__init__(data_dir, journal=False, codec=codec)
+        self.shards_dir = os.path.join(data_dir, "campus")
+        os.makedirs(self.shards_dir, exist_ok=True)
+        self.manifesto_file = os.path.join(data_dir, "manifesto_campus" + self.codec.extensao)
+
+        self._converter_shards_de_outro_codec()
+        if not os.path.exists(self.manifesto_file):
+            self._migrar_arquivo_unico()
+
+    def _arquivo_shard(self, campus_id: str) -> str:
+        # Ids fora do padrão de nome de arquivo viram um hash
+        return os.path.join(self.shards_dir, nome_arquivo_seguro(campus_id) + self.codec.extensao)
+
+    def _converter_shards_de_outro_codec(self):
+        if os.path.exists(self.manifesto_file):
+            return
+        for extensao in {codec.extensao for codec in CODECS.values()} - {self.codec.extensao}:
+            manifesto_antigo = os.path.join(self.data_dir, "manifesto_campus" + extensao)
+            if not os.path.exists(manifesto_antigo):
+                continue
+            # Shards primeiro: o manifesto no novo formato só aparece com todos já convertidos
+            for nome in os.listdir(self.shards_dir):
+                if nome.endswith(extensao):
+                    origem = os.path.join(self.shards_dir, nome)
+                    destino = origem[:-len(extensao)] + self.codec.extensao
+                    self._gravar_bytes(destino, self.codec.codificar(decodificar_arquivo(self._ler_bytes(origem))))
+                    os.remove(origem)
+            self._gravar_bytes(
+                self.manifesto_file, self.codec.codificar(decodificar_arquivo(self._ler_bytes(manifesto_antigo)))
+            )
+            os.remove(manifesto_antigo)
+            return
+
+    def _migrar_arquivo_unico(self):
+        if not os.path.exists(self.campus_file):
+            return
+        # Inclui edições pendentes de um journal do DataManager
+        campus_list = DataManager._parse_campus(self, [
+            self._ler_bytes(self.campus_file),
+            self._ler_bytes(self.journal_compactando_file),
+            self._ler_bytes(self.journal_file)
+        ])
+        self.save_campus(campus_list)
+        for path in (self.journal_compactando_file, self.journal_file):
+            if os.path.exists(path):
+                os.remove(path)
+        os.replace(self.campus_file, self.campus_file + ".migrado")
+
+    @medir("shards.load_manifesto")
+    def load_manifesto(self) -> List[EntradaManifesto]:
+        # Cópias: as entradas do cache de leitura são compartilhadas entre as chamadas
+        return [EntradaManifesto(id=e.id, nome=e.nome, disciplinas=list(e.disciplinas)) for e in self._manifesto()]
+
+    def _manifesto(self) -> List[EntradaManifesto]:
+        """Entradas do próprio cache de leitura, para uso interno sem alterá-las"""
+        return list(self._carregar_com_cache("manifesto", [self.manifesto_file], self._parse_manifesto))
+
+    @staticmethod
+    def _parse_manifesto(conteudos: List[Optional[bytes]]) -> List[EntradaManifesto]:
+        (conteudo,) = conteudos
+        if conteudo is None:
+            return []
+        return [
+            EntradaManifesto(id=item["id"], nome=item["nome"], disciplinas=item["disciplinas"])
+            for item in desempacotar("manifesto", decodificar_arquivo(conteudo))
+        ]
+
+    def _carregar_shard(self, campus_id: str) -> Dict[str, DadosReaisCampus]:
+        return self._carregar_com_cache(f"campus:{campus_id}", [self._arquivo_shard(campus_id)], self._parse_shard)
+
+    @staticmethod
+    def _parse_shard(conteudos: List[Optional[bytes]]) -> Dict[str, DadosReaisCampus]:
+        (conteudo,) = conteudos
+        if conteudo is None:
+            return {}
+        dados = desempacotar("campus_shard", decodificar_arquivo(conteudo))
+        return {disc_id: dados_reais_de_dict(dados_dict) for disc_id, dados_dict in dados["dados_reais"].items()}
+
+    def _codificar_shard(self, campus_id: str, dados_reais: Dict[str, DadosReaisCampus]) -> bytes:
+        dados = {
+            "campus_id": campus_id,
+            "dados_reais": {disc_id: dados_reais_para_dict(d) for disc_id, d in dados_reais.items()}
+        }
+        return self.codec.codificar(empacotar("campus_shard", dados))
+
+    def _escrever_shard(self, campus_id: str, conteudo: bytes):
+        self._gravar_bytes(self._arquivo_shard(campus_id), conteudo)
+        self._invalidar_cache(f"campus:{campus_id}")
+
+    @medir("shards.load_campus_por_id")
+    def load_campus_por_id(self, campus_id: str) -> Optional[Campus]:
+        entrada = next((e for e in self._manifesto() if e.id == campus_id), None)
+        if entrada is None:
+            return None
+        return Campus(
+            id=entrada.id,
+            nome=entrada.nome,
+            disciplinas=list(entrada.disciplinas),
+            dados_reais=dict(self._carregar_shard(campus_id))
+        )
+
+    @medir("shards.load_campus")
+    def load_campus(self) -> List[Campus]:
+        # Só os arquivos alterados desde a última leitura são lidos de novo. Cópias da lista
+        # e do dicionário: os do cache de leitura são compartilhados entre as chamadas
+        return [
+            Campus(id=e.id, nome=e.nome, disciplinas=list(e.disciplinas), dados_reais=dict(self._carregar_shard(e.id)))
+            for e in self._manifesto()
+        ]
+
+    @medir("shards.save_campus")
+    def save_campus(self, campus_list: List[Campus]):
+        with self._travas.arquivo("manifesto"):
+            # Arquivos por campus antes do manifesto: o manifesto nunca aponta para um arquivo ausente
+            for campus in campus_list:
+                conteudo = self._codificar_shard(campus.id, campus.dados_reais)
+                with self._travas.campus(campus.id):
+                    # Compara pelo hash do conteúdo: os objetos podem ser os mesmos do cache, já alterados
+                    self._carregar_shard(campus.id)
+                    with self._lock_cache:
+                        entrada = self._cache.get(f"campus:{campus.id}")
+                    if entrada is None or entrada.hash != self._hash_conteudos([conteudo]):
+                        self._escrever_shard(campus.id, conteudo)
+
+            self._escrever_manifesto(campus_list)
+
+            # Remover os arquivos de campus excluídos
+            ativos = {os.path.basename(self._arquivo_shard(c.id)) for c in campus_list}
+            for nome in os.listdir(self.shards_dir):
+                if nome.endswith(self.codec.extensao) and nome not in ativos:
+                    # O nome do arquivo (id ou hash dele) leva à mesma trava que o id do campus
+                    with self._travas.campus(nome[:-len(self.codec.extensao)]):
+                        os.remove(os.path.join(self.shards_dir, nome))
+            with self._lock_cache:
+                chaves = [k for k in self._cache if k.startswith("campus:")]
+            for chave in chaves:
+                if os.path.basename(self._arquivo_shard(chave[len("campus:"):])) not in ativos:
+                    self._invalidar_cache(chave)
+
+    def _escrever_manifesto(self, campus_list: List[EntradaManifesto]):
+        manifesto = [{"id": c.id, "nome": c.nome, "disciplinas": c.disciplinas} for c in campus_list]
+        self._gravar_bytes(self.manifesto_file, self.codec.codificar(empacotar("manifesto", manifesto)))
+        self._invalidar_cache("manifesto")
+
+    @medir("shards.adicionar_campus")
+    def adicionar_campus(self, campus: Campus):
+        """Grava o arquivo do novo campus e o inclui no manifesto; os demais campus não são tocados"""
+        with self._travas.arquivo("manifesto"):
+            manifesto = self._manifesto()
+            if any(e.id == campus.id for e in manifesto):
+                raise ValueError(f"Campus já cadastrado: {campus.id}")
+            with self._travas.campus(campus.id):
+                self._escrever_shard(campus.id, self._codificar_shard(campus.id, campus.dados_reais))
+            self._escrever_manifesto(manifesto + [campus])
+
+    @medir("shards.remover_campus")
+    def remover_campus(self, campus_id: str) -> Campus:
+        """Tira o campus do manifesto e remove o arquivo dele"""
+        with self._travas.arquivo("manifesto"):
+            removido = self.load_campus_por_id(campus_id)
+            if removido is None:
+                raise KeyError(f"Campus não encontrado: {campus_id}")
+            self._escrever_manifesto([e for e in self._manifesto() if e.id != campus_id])
+            # Depois do manifesto: uma gravação em andamento termina antes e a seguinte já não acha o campus
+            with self._travas.campus(campus_id):
+                arquivo = self._arquivo_shard(campus_id)
+                if os.path.exists(arquivo):
+                    os.remove(arquivo)
+                self._invalidar_cache(f"campus:{campus_id}")
+        return removido
+
+    @medir("shards.save_dados_reais_lote")
+    def save_dados_reais_lote(self, campus_id: str, lote: List[DadosReaisCampus],
+                              verificar_versao: bool = False) -> List[DadosReaisCampus]:
+        """Grava os dados reais reescrevendo apenas o arquivo do campus (ver DataManager.save_dados_reais_lote)"""
+        if not lote:
+            return []
+
+        with self._travas.campus(campus_id):
+            if not any(e.id == campus_id for e in self._manifesto()):
+                raise KeyError(f"Campus não encontrado: {campus_id}")
+            dados_reais = dict(self._carregar_shard(campus_id))
+            gravados = versionar_lote(campus_id, dados_reais, lote, verificar_versao)
+            dados_reais.update((dados.disciplina_id, dados) for dados in gravados)
+            self._escrever_shard(campus_id, self._codificar_shard(campus_id, dados_reais))
+        return gravados
+
+    def versao_catalogo(self) -> str:
+        """Muda quando disciplinas ou o manifesto mudam; não lê o arquivo de nenhum campus"""
+        self.load_disciplinas()
+        self._manifesto()
+        with self._lock_cache:
+            h = hashlib.blake2b(digest_size=8)
+            for chave in ("disciplinas", "manifesto"):
+                entrada = self._cache.get(chave)
+                h.update(entrada.hash if entrada is not None else b"-")
+        return h.hexdigest()
+
+    @medir("shards.versao_dados")
+    def versao_dados(self) -> str:
+        """Muda sempre que disciplinas, o manifesto ou o arquivo de qualquer campus muda"""
+        self.load_disciplinas()
+        manifesto = self._manifesto()
+        for entrada in manifesto:
+            self._carregar_shard(entrada.id)
+
+        chaves = ["disciplinas", "manifesto"] + [f"campus:{e.id}" for e in manifesto]
+        with self._lock_cache:
+            h = hashlib.blake2b(digest_size=8)
+            for chave in chaves:
+                entrada = self._cache.get(chave)
+                h.update(entrada.hash if entrada is not None else b"-")
+        return h.hexdigest()
@@ -0,0 +1,120 @@
+"""
+Snapshots colunares dos resultados de calcular_resultados.
+Cada snapshot é um arquivo Arrow IPC em <data_dir>/snapshots, marcado
+com a versão dos dados de entrada e o hash das regras de status; a leitura usa memory-map, então as
+colunas numéricas chegam ao ResultFrame/pandas sem cópia.
+"""
+
+import glob
+import os
+import time
+from typing import Optional
+
+import pyarrow as pa
+
+from concorrencia import caminho_temporario
+from models import ResultFrame
+from regras import REGRAS_PADRAO, RegrasStatus
+from utils import calcular_resultados
+
+class SnapshotsResultados:
+    def __init__(self, data_manager, subdir: str = "snapshots"):
+        self.data_manager = data_manager
+        self.snapshot_dir = os.path.join(data_manager.data_dir, subdir)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    def _arquivo(self, versao: str) -> str:
+        return os.path.join(self.snapshot_dir, f"resultados_{versao}.arrow")
+
+    def salvar(self, resultados: ResultFrame, versao: str) -> str:
+        """Grava o snapshot da versão (escrita atômica) e remove os de versões antigas"""
+        tabela = pa.table(
+            {campo: resultados.coluna(campo) for campo in ResultFrame.CAMPOS},
+            metadata={"versao_dados": versao, "criado_em": str(time.time())}
+        )
+
+        destino = self._arquivo(versao)
+        temporario = caminho_temporario(destino)
+        try:
+            with open(temporario, "wb") as f:
+                # Um único record batch: cada coluna fica contígua no arquivo
+                with pa.ipc.new_file(f, tabela.schema) as writer:
+                    writer.write_table(tabela, max_chunksize=max(len(resultados), 1))
+                # fsync antes do rename: uma queda não deixa um snapshot truncado com nome de versão válida
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, destino)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+        # Outras sessões (ou a API) podem estar lendo um snapshot antigo: remover é só uma tentativa
+        # (no Windows um arquivo mapeado não pode ser removido; fica para a próxima gravação)
+        for antigo in glob.glob(os.path.join(self.snapshot_dir, "resultados_*.arrow")):
+            if antigo != destino:
+                try:
+                    os.remove(antigo)
+                except OSError:
+                    pass
+        return destino
+
+    def carregar(self, versao: str) -> Optional[ResultFrame]:
+        """ResultFrame memory-mapped do snapshot da versão, ou None se não existir"""
+        tabela = self._ler_tabela(versao)
+        if tabela is None or set(ResultFrame.CAMPOS) - set(tabela.column_names):
+            return None
+
+        colunas = {}
+        for campo in ResultFrame.CAMPOS:
+            coluna = tabela.column(campo)
+            coluna = coluna.chunk(0) if coluna.num_chunks == 1 else coluna.combine_chunks()
+            # Numéricas: visão direta sobre o arquivo mapeado; textos viram objetos Python
+            colunas[campo] = coluna.to_numpy(zero_copy_only=ResultFrame.TIPOS[campo] is not object)
+        return ResultFrame(colunas)
+
+    def carregar_dataframe(self, versao: str):
+        """DataFrame do snapshot para análise externa (colunas numéricas sem cópia)"""
+        tabela = self._ler_tabela(versao)
+        return None if tabela is None else tabela.to_pandas(split_blocks=True)
+
+    def _ler_tabela(self, versao: str) -> Optional[pa.Table]:
+        try:
+            return pa.ipc.open_file(pa.memory_map(self._arquivo(versao), "r")).read_all()
+        except FileNotFoundError:
+            # Inexistente ou removido por outra sessão ao gravar uma versão mais nova
+            return None
+
+    def versao(self, regras: Optional[RegrasStatus] = None, versao_dados: Optional[str] = None) -> str:
+        """Versão dos dados de entrada (a atual, ou versao_dados já lida) e das regras de status"""
+        if versao_dados is None:
+            versao_dados = self.data_manager.versao_dados()
+        return f"{versao_dados}-{(regras or REGRAS_PADRAO).hash()}"
+
+    def carregar_ou_calcular(self, disciplinas=None, campus_list=None, regras: Optional[RegrasStatus] = None,
+                             versao: Optional[str] = None) -> ResultFrame:
+        """
+        Resultados da versão atual dos dados e das regras: lê o snapshot se
+        ele ainda vale, senão recalcula e grava um novo (o antigo é descartado).
+
+        Quem já carregou disciplinas e campus passa a versão lida antes de
+        carregá-los; sem ela, o cálculo sobre esses dados não é gravado (não
+        há como saber a que versão eles pertencem). O snapshot só é gravado
+        se a versão não mudou durante a leitura e o cálculo.
+        """
+        gravar = versao is not None or (disciplinas is None and campus_list is None)
+        if versao is None:
+            versao = self.versao(regras)
+        resultados = self.carregar(versao)
+        if resultados is not None:
+            return resultados
+
+        if disciplinas is None:
+            disciplinas = self.data_manager.load_disciplinas()
+        if campus_list is None:
+            campus_list = self.data_manager.load_campus()
+
+        resultados = calcular_resultados(disciplinas, campus_list, regras=regras)
+        if gravar and self.versao(regras) == versao:
+            self.salvar(resultados, versao)
+        return resultados
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Backend SQLite para os dados da calculadora de preceptores.
+Mesma interface load_*/save_* do DataManager em JSON, com tabelas
+indexadas e gravação linha a linha dos dados reais de um campus.
+"""
+
+import argparse
+import os
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import List, Optional
+
+from instrumentacao import medir
+from models import Disciplina, Campus, ConflitoVersao, DadosReaisCampus, DataManager, EntradaManifesto
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS disciplinas (
+    id TEXT PRIMARY KEY,
+    posicao INTEGER NOT NULL,
+    nome TEXT NOT NULL,
+    curso TEXT NOT NULL,
+    ch_prevista REAL NOT NULL DEFAULT 0,
+    alunos_previstos INTEGER NOT NULL DEFAULT 0,
+    ch_por_aluno REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_disciplinas_posicao ON disciplinas(posicao);
+CREATE INDEX IF NOT EXISTS idx_disciplinas_curso_nome ON disciplinas(curso, nome);
+
+CREATE TABLE IF NOT EXISTS campus (
+    id TEXT PRIMARY KEY,
+    posicao INTEGER NOT NULL,
+    nome TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_campus_posicao ON campus(posicao);
+CREATE INDEX IF NOT EXISTS idx_campus_nome ON campus(nome);
+
+CREATE TABLE IF NOT EXISTS campus_disciplina (
+    campus_id TEXT NOT NULL REFERENCES campus(id) ON DELETE CASCADE,
+    posicao INTEGER NOT NULL,
+    disciplina_id TEXT NOT NULL,
+    PRIMARY KEY (campus_id, posicao)
+);
+CREATE INDEX IF NOT EXISTS idx_campus_disciplina_disciplina ON campus_disciplina(disciplina_id);
+
+CREATE TABLE IF NOT EXISTS dados_reais (
+    campus_id TEXT NOT NULL REFERENCES campus(id) ON DELETE CASCADE,
+    disciplina_id TEXT NOT NULL,
+    alunos_reais INTEGER NOT NULL DEFAULT 0,
+    ch_real_total REAL NOT NULL DEFAULT 0,
+    observacoes TEXT NOT NULL DEFAULT '',
+    versao INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (campus_id, disciplina_id)
+);
+CREATE INDEX IF NOT EXISTS idx_dados_reais_disciplina ON dados_reais(disciplina_id);
+
+-- Contador incrementado a cada gravação (versão dos dados)
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (chave, valor) VALUES ('versao', 0);
+"""
+
+INCREMENTAR_VERSAO = "UPDATE meta SET valor = valor + 1 WHERE chave = 'versao'"
+
+UPSERT_DADOS_REAIS = """
+INSERT INTO dados_reais (campus_id, disciplina_id, alunos_reais, ch_real_total, observacoes, versao)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (campus_id, disciplina_id) DO UPDATE SET
+    alunos_reais = excluded.alunos_reais,
+    ch_real_total = excluded.ch_real_total,
+    observacoes = excluded.observacoes,
+    versao = excluded.versao
+"""
+
+# Gravação de um registro com a versão seguinte à atual (1 para um registro novo)
+GRAVAR_PROXIMA_VERSAO = """
+INSERT INTO dados_reais (campus_id, disciplina_id, alunos_reais, ch_real_total, observacoes, versao)
+VALUES (?, ?, ?, ?, ?, 1)
+ON CONFLICT (campus_id, disciplina_id) DO UPDATE SET
+    alunos_reais = excluded.alunos_reais,
+    ch_real_total = excluded.ch_real_total,
+    observacoes = excluded.observacoes,
+    versao = dados_reais.versao + 1
+"""
+
+class SQLiteDataManager:
+    def __init__(self, data_dir="data", db_name="calc_precpt.db"):
+        self.data_dir = data_dir
+        os.makedirs(data_dir, exist_ok=True)
+        self.db_file = os.path.join(data_dir, db_name)
+
+        novo_banco = not os.path.exists(self.db_file)
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Bancos criados antes das versões por registro
+            colunas = {row[1] for row in conn.execute("PRAGMA table_info(dados_reais)")}
+            if "versao" not in colunas:
+                conn.execute("ALTER TABLE dados_reais ADD COLUMN versao INTEGER NOT NULL DEFAULT 0")
+
+        # Migração única a partir dos arquivos JSON existentes
+        if novo_banco:
+            migrar_json_para_sqlite(DataManager(data_dir), self)
+
+    @contextmanager
+    def _conectar(self):
+        # Uma conexão por operação: o gerenciador é compartilhado entre threads do Streamlit
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        try:
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @medir("sqlite.save_disciplinas")
+    def save_disciplinas(self, disciplinas: List[Disciplina]):
+        with self._conectar() as conn:
+            conn.execute("CREATE TEMP TABLE ids_mantidos (id TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO ids_mantidos VALUES (?)", [(d.id,) for d in disciplinas])
+            conn.execute("DELETE FROM disciplinas WHERE id NOT IN (SELECT id FROM ids_mantidos)")
+            conn.executemany(
+                """
+                INSERT INTO disciplinas (id, posicao, nome, curso, ch_prevista, alunos_previstos, ch_por_aluno)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    posicao = excluded.posicao,
+                    nome = excluded.nome,
+                    curso = excluded.curso,
+                    ch_prevista = excluded.ch_prevista,
+                    alunos_previstos = excluded.alunos_previstos,
+                    ch_por_aluno = excluded.ch_por_aluno
+                """,
+                [
+                    (d.id, i, d.nome, d.curso, d.ch_prevista, d.alunos_previstos, d.ch_por_aluno)
+                    for i, d in enumerate(disciplinas)
+                ]
+            )
+            conn.execute("DROP TABLE ids_mantidos")
+            conn.execute(INCREMENTAR_VERSAO)
+
+    @medir("sqlite.load_disciplinas")
+    def load_disciplinas(self) -> List[Disciplina]:
+        with self._conectar() as conn:
+            rows = conn.execute(
+                "SELECT id, nome, curso, ch_prevista, alunos_previstos, ch_por_aluno FROM disciplinas ORDER BY posicao"
+            ).fetchall()
+
+        return [
+            Disciplina(
+                id=row[0],
+                nome=row[1],
+                curso=row[2],
+                ch_prevista=row[3],
+                alunos_previstos=row[4],
+                ch_por_aluno=row[5]
+            )
+            for row in rows
+        ]
+
+    @medir("sqlite.save_campus")
+    def save_campus(self, campus_list: List[Campus]):
+        with self._conectar() as conn:
+            conn.execute("CREATE TEMP TABLE ids_mantidos (id TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO ids_mantidos VALUES (?)", [(c.id,) for c in campus_list])
+            conn.execute("DELETE FROM campus WHERE id NOT IN (SELECT id FROM ids_mantidos)")
+            conn.execute("DROP TABLE ids_mantidos")
+
+            for i, campus in enumerate(campus_list):
+                conn.execute(
+                    """
+                    INSERT INTO campus (id, posicao, nome) VALUES (?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET posicao = excluded.posicao, nome = excluded.nome
+                    """,
+                    (campus.id, i, campus.nome)
+                )
+
+                conn.execute("DELETE FROM campus_disciplina WHERE campus_id = ?", (campus.id,))
+                conn.executemany(
+                    "INSERT INTO campus_disciplina (campus_id, posicao, disciplina_id) VALUES (?, ?, ?)",
+                    [(campus.id, j, disc_id) for j, disc_id in enumerate(campus.disciplinas)]
+                )
+
+                marcadores = ",".join("?" * len(campus.dados_reais))
+                conn.execute(
+                    f"DELETE FROM dados_reais WHERE campus_id = ? AND disciplina_id NOT IN ({marcadores})",
+                    (campus.id, *campus.dados_reais.keys())
+                )
+                conn.executemany(
+                    UPSERT_DADOS_REAIS,
+                    [
+                        (campus.id, disc_id, dados.alunos_reais, dados.ch_real_total, dados.observacoes, dados.versao)
+                        for disc_id, dados in campus.dados_reais.items()
+                    ]
+                )
+
+            conn.execute(INCREMENTAR_VERSAO)
+
+    @medir("sqlite.load_campus")
+    def load_campus(self) -> List[Campus]:
+        with self._conectar() as conn:
+            campus_rows = conn.execute("SELECT id, nome FROM campus ORDER BY posicao").fetchall()
+            disciplina_rows = conn.execute(
+                "SELECT campus_id, disciplina_id FROM campus_disciplina ORDER BY campus_id, posicao"
+            ).fetchall()
+            dados_rows = conn.execute(
+                "SELECT campus_id, disciplina_id, alunos_reais, ch_real_total, observacoes, versao FROM dados_reais"
+            ).fetchall()
+
+        campus_por_id = {row[0]: Campus(id=row[0], nome=row[1]) for row in campus_rows}
+
+        for campus_id, disc_id in disciplina_rows:
+            campus_por_id[campus_id].disciplinas.append(disc_id)
+
+        for campus_id, disc_id, alunos_reais, ch_real_total, observacoes, versao in dados_rows:
+            campus_por_id[campus_id].dados_reais[disc_id] = DadosReaisCampus(
+                disciplina_id=disc_id,
+                alunos_reais=alunos_reais,
+                ch_real_total=ch_real_total,
+                observacoes=observacoes,
+                versao=versao
+            )
+
+        return list(campus_por_id.values())
+
+    @medir("sqlite.load_manifesto")
+    def load_manifesto(self) -> List[EntradaManifesto]:
+        """Id, nome e disciplinas de cada campus, sem ler a tabela de dados reais"""
+        with self._conectar() as conn:
+            campus_rows = conn.execute("SELECT id, nome FROM campus ORDER BY posicao").fetchall()
+            disciplina_rows = conn.execute(
+                "SELECT campus_id, disciplina_id FROM campus_disciplina ORDER BY campus_id, posicao"
+            ).fetchall()
+
+        entradas = {row[0]: EntradaManifesto(id=row[0], nome=row[1]) for row in campus_rows}
+        for campus_id, disc_id in disciplina_rows:
+            entradas[campus_id].disciplinas.append(disc_id)
+        return list(entradas.values())
+
+    @medir("sqlite.load_campus_por_id")
+    def load_campus_por_id(self, campus_id: str) -> Optional[Campus]:
+        """Um único campus com os dados reais, lendo só as linhas dele"""
+        with self._conectar() as conn:
+            row = conn.execute("SELECT id, nome FROM campus WHERE id = ?", (campus_id,)).fetchone()
+            if row is None:
+                return None
+            disciplina_rows = conn.execute(
+                "SELECT disciplina_id FROM campus_disciplina WHERE campus_id = ? ORDER BY posicao", (campus_id,)
+            ).fetchall()
+            dados_rows = conn.execute(
+                "SELECT disciplina_id, alunos_reais, ch_real_total, observacoes, versao FROM dados_reais WHERE campus_id = ?",
+                (campus_id,)
+            ).fetchall()
+
+        campus = Campus(id=row[0], nome=row[1], disciplinas=[disc_id for (disc_id,) in disciplina_rows])
+        for disc_id, alunos_reais, ch_real_total, observacoes, versao in dados_rows:
+            campus.dados_reais[disc_id] = DadosReaisCampus(
+                disciplina_id=disc_id,
+                alunos_reais=alunos_reais,
+                ch_real_total=ch_real_total,
+                observacoes=observacoes,
+                versao=versao
+            )
+        return campus
+
+    def save_dados_reais(self, campus_id: str, dados: DadosReaisCampus,
+                         verificar_versao: bool = False) -> DadosReaisCampus:
+        """Grava os dados reais de uma disciplina de um campus (upsert de uma linha)"""
+        return self.save_dados_reais_lote(campus_id, [dados], verificar_versao)[0]
+
+    @medir("sqlite.save_dados_reais_lote")
+    def save_dados_reais_lote(self, campus_id: str, lote: List[DadosReaisCampus],
+                              verificar_versao: bool = False) -> List[DadosReaisCampus]:
+        """
+        Grava os dados reais de várias disciplinas de um campus em uma única
+        transação e devolve os registros gravados, com a nova versão (ver
+        DataManager.save_dados_reais_lote).
+        """
+        if not lote:
+            return []
+
+        with self._conectar() as conn:
+            # IMMEDIATE: a verificação das versões e a gravação veem o mesmo estado do banco
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM campus WHERE id = ?", (campus_id,)).fetchone() is None:
+                raise KeyError(f"Campus não encontrado: {campus_id}")
+            versoes = dict(conn.execute(
+                "SELECT disciplina_id, versao FROM dados_reais WHERE campus_id = ?", (campus_id,)
+            ).fetchall())
+            if verificar_versao:
+                for dados in lote:
+                    if dados.versao != versoes.get(dados.disciplina_id, 0):
+                        raise ConflitoVersao(campus_id, dados.disciplina_id, dados.versao, versoes.get(dados.disciplina_id, 0))
+
+            gravados = []
+            for dados in lote:
+                conn.execute(
+                    GRAVAR_PROXIMA_VERSAO,
+                    (campus_id, dados.disciplina_id, dados.alunos_reais, dados.ch_real_total, dados.observacoes)
+                )
+                versoes[dados.disciplina_id] = versoes.get(dados.disciplina_id, 0) + 1
+                gravados.append(replace(dados, versao=versoes[dados.disciplina_id]))
+            conn.execute(INCREMENTAR_VERSAO)
+        return gravados
+
+    @medir("sqlite.adicionar_campus")
+    def adicionar_campus(self, campus: Campus):
+        with self._conectar() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM campus WHERE id = ?", (campus.id,)).fetchone() is not None:
+                raise ValueError(f"Campus já cadastrado: {campus.id}")
+            (posicao,) = conn.execute("SELECT COALESCE(MAX(posicao) + 1, 0) FROM campus").fetchone()
+            conn.execute("INSERT INTO campus (id, posicao, nome) VALUES (?, ?, ?)", (campus.id, posicao, campus.nome))
+            conn.executemany(
+                "INSERT INTO campus_disciplina (campus_id, posicao, disciplina_id) VALUES (?, ?, ?)",
+                [(campus.id, j, disc_id) for j, disc_id in enumerate(campus.disciplinas)]
+            )
+            conn.executemany(
+                UPSERT_DADOS_REAIS,
+                [
+                    (campus.id, disc_id, dados.alunos_reais, dados.ch_real_total, dados.observacoes, dados.versao)
+                    for disc_id, dados in campus.dados_reais.items()
+                ]
+            )
+            conn.execute(INCREMENTAR_VERSAO)
+
+    @medir("sqlite.remover_campus")
+    def remover_campus(self, campus_id: str) -> Campus:
+        removido = self.load_campus_por_id(campus_id)
+        if removido is None:
+            raise KeyError(f"Campus não encontrado: {campus_id}")
+        with self._conectar() as conn:
+            # Dados reais e disciplinas do campus saem pelo ON DELETE CASCADE
+            conn.execute("DELETE FROM campus WHERE id = ?", (campus_id,))
+            conn.execute(INCREMENTAR_VERSAO)
+        return removido
+
+    @medir("sqlite.versao_dados")
+    def versao_dados(self) -> str:
+        """Identificador dos dados atuais: muda a cada gravação"""
+        with self._conectar() as conn:
+            (versao,) = conn.execute("SELECT valor FROM meta WHERE chave = 'versao'").fetchone()
+        return str(versao)
+
+    def versao_catalogo(self) -> str:
+        return self.versao_dados()
+
+def migrar_json_para_sqlite(origem: DataManager, destino: SQLiteDataManager):
+    """Copia disciplinas e campus dos arquivos JSON para o banco SQLite"""
+    disciplinas = origem.load_disciplinas()
+    campus_list = origem.load_campus()
+
+    if disciplinas:
+        destino.save_disciplinas(disciplinas)
+    if campus_list:
+        destino.save_campus(campus_list)
+
+    return len(disciplinas), len(campus_list)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra os dados JSON para o backend SQLite")
+    parser.add_argument("data_dir", nargs="?", default="data")
+    args = parser.parse_args()
+
+    n_disciplinas, n_campus = migrar_json_para_sqlite(DataManager(args.data_dir), SQLiteDataManager(args.data_dir))
+    print(f"✅ Migração concluída: {n_disciplinas} disciplinas, {n_campus} campus")
@@ -1,11 +1,46 @@
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Union
+import io
+import numpy as np
 import pandas as pd
-from models import Disciplina, Campus, CalculoResultado, DadosReaisCampus
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from models import Disciplina, Campus, CalculoResultado, DadosReaisCampus, ResultFrame, COLUNAS_RELATORIO
+from cubo import CuboAgregado
+from instrumentacao import medir
+from regras import REGRAS_PADRAO, RegrasStatus
 
-def calcular_resultados(disciplinas: List[Disciplina], campus_list: List[Campus]) -> List[CalculoResultado]:
+# Engines disponíveis para calcular_resultados
+ENGINES_CALCULO = ("python", "vetorizado", "paralelo")
+
+# Jornada padrão de um professor, para converter diferenças de CH em professores equivalentes
+HORAS_PROFESSOR = 40
+
+# Máximo de linhas por aba do Excel (incluindo o cabeçalho)
+LIMITE_LINHAS_EXCEL = 1_048_576
+
+@medir("utils.calcular_resultados")
+def calcular_resultados(disciplinas: List[Disciplina], campus_list: List[Campus], engine: str = "vetorizado",
+                        workers: Optional[int] = None, regras: Optional[RegrasStatus] = None) -> ResultFrame:
     """
     Calcula os resultados comparando dados previstos vs reais
+
+    engine: "vetorizado" calcula as colunas com NumPy (ver calcular_colunas);
+    "paralelo" faz o mesmo cálculo dividido em `workers` processos (ver
+    paralelo.calcular_paralelo); "python" percorre cada par campus ×
+    disciplina em um laço.
+    regras: regras de status (padrão: 5% da CH prevista, ver regras.py).
     """
+    if engine not in ENGINES_CALCULO:
+        raise ValueError(f"Engine de cálculo desconhecida: {engine}")
+    regras = regras or REGRAS_PADRAO
+    
+    if engine == "vetorizado":
+        return calcular_colunas(disciplinas, campus_list, regras)
+    if engine == "paralelo":
+        from paralelo import calcular_paralelo  # paralelo importa este módulo
+        return calcular_paralelo(disciplinas, campus_list, workers, regras)
+    
     resultados = []
     
     # Criar um dicionário de disciplinas para facilitar consulta
@@ -32,14 +67,6 @@ def calcular_resultados(disciplinas: List[Disciplina], campus_list: List[Campus]
             # Calcular eficiência
             eficiencia = (ch_real / disciplina.ch_prevista * 100) if disciplina.ch_prevista > 0 else 0
             
-            # Determinar status
-            if abs(diferenca_ch) <= (disciplina.ch_prevista * 0.05):  # 5% de tolerância
-                status = "Adequado"
-            elif diferenca_ch > 0:
-                status = "Excesso"
-            else:
-                status = "Falta"
-            
             resultado = CalculoResultado(
                 disciplina_id=disc_id,
                 disciplina_nome=disciplina.nome,
@@ -52,35 +79,158 @@ def calcular_resultados(disciplinas: List[Disciplina], campus_list: List[Campus]
                 alunos_reais=dados_reais.alunos_reais,
                 diferenca_alunos=diferenca_alunos,
                 eficiencia=eficiencia,
-                status=status
+                status="",
+                faixa=""
             )
             
             resultados.append(resultado)
     
-    return resultados
+    # Determinar status e faixa com as regras compiladas, de uma vez para todas as linhas
+    status, faixas = regras.classificar(
+        np.array([r.diferenca_ch for r in resultados], dtype=np.float64),
+        np.array([r.ch_prevista for r in resultados], dtype=np.float64),
+        [r.curso for r in resultados],
+        [r.campus for r in resultados]
+    )
+    for resultado, status_linha, faixa in zip(resultados, status, faixas):
+        resultado.status = str(status_linha)
+        resultado.faixa = str(faixa)
+    
+    return ResultFrame.from_records(resultados)
+
+@medir("utils.calcular_colunas")
+def calcular_colunas(disciplinas: List[Disciplina], campus_list: List[Campus],
+                     regras: Optional[RegrasStatus] = None) -> ResultFrame:
+    """
+    Versão colunar de calcular_resultados: achata disciplinas e dados reais
+    em arrays e calcula CH real, diferenças, eficiência e status de uma vez.
+    """
+    tabela = tabela_disciplinas(disciplinas)
+    pares = achatar_pares(campus_list, tabela["posicao"])
+    colunas = calcular_pares(pares["idx"], pares["alunos_reais"], pares["ch_informada"], tabela)
+    return montar_result_frame(disciplinas, campus_list, pares["idx"], pares["campus_pos"], colunas, regras)
+
+def tabela_disciplinas(disciplinas: List[Disciplina]) -> Dict:
+    """Posição de cada id e colunas numéricas das disciplinas"""
+    return {
+        # Em caso de IDs repetidos vale a última, como no laço
+        "posicao": {d.id: i for i, d in enumerate(disciplinas)},
+        "ch_prevista": np.array([d.ch_prevista for d in disciplinas], dtype=np.float64),
+        "alunos_previstos": np.array([d.alunos_previstos for d in disciplinas], dtype=np.int64),
+        "ch_por_aluno": np.array([d.ch_por_aluno for d in disciplinas], dtype=np.float64)
+    }
+
+def achatar_pares(campus_list: List[Campus], disc_pos: Dict[str, int]) -> Dict[str, np.ndarray]:
+    """
+    Pares campus × disciplina em arrays (posição da disciplina, posição do
+    campus em campus_list, alunos reais e CH informada), já sem as
+    disciplinas inexistentes.
+    """
+    vazio = DadosReaisCampus("")
+    pares_id = [disc_id for c in campus_list for disc_id in c.disciplinas]
+    pares_dados = [c.dados_reais.get(disc_id, vazio) for c in campus_list for disc_id in c.disciplinas]
+    n_pares = len(pares_id)
+    
+    campus_pos = np.repeat(np.arange(len(campus_list)), [len(c.disciplinas) for c in campus_list])
+    idx = np.fromiter((disc_pos.get(disc_id, -1) for disc_id in pares_id), dtype=np.int64, count=n_pares)
+    alunos_reais = np.fromiter((d.alunos_reais for d in pares_dados), dtype=np.int64, count=n_pares)
+    ch_informada = np.fromiter((d.ch_real_total for d in pares_dados), dtype=np.float64, count=n_pares)
+    
+    # Descartar disciplinas inexistentes
+    validos = idx >= 0
+    return {
+        "idx": idx[validos],
+        "campus_pos": campus_pos[validos],
+        "alunos_reais": alunos_reais[validos],
+        "ch_informada": ch_informada[validos]
+    }
+
+def calcular_pares(idx: np.ndarray, alunos_reais: np.ndarray, ch_informada: np.ndarray, tabela: Dict) -> Dict[str, np.ndarray]:
+    """Colunas numéricas dos pares (tabela: ver tabela_disciplinas)"""
+    ch_prevista = tabela["ch_prevista"][idx]
+    alunos_previstos = tabela["alunos_previstos"][idx]
+    
+    # Usar CH real informada ou calculada
+    ch_real = np.where(ch_informada > 0, ch_informada, alunos_reais * tabela["ch_por_aluno"][idx])
+    diferenca_ch = ch_real - ch_prevista
+    
+    com_previsao = ch_prevista > 0
+    eficiencia = np.where(com_previsao, ch_real / np.where(com_previsao, ch_prevista, 1.0) * 100, 0.0)
+    
+    return {
+        "ch_prevista": ch_prevista,
+        "ch_real": ch_real,
+        "diferenca_ch": diferenca_ch,
+        "alunos_previstos": alunos_previstos,
+        "alunos_reais": alunos_reais,
+        "diferenca_alunos": alunos_reais - alunos_previstos,
+        "eficiencia": eficiencia
+    }
 
-def gerar_relatorio_excel(resultados: List[CalculoResultado], filename: str = "relatorio_preceptores.xlsx"):
+def montar_result_frame(disciplinas: List[Disciplina], campus_list: List[Campus], idx: np.ndarray,
+                        campus_pos: np.ndarray, colunas: Dict[str, np.ndarray],
+                        regras: Optional[RegrasStatus] = None) -> ResultFrame:
+    """
+    Completa as colunas calculadas com ids e nomes de disciplina, curso e
+    campus, e classifica status e faixa de cada linha pelas regras
+    """
+    # O id de cada par é o da disciplina na posição (a última com aquele id)
+    disc_id = np.array([d.id for d in disciplinas], dtype=object)
+    disc_nome = np.array([d.nome for d in disciplinas], dtype=object)
+    disc_curso = np.array([d.curso for d in disciplinas], dtype=object)
+    campus_nomes = np.array([c.nome for c in campus_list], dtype=object)
+    curso = disc_curso[idx]
+    campus = campus_nomes[campus_pos]
+    status, faixa = (regras or REGRAS_PADRAO).classificar(colunas["diferenca_ch"], colunas["ch_prevista"], curso, campus)
+    
+    return ResultFrame({
+        "disciplina_id": disc_id[idx],
+        "disciplina_nome": disc_nome[idx],
+        "curso": curso,
+        "campus": campus,
+        **colunas,
+        "status": status,
+        "faixa": faixa
+    })
+
+def _como_result_frame(resultados: Union[ResultFrame, List[CalculoResultado]]) -> ResultFrame:
+    if isinstance(resultados, ResultFrame):
+        return resultados
+    return ResultFrame.from_records(resultados)
+
+def _como_cubo(resultados: Union[CuboAgregado, ResultFrame, List[CalculoResultado]]) -> CuboAgregado:
+    if isinstance(resultados, CuboAgregado):
+        return resultados
+    return CuboAgregado(_como_result_frame(resultados))
+
+def _resumo_por_campus(cubo: CuboAgregado) -> pd.DataFrame:
+    # Roll-up do cubo por campus (as somas vêm das células, não das linhas)
+    resumo_campus = cubo.rollup(['campus']).rename(columns=COLUNAS_RELATORIO)
+    resumo_campus = resumo_campus[['Campus', 'CH Prevista', 'CH Real', 'Diferença CH', 'Alunos Previstos', 'Alunos Reais']]
+    resumo_campus['Eficiência %'] = (resumo_campus['CH Real'] / resumo_campus['CH Prevista'] * 100).round(2)
+    return resumo_campus
+
+@medir("utils.gerar_relatorio_excel")
+def gerar_relatorio_excel(resultados: Union[ResultFrame, List[CalculoResultado]], filename: str = "relatorio_preceptores.xlsx",
+                          streaming: bool = False, progresso: Optional[Callable[[float], None]] = None,
+                          cubo: Optional[CuboAgregado] = None):
     """
     Gera um relatório em Excel com os resultados
+
+    streaming=True grava as abas linha a linha em modo write-only (memória
+    constante), dividindo abas que passam do limite de linhas do Excel.
+    Nesse modo filename também pode ser um arquivo binário aberto (ex.: BytesIO).
+    cubo: agregados já mantidos dos mesmos resultados (senão são montados aqui).
     """
-    # Converter para DataFrame
-    data = []
-    for r in resultados:
-        data.append({
-            "Campus": r.campus,
-            "Curso": r.curso,
-            "Disciplina": r.disciplina_nome,
-            "CH Prevista": r.ch_prevista,
-            "CH Real": r.ch_real,
-            "Diferença CH": r.diferenca_ch,
-            "Alunos Previstos": r.alunos_previstos,
-            "Alunos Reais": r.alunos_reais,
-            "Diferença Alunos": r.diferenca_alunos,
-            "Eficiência %": r.eficiencia,
-            "Status": r.status
-        })
-    
-    df = pd.DataFrame(data)
+    if cubo is None:
+        cubo = _como_cubo(resultados)
+    
+    if streaming:
+        _escrever_relatorio_streaming(_como_result_frame(resultados), filename, progresso, cubo=cubo)
+        return filename
+    
+    # Visão em DataFrame sobre as colunas já calculadas (sem cópia)
+    df = _como_result_frame(resultados).to_dataframe(COLUNAS_RELATORIO)
     
     # Criar arquivo Excel com múltiplas abas
     with pd.ExcelWriter(filename, engine='openpyxl') as writer:
@@ -88,15 +238,7 @@ def gerar_relatorio_excel(resultados: List[CalculoResultado], filename: str = "r
         df.to_excel(writer, sheet_name='Relatório Geral', index=False)
         
         # Aba com resumo por campus
-        resumo_campus = df.groupby('Campus').agg({
-            'CH Prevista': 'sum',
-            'CH Real': 'sum',
-            'Diferença CH': 'sum',
-            'Alunos Previstos': 'sum',
-            'Alunos Reais': 'sum'
-        }).reset_index()
-        resumo_campus['Eficiência %'] = (resumo_campus['CH Real'] / resumo_campus['CH Prevista'] * 100).round(2)
-        resumo_campus.to_excel(writer, sheet_name='Resumo por Campus', index=False)
+        _resumo_por_campus(cubo).to_excel(writer, sheet_name='Resumo por Campus', index=False)
         
         # Aba com disciplinas em excesso (oportunidades de desligamento)
         excesso = df[df['Status'] == 'Excesso'].sort_values('Diferença CH', ascending=False)
@@ -108,37 +250,145 @@ def gerar_relatorio_excel(resultados: List[CalculoResultado], filename: str = "r
     
     return filename
 
-def calcular_metricas_resumo(resultados: List[CalculoResultado]) -> Dict:
+@medir("utils.gerar_relatorio_excel_bytes")
+def gerar_relatorio_excel_bytes(resultados: Union[ResultFrame, List[CalculoResultado]],
+                                progresso: Optional[Callable[[float], None]] = None,
+                                cubo: Optional[CuboAgregado] = None) -> bytes:
+    """Gera o relatório Excel em modo streaming direto na memória, sem arquivo"""
+    buffer = io.BytesIO()
+    gerar_relatorio_excel(resultados, buffer, streaming=True, progresso=progresso, cubo=cubo)
+    return buffer.getvalue()
+
+class _AbaStreaming:
+    """Aba write-only que continua em "Nome (2)", "Nome (3)"... ao atingir o limite de linhas"""
+    
+    def __init__(self, workbook: Workbook, nome: str, cabecalho: List[str], limite_linhas: int):
+        self.workbook = workbook
+        self.nome = nome
+        self.cabecalho = cabecalho
+        self.limite_linhas = limite_linhas
+        self.partes = 0
+        self._nova_parte()
+    
+    def _nova_parte(self):
+        self.partes += 1
+        nome = self.nome if self.partes == 1 else f"{self.nome} ({self.partes})"
+        self.sheet = self.workbook.create_sheet(nome[:31])  # Excel limita nomes de aba a 31 caracteres
+        cabecalho = []
+        for titulo in self.cabecalho:
+            celula = WriteOnlyCell(self.sheet, value=titulo)
+            celula.font = Font(bold=True)
+            cabecalho.append(celula)
+        self.sheet.append(cabecalho)
+        self.linhas = 1
+    
+    def append(self, linha):
+        if self.linhas >= self.limite_linhas:
+            self._nova_parte()
+        self.sheet.append(linha)
+        self.linhas += 1
+
+def _escrever_relatorio_streaming(resultados: ResultFrame, destino, progresso: Optional[Callable[[float], None]] = None,
+                                  limite_linhas: int = LIMITE_LINHAS_EXCEL, tamanho_bloco: int = 5000,
+                                  cubo: Optional[CuboAgregado] = None):
+    campos = list(COLUNAS_RELATORIO)
+    cabecalho = list(COLUNAS_RELATORIO.values())
+    status = resultados.coluna("status")
+    diferenca_ch = resultados.coluna("diferenca_ch")
+    
+    # Só índices são materializados; as linhas saem das colunas bloco a bloco
+    excesso = np.flatnonzero(status == "Excesso")
+    excesso = excesso[np.argsort(-diferenca_ch[excesso], kind="stable")]
+    falta = np.flatnonzero(status == "Falta")
+    falta = falta[np.argsort(diferenca_ch[falta], kind="stable")]
+    
+    resumo = _resumo_por_campus(cubo if cubo is not None else CuboAgregado(resultados))
+    
+    total_linhas = len(resultados) + len(excesso) + len(falta) + len(resumo)
+    escritas = 0
+    
+    workbook = Workbook(write_only=True)
+    
+    def escrever(aba: _AbaStreaming, indices):
+        nonlocal escritas
+        for inicio in range(0, len(indices), tamanho_bloco):
+            bloco = indices[inicio:inicio + tamanho_bloco]
+            for linha in zip(*(resultados.coluna(campo)[bloco].tolist() for campo in campos)):
+                aba.append(linha)
+            escritas += len(bloco)
+            if progresso is not None:
+                progresso(escritas / total_linhas if total_linhas else 1.0)
+    
+    escrever(_AbaStreaming(workbook, 'Relatório Geral', cabecalho, limite_linhas), np.arange(len(resultados)))
+    
+    aba_resumo = _AbaStreaming(workbook, 'Resumo por Campus', list(resumo.columns), limite_linhas)
+    for linha in resumo.itertuples(index=False):
+        aba_resumo.append([valor.item() if isinstance(valor, np.generic) else valor for valor in linha])
+    escritas += len(resumo)
+    
+    escrever(_AbaStreaming(workbook, 'Oportunidades Desligamento', cabecalho, limite_linhas), excesso)
+    escrever(_AbaStreaming(workbook, 'Necessidades Contratação', cabecalho, limite_linhas), falta)
+    
+    workbook.save(destino)
+    if progresso is not None:
+        progresso(1.0)
+
+@medir("utils.calcular_metricas_resumo")
+def calcular_metricas_resumo(resultados: Union[CuboAgregado, ResultFrame, List[CalculoResultado]]) -> Dict:
     """
-    Calcula métricas resumo para o dashboard
+    Calcula métricas resumo para o dashboard a partir do cubo de agregados
+    (montado a partir dos resultados quando não é informado diretamente)
     """
-    if not resultados:
+    if not isinstance(resultados, CuboAgregado) and not resultados:
         return {}
     
-    total_ch_prevista = sum(r.ch_prevista for r in resultados)
-    total_ch_real = sum(r.ch_real for r in resultados)
-    total_alunos_previstos = sum(r.alunos_previstos for r in resultados)
-    total_alunos_reais = sum(r.alunos_reais for r in resultados)
+    return metricas_de_totais(_como_cubo(resultados).totais())
+
+def totais_colunas(colunas: Dict[str, np.ndarray]) -> Dict:
+    """
+    Somas e contagens por status das colunas de resultados; são a base de
+    calcular_metricas_resumo e podem ser combinadas por soma/subtração.
+    """
+    status = colunas["status"]
+    diferenca_ch = colunas["diferenca_ch"]
+    excesso = status == "Excesso"
+    falta = status == "Falta"
     
-    disciplinas_excesso = [r for r in resultados if r.status == "Excesso"]
-    disciplinas_falta = [r for r in resultados if r.status == "Falta"]
-    disciplinas_adequadas = [r for r in resultados if r.status == "Adequado"]
+    return {
+        "ch_prevista": float(colunas["ch_prevista"].sum()),
+        "ch_real": float(colunas["ch_real"].sum()),
+        "alunos_previstos": int(colunas["alunos_previstos"].sum()),
+        "alunos_reais": int(colunas["alunos_reais"].sum()),
+        "disciplinas": len(status),
+        "excesso": int(excesso.sum()),
+        "falta": int(falta.sum()),
+        "adequado": int((status == "Adequado").sum()),
+        "diferenca_excesso": float(diferenca_ch[excesso].sum()),
+        "diferenca_falta": float(diferenca_ch[falta].sum())
+    }
+
+def metricas_de_totais(totais: Dict) -> Dict:
+    """Monta o dicionário de métricas do dashboard a partir de totais_colunas/CuboAgregado.totais"""
+    if not totais["disciplinas"]:
+        return {}
     
-    ch_excesso = sum(r.diferenca_ch for r in disciplinas_excesso)
-    ch_falta = abs(sum(r.diferenca_ch for r in disciplinas_falta))
+    total_ch_prevista = totais["ch_prevista"]
+    total_ch_real = totais["ch_real"]
+    ch_excesso = totais["diferenca_excesso"]
+    ch_falta = abs(totais["diferenca_falta"])
     
     return {
         "total_ch_prevista": total_ch_prevista,
         "total_ch_real": total_ch_real,
         "diferenca_ch_total": total_ch_real - total_ch_prevista,
-        "total_alunos_previstos": total_alunos_previstos,
-        "total_alunos_reais": total_alunos_reais,
+        "total_alunos_previstos": totais["alunos_previstos"],
+        "total_alunos_reais": totais["alunos_reais"],
         "eficiencia_geral": (total_ch_real / total_ch_prevista * 100) if total_ch_prevista > 0 else 0,
-        "disciplinas_total": len(resultados),
-        "disciplinas_excesso": len(disciplinas_excesso),
-        "disciplinas_falta": len(disciplinas_falta),
-        "disciplinas_adequadas": len(disciplinas_adequadas),
+        "disciplinas_total": totais["disciplinas"],
+        "disciplinas_excesso": totais["excesso"],
+        "disciplinas_falta": totais["falta"],
+        "disciplinas_adequadas": totais["adequado"],
         "ch_excesso": ch_excesso,
         "ch_falta": ch_falta,
         "oportunidades_economia": ch_excesso  # Horas que podem ser reduzidas
-    }
\ No newline at end of file
+    }